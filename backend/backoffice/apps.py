@@ -5,3 +5,9 @@ from django.apps import AppConfig
 class BackofficeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backoffice'
+
+    def ready(self):
+        try:
+            import backoffice.signals  # noqa F401
+        except ImportError:
+            pass
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.23 on 2026-10-17 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backoffice', '0025_alter_associatecompany_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_by', 'status', '-updated_at'], name='shipment_creator_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['driver', 'status', '-updated_at'], name='shipment_driver_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['warehouse', 'status', '-updated_at'], name='shipment_warehouse_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['customer', 'status', '-updated_at'], name='shipment_customer_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_by', 'created_at'], name='shipment_creator_created_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.23 on 2026-10-17 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backoffice', '0026_shipment_live_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='pdf_status',
+            field=models.CharField(choices=[('None', 'None'), ('Queued', 'Queued'), ('Rendering', 'Rendering'), ('Ready', 'Ready'), ('Failed', 'Failed')], default='None', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='pdf_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('pdf_status__in', ['Queued', 'Rendering'])), fields=['pdf_updated_at'], name='shipment_pdf_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.23 on 2026-10-17 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_notificationoutbox_coalesced'),
+        ('backoffice', '0027_shipment_pdf_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_counter', serialize=False, to='users.user')),
+                ('day', models.DateField()),
+                ('today_shipment', models.IntegerField(default=0)),
+                ('total_shipment', models.IntegerField(default=0)),
+                ('total_driver', models.IntegerField(default=0)),
+                ('associate_company', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.23 on 2026-10-17 11:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backoffice', '0028_dashboard_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyShipmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('created', 'created'), ('picked_up', 'picked_up'), ('delivered', 'delivered'), ('accepted', 'accepted')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['updated_at'], name='shipment_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyshipmentrollup',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shipment_rollups', to='backoffice.company'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyshipmentrollup',
+            constraint=models.UniqueConstraint(fields=('company', 'day', 'status'), name='rollup_company_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.23 on 2026-10-17 12:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('backoffice', '0029_shipment_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shipment_id', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shipment_tombstones', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shipmenttombstone',
+            index=models.Index(fields=['user', 'created_at'], name='tombstone_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmenttombstone',
+            index=models.Index(fields=['created_at'], name='tombstone_created_idx'),
+        ),
+    ]
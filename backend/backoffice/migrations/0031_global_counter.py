@@ -0,0 +1,24 @@
+# Generated by Django 3.2.23 on 2026-10-17 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backoffice', '0030_shipment_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='dashboardcounter',
+            name='total_driver',
+        ),
+    ]
@@ -1,4 +1,4 @@
-from core.enums import ShipmentStatus
+from core.enums import PdfStatus, ShipmentMilestone, ShipmentStatus
 from django.conf import settings
 from django.db import models
 from users.models import Driver, WarehouseUser  # Import User model from users app
@@ -168,6 +168,13 @@ class Shipment(models.Model):
     proof_of_delivery_file = models.FileField(
         upload_to="proof_of_delivery/", null=True, blank=True
     )
+    # Proof of delivery rendering job, see services.pdf_jobs
+    pdf_status = models.CharField(
+        max_length=20,
+        choices=[(status.value, status.value) for status in PdfStatus],
+        default=PdfStatus.NONE.value,
+    )
+    pdf_updated_at = models.DateTimeField(null=True, blank=True)
 
     # For the Container Availability section
     freight_hold = models.BooleanField(default=False)
@@ -192,5 +199,143 @@ class Shipment(models.Model):
         null=True,
     )
 
+    class Meta:
+        # Every hot listing filters live rows (is_deleted=False) on one owner
+        # column, then on status, and orders by recency. The indexes are partial
+        # so soft-deleted rows never bloat them, and the COUNT(*) behind
+        # pagination can be answered from the index alone.
+        indexes = [
+            models.Index(
+                fields=["created_by", "status", "-updated_at"],
+                name="shipment_creator_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["driver", "status", "-updated_at"],
+                name="shipment_driver_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["warehouse", "status", "-updated_at"],
+                name="shipment_warehouse_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["customer", "status", "-updated_at"],
+                name="shipment_customer_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            # PDF workers claim queued and stale rendering jobs oldest first.
+            models.Index(
+                fields=["pdf_updated_at"],
+                name="shipment_pdf_pending_idx",
+                condition=models.Q(pdf_status__in=["Queued", "Rendering"]),
+            ),
+            # Dashboard counts: shipments created by a user within a date range.
+            models.Index(
+                fields=["created_by", "created_at"],
+                name="shipment_creator_created_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            # The daily rollup picks up shipments changed since its watermark,
+            # soft-deleted ones included.
+            models.Index(fields=["updated_at"], name="shipment_updated_idx"),
+        ]
+
     def __str__(self):
         return f"Shipment - {self.container.container_number}"
+
+
+class DashboardCounter(models.Model):
+    """
+    Dashboard figures of one backoffice user, maintained incrementally.
+
+    Shipment and AssociateCompany events adjust the row in place (see
+    services.dashboard) and ``reconcile_dashboard_counters`` repairs any drift
+    from writes that bypass signals, such as ``QuerySet.update()``.
+    ``today_shipment`` counts shipments created on ``day``; a row whose ``day``
+    is in the past has no shipments today yet. Counts are signed so that a
+    decrement racing a drifted row never fails the write that caused it.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="dashboard_counter",
+    )
+    day = models.DateField()
+    today_shipment = models.IntegerField(default=0)
+    total_shipment = models.IntegerField(default=0)
+    associate_company = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+
+class GlobalCounter(models.Model):
+    """
+    A figure shared by every user, such as the number of drivers, kept in one
+    row so that the events changing it write that row alone.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.IntegerField(default=0)
+
+
+class DailyShipmentRollup(models.Model):
+    """
+    Number of live shipments of a company reaching one milestone on one day.
+
+    Built incrementally by ``rollup_shipments`` (see services.dashboard) and
+    read by the dashboard time series, so charts never scan Shipment.
+    """
+
+    company = models.ForeignKey(
+        Company, on_delete=models.CASCADE, related_name="shipment_rollups"
+    )
+    day = models.DateField()
+    status = models.CharField(
+        max_length=20,
+        choices=[(milestone.value, milestone.value) for milestone in ShipmentMilestone],
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["company", "day", "status"], name="rollup_company_day_uniq"
+            )
+        ]
+
+
+class RollupWatermark(models.Model):
+    """How far a rollup has been built: rows changed before ``value`` are in."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+
+class ShipmentTombstone(models.Model):
+    """
+    A shipment that left a user's list without being soft-deleted: it was
+    reassigned to another driver, warehouse or creator, or deleted outright.
+
+    Read by the shipment sync (see services.shipment_sync) so clients drop the
+    row, and pruned once older than ``SYNC_TOMBSTONE_RETENTION``.
+    """
+
+    # Not a foreign key: the tombstone outlives a hard-deleted shipment.
+    shipment_id = models.IntegerField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="shipment_tombstones",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at"], name="tombstone_user_created_idx"
+            ),
+            models.Index(fields=["created_at"], name="tombstone_created_idx"),
+        ]
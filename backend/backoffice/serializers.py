@@ -15,6 +15,24 @@ from utils.aws import generate_signed_url
 from .models import AssociateCompany, Company, Container, Shipment
 
 
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations its nested serializers walk, so the
+    view can build a queryset that joins all of them up front.
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
         model = Company
@@ -173,7 +191,56 @@ class ShipmentContainersSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class ShipmentSerializer(serializers.ModelSerializer):
+class ContainerImportSerializer(serializers.ModelSerializer):
+    """The container columns of one manifest row, see services.ingestion."""
+
+    class Meta:
+        model = Container
+        exclude = ("id", "created_at", "updated_at")
+
+
+class ShipmentImportSerializer(serializers.ModelSerializer):
+    """The shipment columns of one manifest row, see services.ingestion."""
+
+    class Meta:
+        model = Shipment
+        fields = (
+            "pickup_location",
+            "delivery_location",
+            "chassis_location",
+            "return_location",
+            "vessel_eta",
+            "last_free_day",
+            "discharged_date",
+            "master_bill_of_landing",
+            "house_bill_of_landing",
+            "seal_number",
+            "reference_number",
+            "vessel_name",
+            "voyage",
+            "shipment_number",
+            "pickup_number",
+            "commodity",
+            "piece_count",
+            "weight_lbs",
+            "weight_kgs",
+            "pallet_count",
+            "freight_description",
+            "freight_hold",
+            "customs_hold",
+            "carrier_hold",
+        )
+
+
+class ShipmentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = (
+        "container",
+        "customer",
+        "driver__user",
+        "warehouse__user",
+        "warehouse__company",
+    )
+
     container = ContainerSerializer()
     assigned_date = serializers.DateField(
         format="%Y/%m/%d", required=False, allow_null=True
@@ -196,6 +263,7 @@ class ShipmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shipment
         fields = "__all__"
+        read_only_fields = ("pdf_status", "pdf_updated_at")
 
     def get_delivery_order_file(self, obj):
         if obj.delivery_order_file:
@@ -277,7 +345,9 @@ class ShipmentSerializer(serializers.ModelSerializer):
         return representation
 
 
-class ShipmentUpdateSerializer(serializers.ModelSerializer):
+class ShipmentUpdateSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ("container",)
+
     container = ContainerSerializer()
     status = serializers.ChoiceField(
         choices=[(status.value, status.name) for status in ShipmentStatus]
@@ -288,6 +358,7 @@ class ShipmentUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shipment
         fields = "__all__"
+        read_only_fields = ("pdf_status", "pdf_updated_at")
 
     def update(self, instance, validated_data):
         container_data = validated_data.pop("container", None)
@@ -332,7 +403,14 @@ class CustomerCompanySerializer(serializers.ModelSerializer):
         return "Company"
 
 
-class ShipmentSerializerMobileView(serializers.ModelSerializer):
+class ShipmentSerializerMobileView(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = (
+        "container",
+        "driver__user",
+        "warehouse__user",
+        "warehouse__company",
+    )
+
     container = ContainerSerializer()
     # If there are other foreign key relations like 'customer' or 'driver', you would serialize them similarly.
     # customer = AssociateCompanySerializer(
@@ -358,6 +436,7 @@ class ShipmentSerializerMobileView(serializers.ModelSerializer):
             "delivery_order_file",
             "bill_of_landing_file",
             "proof_of_delivery_file",
+            "pdf_status",
             "status",
             "pickup_location",
             "delivery_location",
@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from services import dashboard, shipment_sync
+from users.models import Driver
+
+from .models import AssociateCompany, Shipment
+
+
+@receiver(post_init, sender=Shipment)
+def remember_counted_shipment(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded here.
+    instance._counted_as = (
+        instance.__dict__.get("created_by_id"),
+        instance.__dict__.get("is_deleted"),
+    )
+
+
+@receiver(post_save, sender=Shipment)
+def count_shipment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    owner, deleted = (None, True) if created else instance._counted_as
+    was_live = deleted is False
+    is_live = not instance.is_deleted
+    moved = owner != instance.created_by_id
+    if was_live and (not is_live or moved):
+        dashboard.shipment_counted(owner, instance.created_at, -1)
+    if is_live and (not was_live or moved):
+        dashboard.shipment_counted(instance.created_by_id, instance.created_at, 1)
+    instance._counted_as = (instance.created_by_id, instance.is_deleted)
+
+
+@receiver(post_delete, sender=Shipment)
+def uncount_shipment(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        dashboard.shipment_counted(instance.created_by_id, instance.created_at, -1)
+
+
+def loaded_owners(instance):
+    # Deferred owner columns read as None and are never tombstoned.
+    return {field: instance.__dict__.get(field) for field in shipment_sync.OWNER_FIELDS}
+
+
+@receiver(post_init, sender=Shipment)
+def remember_shipment_owners(sender, instance, **kwargs):
+    instance._owners = loaded_owners(instance)
+
+
+@receiver(post_save, sender=Shipment)
+def tombstone_reassigned_shipment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    departed = {
+        field: owner
+        for field, owner in instance._owners.items()
+        if owner is not None and owner != getattr(instance, field)
+    }
+    if departed and not created:
+        shipment_sync.record_departures(instance.pk, **departed)
+    instance._owners = loaded_owners(instance)
+
+
+@receiver(post_delete, sender=Shipment)
+def tombstone_deleted_shipment(sender, instance, **kwargs):
+    shipment_sync.record_departures(instance.pk, **loaded_owners(instance))
+
+
+@receiver(post_save, sender=Driver)
+def count_driver(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        dashboard.driver_counted(1)
+
+
+@receiver(post_delete, sender=Driver)
+def uncount_driver(sender, instance, **kwargs):
+    dashboard.driver_counted(-1)
+
+
+@receiver(post_save, sender=AssociateCompany)
+def count_associate_company(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        dashboard.associate_company_counted(instance.company_id, 1)
+
+
+@receiver(post_delete, sender=AssociateCompany)
+def uncount_associate_company(sender, instance, **kwargs):
+    dashboard.associate_company_counted(instance.company_id, -1)
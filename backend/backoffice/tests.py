@@ -1,3 +1,1042 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import json
+import random
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.enums import PdfStatus, ShipmentStatus
+from services import pdf_export, pdf_jobs
+from services.dashboard import (
+    DRIVER_COUNTER,
+    ROLLUP_OVERLAP,
+    refresh_dashboard_counter,
+    rollup_shipments,
+)
+from services.ingestion import import_manifest
+from services.shipment_sync import (
+    SYNC_TOMBSTONE_RETENTION,
+    encode_token,
+    sync_shipments,
+)
+from users.models import BackOfficeUser, Driver, Notification, User, WarehouseUser
+from utils.aws import SIGNED_URL_EXPIRY_MARGIN
+
+from .models import (
+    AssociateCompany,
+    Company,
+    Container,
+    DashboardCounter,
+    GlobalCounter,
+    RollupWatermark,
+    Shipment,
+    ShipmentTombstone,
+)
+from .views import ShipmentView
+
+# Queries allowed for one page of the shipment list: the ETag stamp, which
+# also gives the paginator its count, and the joined page SELECT. The budget
+# must not depend on the number of rows or relations.
+SHIPMENT_PAGE_QUERY_BUDGET = 2
+
+
+def enter_context(test, context):
+    """``TestCase.enterContext``, which only exists from Python 3.11."""
+    result = context.__enter__()
+    test.addCleanup(context.__exit__, None, None, None)
+    return result
+
+
+def make_user(email, user_type):
+    return User.objects.create_user(
+        username=email, email=email, password="pass", user_type=user_type
+    )
+
+
+class ShipmentTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(
+            company_name="Acme",
+            company_email="acme@example.com",
+            company_phone_number="123",
+            address="1 Road",
+            country="US",
+            state="NY",
+            zip_code="10001",
+            company_bio="",
+        )
+        cls.backoffice_user = make_user("backoffice@example.com", "backoffice")
+        BackOfficeUser.objects.create(user=cls.backoffice_user, company=cls.company)
+        cls.driver_user = make_user("driver@example.com", "driver")
+        cls.driver = Driver.objects.create(user=cls.driver_user)
+        cls.warehouse_user = make_user("warehouse@example.com", "warehouse")
+        cls.warehouse = WarehouseUser.objects.create(
+            user=cls.warehouse_user, company=cls.company
+        )
+        cls.customer = AssociateCompany.objects.create(
+            company=cls.company,
+            responsible_person_name="Jane",
+            associate_company_name="Customer Co",
+            email="jane@example.com",
+            phone="555",
+            address="2 Road",
+            country="US",
+            state="NY",
+            zip_code="10002",
+            associate_company_bio="",
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @classmethod
+    def create_shipments(cls, count, **kwargs):
+        defaults = {
+            "customer": cls.customer,
+            "driver": cls.driver,
+            "warehouse": cls.warehouse,
+            "status": ShipmentStatus.CONTAINER_ASSIGNED.value,
+            "created_by": cls.backoffice_user,
+        }
+        defaults.update(kwargs)
+        return [
+            Shipment.objects.create(
+                container=Container.objects.create(container_number=f"CONT{i:05d}"),
+                **defaults,
+            )
+            for i in range(count)
+        ]
+
+
+class ShipmentQueryBudgetTests(ShipmentTestMixin, TestCase):
+    def assert_page_within_budget(self, user, headers=None):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(SHIPMENT_PAGE_QUERY_BUDGET):
+            response = self.client.get(reverse("shipment-list"), **(headers or {}))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_backoffice_list_is_constant_in_page_size(self):
+        self.create_shipments(1)
+        self.assert_page_within_budget(self.backoffice_user)
+        self.create_shipments(9)
+        response = self.assert_page_within_budget(self.backoffice_user)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(
+            response.data["results"][0]["warehouse"]["company"]["company_name"],
+            "Acme",
+        )
+
+    def test_mobile_lists_join_driver_and_warehouse(self):
+        self.create_shipments(10)
+        mobile = {"HTTP_PLATFORM": "mobile"}
+        self.assert_page_within_budget(self.driver_user, mobile)
+        response = self.assert_page_within_budget(self.warehouse_user, mobile)
+        self.assertEqual(
+            response.data["results"][0]["driver"]["user"]["email"],
+            "driver@example.com",
+        )
+
+    def test_status_filter_keeps_budget(self):
+        self.create_shipments(5, assigned_date=timezone.localdate())
+        self.client.force_authenticate(self.backoffice_user)
+        with self.assertNumQueries(SHIPMENT_PAGE_QUERY_BUDGET):
+            response = self.client.get(
+                reverse("shipment-list"),
+                {"status": "CONTAINER_ASSIGNED,PICKED_UP", "timeframe": "today"},
+            )
+        self.assertEqual(response.data["count"], 5)
+
+    def test_detail_is_a_single_query(self):
+        (shipment,) = self.create_shipments(1)
+        self.client.force_authenticate(self.backoffice_user)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("shipment-detail", kwargs={"pk": shipment.pk})
+            )
+        self.assertEqual(
+            response.data["customer"]["associate_company_name"], "Customer Co"
+        )
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql", "EXPLAIN plans are pinned on PostgreSQL"
+)
+class ShipmentIndexPlanTests(ShipmentTestMixin, TestCase):
+    """
+    Pin the hot shipment listings to the partial (owner, status, updated_at)
+    indexes.
+
+    On a table of test size the planner cannot tell the composite indexes from
+    the single-column FK indexes, so each test drops the latter inside its
+    transaction (rolled back afterwards) and disables sequential scans. What is
+    pinned is that owner, status and is_deleted are all answered by the index.
+    """
+
+    owner_columns = ("created_by_id", "driver_id", "warehouse_id", "customer_id")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_shipments(3)
+        other_user = make_user("other@example.com", "backoffice")
+        containers = Container.objects.bulk_create(
+            Container(container_number=f"BULK{i:05d}") for i in range(2000)
+        )
+        statuses = [status.value for status in ShipmentStatus]
+        owners = [
+            {
+                "created_by": cls.backoffice_user,
+                "driver": cls.driver,
+                "warehouse": cls.warehouse,
+                "customer": cls.customer,
+            },
+            {"created_by": other_user},
+        ]
+        rng = random.Random(0)
+        Shipment.objects.bulk_create(
+            Shipment(
+                container=container,
+                status=rng.choice(statuses),
+                is_deleted=rng.random() < 0.1,
+                **rng.choice(owners),
+            )
+            for container in containers
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE backoffice_shipment")
+
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            for column in self.owner_columns:
+                cursor.execute(
+                    "SELECT indexname FROM pg_indexes WHERE tablename = %s"
+                    " AND indexdef LIKE %s AND indexdef NOT LIKE %s",
+                    ["backoffice_shipment", f"%({column})", "%WHERE%"],
+                )
+                for (index_name,) in cursor.fetchall():
+                    cursor.execute(f'DROP INDEX "{index_name}"')
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assert_uses_index(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f"Index Scan on {index_name}", plan.replace(" using ", " on "))
+        # is_deleted is covered by the partial index predicate, status by the
+        # index key: nothing should be left for a post-filter.
+        self.assertNotIn("Filter:", plan)
+
+    def view_queryset(self, user, **params):
+        """The queryset ShipmentView lists for ``user`` and query ``params``."""
+        request = Request(APIRequestFactory().get(reverse("shipment-list"), params))
+        request.user = user
+        view = ShipmentView(request=request, format_kwarg=None)
+        return view.search_and_filter(view.get_queryset())
+
+    def live(self, user):
+        # The status filter the apps poll with; its custom_sort ordering
+        # replaces the index order, so only the lookup is pinned.
+        return self.view_queryset(user, status="CONTAINER_ASSIGNED,PICKED_UP")
+
+    def test_backoffice_list(self):
+        self.assert_uses_index(
+            self.live(self.backoffice_user), "shipment_creator_live_idx"
+        )
+
+    def test_driver_list(self):
+        self.assert_uses_index(self.live(self.driver_user), "shipment_driver_live_idx")
+
+    def test_warehouse_list(self):
+        self.assert_uses_index(
+            self.live(self.warehouse_user), "shipment_warehouse_live_idx"
+        )
+
+    def test_customer_latest_shipment(self):
+        statuses = [
+            ShipmentStatus.CONTAINER_ASSIGNED.value,
+            ShipmentStatus.PICKED_UP.value,
+        ]
+        self.assert_uses_index(
+            Shipment.objects.filter(
+                is_deleted=False, status__in=statuses, customer=self.customer
+            ).order_by("-updated_at"),
+            "shipment_customer_live_idx",
+        )
+
+    def test_driver_page_count_reads_only_the_index(self):
+        queryset = self.view_queryset(self.driver_user, status="CONTAINER_ASSIGNED")
+        with CaptureQueriesContext(connection) as context:
+            queryset.count()
+        (query,) = context.captured_queries
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {query['sql']}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        # An Index Only Scan once the visibility map is set (autovacuum);
+        # inside the test transaction the planner may still pick a bitmap scan.
+        self.assertIn("shipment_driver_live_idx", plan)
+        self.assertNotIn("Filter:", plan)
+
+
+class ShipmentKeysetPaginationTests(ShipmentTestMixin, TestCase):
+    def walk(self, url, params=None):
+        seen = []
+        response = self.client.get(url, {"cursor": "", **(params or {})})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row["id"] for row in response.data["results"])
+            if not response.data["next"]:
+                return seen
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_walk_visits_every_row_once(self):
+        shipments = self.create_shipments(25)
+        self.client.force_authenticate(self.backoffice_user)
+        seen = self.walk(reverse("shipment-list"))
+        self.assertEqual(sorted(seen), sorted(s.id for s in shipments))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_cursor_page_skips_count_and_offset(self):
+        self.create_shipments(15)
+        self.client.force_authenticate(self.backoffice_user)
+        first = self.client.get(reverse("shipment-list"), {"cursor": ""})
+        # The page itself and nothing else: no ETag stamp over the whole set.
+        with self.assertNumQueries(1) as context:
+            second = self.client.get(first.data["next"])
+        (query,) = context.captured_queries
+        self.assertNotIn("COUNT(", query["sql"])
+        self.assertNotIn("MAX(", query["sql"])
+        self.assertNotIn("OFFSET", query["sql"])
+        self.assertEqual(len(second.data["results"]), 5)
+        self.assertNotIn("ETag", second)
+
+    def test_updates_between_pages_do_not_repeat_rows(self):
+        shipments = self.create_shipments(20)
+        self.client.force_authenticate(self.backoffice_user)
+        first = self.client.get(reverse("shipment-list"), {"cursor": ""})
+        first_ids = [row["id"] for row in first.data["results"]]
+        # Touch a row the client has not seen yet: it jumps to the head of the
+        # ordering, and the next page must neither repeat nor lose others.
+        unseen = [s for s in shipments if s.id not in first_ids]
+        unseen[-1].save()
+        second = self.client.get(first.data["next"])
+        second_ids = [row["id"] for row in second.data["results"]]
+        self.assertFalse(set(first_ids) & set(second_ids))
+        self.assertEqual(len(second_ids), 9)
+
+    def test_cursor_mode_respects_filters(self):
+        self.create_shipments(5)
+        self.create_shipments(5, status=ShipmentStatus.DELIVERED.value)
+        self.client.force_authenticate(self.backoffice_user)
+        seen = self.walk(reverse("shipment-list"), {"status": "DELIVERED"})
+        self.assertEqual(len(seen), 5)
+
+    def test_invalid_cursor_is_not_found(self):
+        self.client.force_authenticate(self.backoffice_user)
+        response = self.client.get(reverse("shipment-list"), {"cursor": "bogus"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ShipmentEtagTests(ShipmentTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.backoffice_user)
+
+    def test_unchanged_list_is_answered_with_the_stamp_alone(self):
+        self.create_shipments(3)
+        first = self.client.get(reverse("shipment-list"))
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"].startswith('W/"'))
+        with self.assertNumQueries(1):
+            second = self.client.get(
+                reverse("shipment-list"), HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.content, b"")
+
+    def test_list_tag_follows_rows_query_and_platform(self):
+        (shipment,) = self.create_shipments(1)
+        url = reverse("shipment-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url, {"page_size": 5})["ETag"], etag)
+        self.assertNotEqual(self.client.get(url, HTTP_PLATFORM="mobile")["ETag"], etag)
+
+        shipment.vessel_name = "Ever Given"
+        shipment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        etag = response["ETag"]
+        self.create_shipments(1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+
+    def test_detail_revalidates_on_updated_at(self):
+        (shipment,) = self.create_shipments(1)
+        url = reverse("shipment-detail", kwargs={"pk": shipment.pk})
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        shipment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        shipment.is_deleted = True
+        shipment.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_tag_rolls_over_before_signed_urls_expire(self):
+        (shipment,) = self.create_shipments(1)
+        url = reverse("shipment-detail", kwargs={"pk": shipment.pk})
+        with mock.patch("utils.conditional.time.time", return_value=0):
+            etag = self.client.get(url)["ETag"]
+        with mock.patch(
+            "utils.conditional.time.time", return_value=SIGNED_URL_EXPIRY_MARGIN
+        ):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ShipmentSyncTests(ShipmentTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Rows changed just before a sync would otherwise be sent again.
+        enter_context(
+            self, mock.patch("services.shipment_sync.SYNC_OVERLAP", timedelta())
+        )
+
+    def sync(self, user, since=None):
+        self.client.force_authenticate(user)
+        params = {} if since is None else {"since": since}
+        response = self.client.get(reverse("shipment-sync"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, changes):
+        return [row["id"] for row in changes["shipments"]]
+
+    def test_full_then_delta(self):
+        first, second = self.create_shipments(2)
+        full = self.sync(self.driver_user)
+        self.assertTrue(full["reset"])
+        self.assertFalse(full["more"])
+        self.assertEqual(self.ids(full), [first.id, second.id])
+
+        self.client.force_authenticate(self.driver_user)
+        with self.assertNumQueries(2):
+            idle = self.client.get(reverse("shipment-sync"), {"since": full["since"]})
+        self.assertEqual(idle.data["shipments"], [])
+        self.assertEqual(idle.data["deleted"], [])
+        self.assertFalse(idle.data["reset"])
+
+        first.vessel_name = "Ever Given"
+        first.save()
+        second.is_deleted = True
+        second.save()
+        delta = self.sync(self.driver_user, idle.data["since"])
+        self.assertEqual(self.ids(delta), [first.id])
+        self.assertEqual(delta["shipments"][0]["vessel_name"], "Ever Given")
+        self.assertEqual(delta["deleted"], [second.id])
+
+    def test_reassigned_shipments_are_tombstoned(self):
+        (shipment,) = self.create_shipments(1)
+        other_user = make_user("other-driver@example.com", "driver")
+        other_driver = Driver.objects.create(user=other_user)
+        since = self.sync(self.driver_user)["since"]
+
+        shipment.driver = other_driver
+        shipment.save()
+        delta = self.sync(self.driver_user, since)
+        self.assertEqual(delta["shipments"], [])
+        self.assertEqual(delta["deleted"], [shipment.id])
+        self.assertEqual(self.ids(self.sync(other_user)), [shipment.id])
+
+        shipment.driver = self.driver
+        shipment.save()
+        delta = self.sync(self.driver_user, since)
+        self.assertEqual(self.ids(delta), [shipment.id])
+        self.assertEqual(delta["deleted"], [])
+
+    def test_hard_deletes_are_tombstoned_for_every_owner(self):
+        (shipment,) = self.create_shipments(1)
+        tokens = {
+            user: self.sync(user)["since"]
+            for user in (self.backoffice_user, self.driver_user, self.warehouse_user)
+        }
+        shipment_id = shipment.id
+        shipment.delete()
+        for user, since in tokens.items():
+            self.assertEqual(self.sync(user, since)["deleted"], [shipment_id])
+
+    def test_pages_follow_the_change_order(self):
+        shipments = self.create_shipments(5)
+        owned = Shipment.objects.filter(driver=self.driver)
+        changes = sync_shipments(self.driver_user, owned, page_size=2)
+        seen = [shipment.id for shipment in changes["shipments"]]
+        self.assertTrue(changes["more"])
+        # A row changing between pages moves to the end instead of being lost.
+        shipments[0].save()
+        while changes["more"]:
+            changes = sync_shipments(
+                self.driver_user, owned, changes["since"], page_size=2
+            )
+            self.assertFalse(changes["reset"])
+            seen += [shipment.id for shipment in changes["shipments"]]
+        self.assertEqual(sorted(set(seen)), [shipment.id for shipment in shipments])
+        self.assertEqual(seen[-1], shipments[0].id)
+
+    def test_stale_and_invalid_tokens(self):
+        self.create_shipments(1)
+        stale = encode_token(timezone.now() - SYNC_TOMBSTONE_RETENTION * 2)
+        changes = self.sync(self.driver_user, stale)
+        self.assertTrue(changes["reset"])
+        self.assertEqual(len(changes["shipments"]), 1)
+
+        self.client.force_authenticate(self.driver_user)
+        response = self.client.get(reverse("shipment-sync"), {"since": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prune_tombstones(self):
+        (shipment,) = self.create_shipments(1)
+        shipment.delete()
+        self.assertEqual(ShipmentTombstone.objects.count(), 3)
+        ShipmentTombstone.objects.update(
+            created_at=timezone.now() - SYNC_TOMBSTONE_RETENTION * 2
+        )
+        out = StringIO()
+        call_command("prune_shipment_tombstones", stdout=out)
+        self.assertIn("Deleted 3 tombstone(s).", out.getvalue())
+        self.assertFalse(ShipmentTombstone.objects.exists())
+
+
+class ShipmentPdfJobTests(ShipmentTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        enter_context(self, override_settings(MEDIA_ROOT=media_root))
+        (self.shipment,) = self.create_shipments(
+            1,
+            status=ShipmentStatus.DELIVERED.value,
+            assigned_date=timezone.localdate(),
+        )
+
+    def accept(self):
+        self.client.force_authenticate(self.warehouse_user)
+        return self.client.put(
+            reverse("shipment-detail", kwargs={"pk": self.shipment.pk}),
+            {"status": "Accepted"},
+            format="multipart",
+        )
+
+    def test_accept_queues_the_pdf_instead_of_rendering(self):
+        with mock.patch("utils.generate_pdf.render_shipment_pdf") as render:
+            response = self.accept()
+        self.assertEqual(response.status_code, 202)
+        render.assert_not_called()
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, "Accepted")
+        self.assertEqual(self.shipment.pdf_status, PdfStatus.QUEUED.value)
+        self.assertFalse(self.shipment.proof_of_delivery_file)
+
+    def test_worker_renders_stores_and_notifies(self):
+        self.accept()
+        self.assertEqual(pdf_jobs.run_pdf_jobs(workers=1), 1)
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.pdf_status, PdfStatus.READY.value)
+        with self.shipment.proof_of_delivery_file.open("rb") as document:
+            self.assertEqual(document.read(5), b"%PDF-")
+        self.assertEqual(
+            set(
+                Notification.objects.filter(type="pdf_ready").values_list(
+                    "recipient", flat=True
+                )
+            ),
+            {self.backoffice_user.pk, self.warehouse_user.pk},
+        )
+        self.assertEqual(pdf_jobs.run_pdf_jobs(workers=1), 0)
+
+    def test_failed_render_is_reported(self):
+        pdf_jobs.queue_shipment_pdf(self.shipment)
+        with mock.patch(
+            "services.pdf_jobs.generate_shipment_pdf", side_effect=OSError("S3 down")
+        ):
+            pdf_jobs.run_pdf_jobs(workers=1)
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.pdf_status, PdfStatus.FAILED.value)
+
+    def test_stale_rendering_jobs_are_claimed_again(self):
+        pdf_jobs.queue_shipment_pdf(self.shipment)
+        self.assertEqual(pdf_jobs.claim_pdf_jobs(10), [self.shipment.pk])
+        # A worker died mid-render: the job is reclaimed only once stale.
+        self.assertEqual(pdf_jobs.claim_pdf_jobs(10), [])
+        Shipment.objects.filter(pk=self.shipment.pk).update(
+            pdf_updated_at=timezone.now() - pdf_jobs.STALE_AFTER * 2
+        )
+        self.assertEqual(pdf_jobs.claim_pdf_jobs(10), [self.shipment.pk])
+
+    def test_status_is_exposed_to_clients(self):
+        pdf_jobs.queue_shipment_pdf(self.shipment)
+        self.client.force_authenticate(self.warehouse_user)
+        response = self.client.get(
+            reverse("shipment-detail", kwargs={"pk": self.shipment.pk}),
+            HTTP_PLATFORM="mobile",
+        )
+        self.assertEqual(response.data["pdf_status"], PdfStatus.QUEUED.value)
+
+
+class ShipmentPdfExportTests(ShipmentTestMixin, TestCase):
+    def export(self, user, params=None):
+        self.client.force_authenticate(user)
+        with override_settings(PDF_EXPORT_WORKERS=1):
+            return self.client.get(reverse("shipment-pdf-export"), params or {})
+
+    def test_streams_one_pdf_per_shipment(self):
+        shipments = self.create_shipments(3)
+        self.create_shipments(1, is_deleted=True)
+        response = self.export(self.backoffice_user)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(
+            archive.namelist(),
+            [f"shipment_details_{shipment.id}.pdf" for shipment in shipments],
+        )
+        self.assertTrue(archive.read(archive.namelist()[0]).startswith(b"%PDF-"))
+
+    def test_filters_by_status_and_date(self):
+        self.create_shipments(2)
+        (delivered,) = self.create_shipments(1, status=ShipmentStatus.DELIVERED.value)
+        today = timezone.localdate().isoformat()
+        response = self.export(
+            self.backoffice_user, {"status": "DELIVERED", "from": today, "to": today}
+        )
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [f"shipment_details_{delivered.id}.pdf"])
+        response = self.export(self.backoffice_user, {"to": "2000-01-01"})
+        self.assertEqual(response.status_code, 404)
+        response = self.export(self.backoffice_user, {"from": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_backoffice_users_can_export(self):
+        self.create_shipments(1)
+        self.assertEqual(self.export(self.driver_user).status_code, 403)
+
+    def test_process_pool_keeps_document_order(self):
+        documents = [(f"{index}.pdf", str(index), [str(index)]) for index in range(6)]
+        rendered = list(pdf_export.render_documents(iter(documents), workers=2))
+        self.assertEqual([name for name, _ in rendered], [d[0] for d in documents])
+        self.assertTrue(all(pdf.startswith(b"%PDF-") for _, pdf in rendered))
+
+    def test_requests_share_one_pool(self):
+        self.create_shipments(1)
+        self.addCleanup(
+            lambda: pdf_export._pool and pdf_export.discard_pool(pdf_export._pool)
+        )
+        started = enter_context(
+            self,
+            mock.patch.object(pdf_export, "start_pool", wraps=pdf_export.start_pool),
+        )
+        self.client.force_authenticate(self.backoffice_user)
+        with override_settings(PDF_EXPORT_WORKERS=2):
+            for _ in range(2):
+                response = self.client.get(reverse("shipment-pdf-export"))
+                archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+                self.assertEqual(len(archive.namelist()), 1)
+        started.assert_called_once_with(2)
+
+
+class CustomerShipmentsViewTests(ShipmentTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for index in range(14):
+            AssociateCompany.objects.create(
+                company=cls.company,
+                responsible_person_name=f"Person {index}",
+                associate_company_name=f"Customer {index:02d}",
+                email=f"customer{index}@example.com",
+                phone="555",
+                address="Road",
+                country="US",
+                state="NY",
+                zip_code="10002",
+                associate_company_bio="",
+            )
+
+    def get(self, params=None):
+        self.client.force_authenticate(self.backoffice_user)
+        return self.client.get(reverse("latest-shipments"), params or {})
+
+    def test_merges_sources_newest_first(self):
+        first = self.get()
+        second = self.get({"page": 2})
+        self.assertEqual(first.data["count"], 16)
+        self.assertTrue(first.data["next"])
+        rows = first.data["results"] + second.data["results"]
+        self.assertEqual(len(rows), 16)
+        self.assertEqual(
+            [row["updated_at"] for row in rows],
+            sorted((row["updated_at"] for row in rows), reverse=True),
+        )
+        self.assertEqual(rows[-1]["type"], "Warehouse")
+
+    def test_latest_live_shipment_is_attached(self):
+        older, newer = self.create_shipments(2)
+        self.create_shipments(1, is_deleted=True)
+        self.create_shipments(1, status=ShipmentStatus.DELIVERED.value)
+        rows = self.get({"search": "Customer Co"}).data["results"]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["latest_shipment"]["id"], newer.id)
+
+    def test_query_count_does_not_grow_with_customers(self):
+        self.create_shipments(3)
+        self.client.force_authenticate(self.backoffice_user)
+        # count, page, then the page's warehouses, customers and latest
+        # shipments; the backoffice profile is already loaded with the user
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("latest-shipments"), {"page": 2})
+        self.assertEqual(
+            {row["type"] for row in response.data["results"]}, {"Warehouse", "Company"}
+        )
+
+    def test_search_and_page_fallbacks(self):
+        self.assertEqual(self.get({"search": "Acme"}).data["count"], 1)
+        self.assertEqual(len(self.get({"page": "x"}).data["results"]), 10)
+        self.assertEqual(len(self.get({"page": 99}).data["results"]), 6)
+
+
+class DashboardCounterTests(ShipmentTestMixin, TestCase):
+    def stats(self):
+        self.client.force_authenticate(self.backoffice_user)
+        response = self.client.get(reverse("dashboard-stats"))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_read_is_a_single_lookup_once_counted(self):
+        self.create_shipments(2)
+        first = self.stats()
+        with self.assertNumQueries(1):
+            second = self.stats()
+        self.assertEqual(first, second)
+        self.assertEqual(second["today_shipment"], 2)
+        self.assertEqual(second["total_shipment"], 2)
+        self.assertEqual(second["shipment_history"], 0)
+        self.assertEqual(second["total_driver"], 1)
+        self.assertEqual(second["associate_company"], 1)
+
+    def test_events_keep_counters_current(self):
+        self.stats()
+        shipment, _ = self.create_shipments(2)
+        shipment.is_deleted = True
+        shipment.save()
+        Driver.objects.create(user=make_user("driver2@example.com", "driver"))
+        AssociateCompany.objects.create(
+            company=self.company,
+            responsible_person_name="Joe",
+            email="joe@example.com",
+            phone="1",
+            address="Road",
+            country="US",
+            state="NY",
+            zip_code="1",
+            associate_company_bio="",
+        )
+        stats = self.stats()
+        self.assertEqual(stats["total_shipment"], 1)
+        self.assertEqual(stats["today_shipment"], 1)
+        self.assertEqual(stats["total_driver"], 2)
+        self.assertEqual(stats["associate_company"], 2)
+        shipment.is_deleted = False
+        shipment.save()
+        self.assertEqual(self.stats()["total_shipment"], 2)
+
+    def test_drivers_are_counted_in_one_global_row(self):
+        self.stats()
+        with CaptureQueriesContext(connection) as context:
+            driver = Driver.objects.create(
+                user=make_user("driver2@example.com", "driver")
+            )
+        sql = " ".join(query["sql"] for query in context.captured_queries)
+        self.assertNotIn('"backoffice_dashboardcounter"', sql)
+        self.assertEqual(GlobalCounter.objects.get(name=DRIVER_COUNTER).value, 2)
+        driver.delete()
+        self.assertEqual(self.stats()["total_driver"], 1)
+
+    def test_yesterdays_counts_become_history(self):
+        self.create_shipments(3)
+        self.stats()
+        DashboardCounter.objects.filter(pk=self.backoffice_user.pk).update(
+            day=timezone.localdate() - timedelta(days=1)
+        )
+        stats = self.stats()
+        self.assertEqual(stats["today_shipment"], 0)
+        self.assertEqual(stats["shipment_history"], 3)
+        self.create_shipments(1)
+        self.assertEqual(self.stats()["today_shipment"], 1)
+
+    def test_reconciliation_repairs_drift(self):
+        self.create_shipments(3)
+        self.stats()
+        # Bulk updates bypass the signals.
+        Shipment.objects.filter(created_by=self.backoffice_user).update(is_deleted=True)
+        self.assertEqual(self.stats()["total_shipment"], 3)
+        out = StringIO()
+        call_command("reconcile_dashboard_counters", stdout=out)
+        self.assertIn("1 had drifted", out.getvalue())
+        self.assertEqual(self.stats()["total_shipment"], 0)
+
+    @unittest.skipUnless(
+        connection.features.has_select_for_update, "Needs SELECT ... FOR UPDATE"
+    )
+    def test_recount_locks_the_counter_first(self):
+        self.stats()
+        with CaptureQueriesContext(connection) as context:
+            refresh_dashboard_counter(self.backoffice_user)
+        sql = [query["sql"] for query in context.captured_queries]
+        (lock,) = [i for i, query in enumerate(sql) if "FOR UPDATE" in query]
+        counts = [i for i, query in enumerate(sql) if "COUNT(" in query]
+        self.assertIn('"backoffice_dashboardcounter"', sql[lock])
+        self.assertLess(lock, min(counts))
+
+
+class DashboardTimeseriesTests(ShipmentTestMixin, TestCase):
+    def timeseries(self, **params):
+        self.client.force_authenticate(self.backoffice_user)
+        return self.client.get(reverse("dashboard-timeseries"), params)
+
+    def test_rollup_feeds_daily_series(self):
+        today = timezone.localdate()
+        picked_up = timezone.now() - timedelta(days=2)
+        first, second, _ = self.create_shipments(3)
+        Shipment.objects.filter(pk=first.pk).update(created_at=picked_up)
+        second.pickedup_date = picked_up
+        second.save()
+        out = StringIO()
+        call_command("rollup_shipments", stdout=out)
+        self.assertIn("Rebuilt 2 day bucket(s)", out.getvalue())
+
+        start = today - timedelta(days=2)
+        with self.assertNumQueries(1):  # The company comes with the user
+            response = self.timeseries(interval="day", **{"from": str(start)})
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [row["period"] for row in results],
+            [start, start + timedelta(days=1), today],
+        )
+        self.assertEqual(results[0]["created"], 1)
+        self.assertEqual(results[0]["picked_up"], 1)
+        self.assertEqual(results[1]["created"], 0)
+        self.assertEqual(results[2]["created"], 2)
+        self.assertEqual(results[2]["delivered"], 0)
+
+    def test_incremental_run_only_rebuilds_changed_days(self):
+        shipment, _ = self.create_shipments(2)
+        rollup_shipments()
+        self.assertEqual(rollup_shipments(), 1)  # Within the overlap window
+        RollupWatermark.objects.update(value=timezone.now() + ROLLUP_OVERLAP)
+        self.assertEqual(rollup_shipments(), 0)
+
+        shipment.is_deleted = True
+        shipment.driver_delivered_date = timezone.now()
+        shipment.save()
+        RollupWatermark.objects.update(value=timezone.now())
+        self.assertEqual(rollup_shipments(), 1)
+        month = self.timeseries().data["results"][-1]
+        self.assertEqual(month["period"], timezone.localdate().replace(day=1))
+        self.assertEqual(month["created"], 1)
+        self.assertEqual(month["delivered"], 0)
+
+    def test_monthly_series_defaults_to_twelve_months(self):
+        self.create_shipments(1)
+        rollup_shipments(full=True)
+        results = self.timeseries().data["results"]
+        self.assertEqual(len(results), 12)
+        self.assertEqual(sum(row["created"] for row in results), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.timeseries(interval="week").status_code, 400)
+        self.assertEqual(self.timeseries(**{"from": "17/10/2026"}).status_code, 400)
+        response = self.timeseries(interval="day", **{"from": "2020-01-01"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContainerImportTests(ShipmentTestMixin, TestCase):
+    def upload(self, name, content, user=None):
+        self.client.force_authenticate(user or self.backoffice_user)
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(
+            reverse("import-containers"), {"file": upload}, format="multipart"
+        )
+
+    def test_csv_rows_become_queued_shipments(self):
+        content = (
+            "container_number,size,hazmat,vessel_name,piece_count,unknown\n"
+            "MSCU0000001,40,true,Ever Given,12,x\n"
+            'MSCU0000002,20,,"Maersk, Line",,\n'
+        )
+        response = self.upload("manifest.csv", content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["errors"], [])
+        first, second = Shipment.objects.order_by("container__container_number")
+        self.assertEqual(first.container.container_number, "MSCU0000001")
+        self.assertTrue(first.container.hazmat)
+        self.assertEqual(first.piece_count, 12)
+        self.assertEqual(first.status, ShipmentStatus.CONTAINER_QUEUED.value)
+        self.assertEqual(first.created_by, self.backoffice_user)
+        self.assertEqual(second.vessel_name, "Maersk, Line")
+        self.assertFalse(second.container.hazmat)
+        counter = DashboardCounter.objects.filter(pk=self.backoffice_user.pk)
+        self.client.get(reverse("dashboard-stats"))
+        self.assertEqual(counter.get().total_shipment, 2)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        content = "\n".join(
+            [
+                '{"container_number": "MSCU0000001", "weight_kgs": 1000}',
+                "",
+                '{"container_number": "MSCU0000002", "weight_kgs": "heavy"}',
+                "not json",
+                '["MSCU0000003"]',
+                '{"size": "40"}',
+                '{"container_number": "MSCU0000004"}',
+            ]
+        )
+        with mock.patch("services.ingestion.IMPORT_CHUNK_SIZE", 2):
+            response = self.upload("manifest.jsonl", content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 4)
+        errors = {error["row"]: error["errors"] for error in response.data["errors"]}
+        self.assertEqual(sorted(errors), [3, 4, 5, 6])
+        self.assertIn("weight_kgs", errors[3])
+        self.assertIn("container_number", errors[6])
+        self.assertEqual(
+            set(Container.objects.values_list("container_number", flat=True)),
+            {"MSCU0000001", "MSCU0000004"},
+        )
+
+    def test_chunks_are_bulk_inserted(self):
+        rows = "".join(f"MSCU{i:07d}\n" for i in range(50))
+        with CaptureQueriesContext(connection) as queries:
+            report = import_manifest(
+                BytesIO(f"container_number\n{rows}".encode()),
+                "csv",
+                self.backoffice_user,
+                chunk_size=25,
+            )
+        self.assertEqual(report["created"], 50)
+        self.assertEqual(Shipment.objects.count(), 50)
+        inserts = [
+            query["sql"].split()[2]
+            for query in queries.captured_queries
+            if query["sql"].startswith("INSERT")
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.assertEqual(inserts.count('"backoffice_container"'), 2)
+            self.assertEqual(inserts.count('"backoffice_shipment"'), 2)
+        else:
+            # SQLite caps the parameters of one statement.
+            self.assertLess(inserts.count('"backoffice_shipment"'), 10)
+
+    def test_rejected_uploads(self):
+        self.assertEqual(self.upload("manifest.xlsx", "x").status_code, 400)
+        response = self.upload("manifest.csv", "container_number\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.data)
+        response = self.upload("manifest.csv", "container_number,size\n,40\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["failed"], 1)
+        response = self.upload("manifest.csv", "x", user=self.driver_user)
+        self.assertEqual(response.status_code, 403)
+
+
+class ShipmentExportTests(ShipmentTestMixin, TestCase):
+    def export(self, **params):
+        self.client.force_authenticate(self.backoffice_user)
+        response = self.client.get(reverse("shipment-export"), params)
+        if response.status_code == 200:
+            self.assertTrue(response.streaming)
+            response.body = b"".join(response.streaming_content)
+        return response
+
+    def test_csv_takes_the_list_filters(self):
+        queued, assigned = self.create_shipments(2)
+        queued.status = ShipmentStatus.CONTAINER_QUEUED.value
+        queued.vessel_name = "Ever, Given"
+        queued.save()
+        response = self.export(status="CONTAINER_QUEUED")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.reader(response.body.decode().splitlines()))
+        self.assertEqual(rows[0][:3], ["id", "container_number", "status"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], str(queued.id))
+        self.assertEqual(rows[1][3], "Customer Co")
+        self.assertEqual(rows[1][rows[0].index("vessel_name")], "Ever, Given")
+        self.assertEqual(len(self.export(search="CONT00001").body.splitlines()), 2)
+
+    def test_ndjson_rows(self):
+        self.create_shipments(3)
+        response = self.export(export_format="ndjson")
+        rows = [json.loads(line) for line in response.body.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["status"], ShipmentStatus.CONTAINER_ASSIGNED.value)
+        self.assertIsNone(rows[0]["picked_up"])
+
+    def test_xlsx_workbook(self):
+        self.create_shipments(2)
+        response = self.export(export_format="xlsx")
+        self.assertIn("shipments.xlsx", response["Content-Disposition"])
+        with zipfile.ZipFile(BytesIO(response.body)) as archive:
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        namespace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+        rows = sheet.findall(f"{namespace}sheetData/{namespace}row")
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            rows[1].find(f"{namespace}c/{namespace}v").text.isdigit(), True
+        )
+
+    @unittest.skipUnless(importlib.util.find_spec("openpyxl"), "needs openpyxl")
+    def test_xlsx_opens_in_a_spreadsheet_library(self):
+        import openpyxl
+
+        shipment, _ = self.create_shipments(2)
+        shipment.vessel_name = "<Ever & Given>"
+        shipment.save()
+        body = self.export(export_format="xlsx").body
+        sheet = openpyxl.load_workbook(BytesIO(body)).active
+        rows = list(sheet.values)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][0], shipment.id)
+        self.assertEqual(rows[1][rows[0].index("vessel_name")], "<Ever & Given>")
+
+    def test_rejected_requests(self):
+        self.assertEqual(self.export(export_format="pdf").status_code, 400)
+        self.assertEqual(self.export(status="LOST").status_code, 404)
+        self.client.force_authenticate(self.driver_user)
+        response = self.client.get(reverse("shipment-export"))
+        self.assertEqual(response.status_code, 403)
@@ -5,11 +5,16 @@ from .views import (
     AddContainersView,
     CompanyEditView,
     CompanyProfileView,
+    ContainerImportView,
     CustomerShipmentsHistoryView,
     CustomerShipmentsView,
     DashboardStatsAPIView,
+    DashboardTimeseriesAPIView,
     OnboardingView,
+    ShipmentExportView,
     ShipmentGetUpdateDeleteView,
+    ShipmentPdfExportView,
+    ShipmentSyncView,
     ShipmentView,
 )
 from .viewsets import AssociateCompanyViewSet
@@ -25,12 +30,20 @@ urlpatterns = [
     path("company/view/", CompanyProfileView.as_view(), name="company-view"),
     # ... other url patterns ...
     path("container/add/", AddContainersView.as_view(), name="add-containers"),
+    path("container/import/", ContainerImportView.as_view(), name="import-containers"),
     path("shipments/", ShipmentView.as_view(), name="shipment-list"),
     path(
         "shipments/<int:pk>/",
         ShipmentGetUpdateDeleteView.as_view(),
         name="shipment-detail",
     ),
+    path("shipments/sync/", ShipmentSyncView.as_view(), name="shipment-sync"),
+    path("shipments/export/", ShipmentExportView.as_view(), name="shipment-export"),
+    path(
+        "shipments/export/pdf/",
+        ShipmentPdfExportView.as_view(),
+        name="shipment-pdf-export",
+    ),
     path(
         "shipments/customers/",
         CustomerShipmentsView.as_view(),
@@ -42,4 +55,9 @@ urlpatterns = [
         name="latest-shipments",
     ),
     path("dashboard-stats/", DashboardStatsAPIView.as_view(), name="dashboard-stats"),
+    path(
+        "dashboard-timeseries/",
+        DashboardTimeseriesAPIView.as_view(),
+        name="dashboard-timeseries",
+    ),
 ]
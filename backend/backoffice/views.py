@@ -4,14 +4,24 @@ import logging
 from datetime import datetime, timedelta
 
 from core.enums import ShipmentStatus
-from dateutil.parser import parse  # To help with parsing the datetime strings
 from dateutil.relativedelta import relativedelta  # For handling months and years
+from django.conf import settings
 from django.core.files.base import ContentFile
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db import transaction
-from django.db.models import Case, IntegerField, Value, When
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    IntegerField,
+    Max,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
 from django.http import QueryDict  # Import QueryDict
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.utils.translation import gettext as _
@@ -22,23 +32,34 @@ from home.api.v1.serializers import (
     UserSerializer,
     WarehouseUserSerializer,
 )
-from reportlab.pdfgen import canvas
 
 # Create your views here.
 from rest_framework import status, viewsets
 from rest_framework.exceptions import ErrorDetail
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.generics import GenericAPIView
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from services.notification import create_and_send_notification, send_push_notification
-from users.models import BackOfficeUser, Driver, Notification, WarehouseUser
-from utils.generate_pdf import generate_shipment_pdf
-
-from .models import AssociateCompany, Company, Shipment
+from services.dashboard import (
+    get_dashboard_stats,
+    refresh_dashboard_counter,
+    shipment_timeseries,
+    with_driver_total,
+)
+from services.ingestion import import_manifest, manifest_format
+from services.notification import create_and_send_notification
+from services.pdf_export import export_shipment_pdfs, shared_pool
+from services.pdf_jobs import queue_shipment_pdf
+from services.shipment_export import EXPORT_FORMATS, export_shipments
+from services.shipment_sync import sync_shipments
+from users.models import BackOfficeUser, Notification, WarehouseUser
+from utils.conditional import make_etag, not_modified
+from utils.pagination import KeysetPageNumberPagination
+from utils.response_cache import cache_response, user_scopes
+
+from .models import AssociateCompany, Company, DashboardCounter, Shipment
 from .permissions import IsBackofficeUser
 from .serializers import (
     AssociateCompanySerializer,
@@ -136,6 +157,7 @@ class CompanyEditView(APIView):
 class CompanyProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_response("company-profile", user_scopes)
     def get(self, request):
         user = request.user
         if user.user_type == "backoffice":
@@ -205,8 +227,43 @@ class AddContainersView(APIView):
                 )
 
 
-class ShipmentPagination(PageNumberPagination):
+class ContainerImportView(APIView):
+    """
+    Bulk import a vessel manifest: one container and queued shipment per row.
+
+    POST the manifest as a multipart ``file``, either CSV with a header row of
+    field names or JSON lines. Valid rows are written in batches; the response
+    counts them and lists the rejected rows with their errors.
+    """
+
+    permission_classes = [IsBackofficeUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload the manifest as 'file'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        file_format = manifest_format(upload.name, upload.content_type)
+        if file_format is None:
+            return Response(
+                {"error": "The manifest must be a .csv or .jsonl file."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = import_manifest(upload, file_format, request.user)
+        if not report["created"]:
+            if not report["failed"]:
+                report["error"] = "The manifest has no rows."
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+
+class ShipmentPagination(KeysetPageNumberPagination):
     page_size = 10  #
+    keyset_fields = ("-updated_at", "-id")
 
 
 class ShipmentView(GenericAPIView):
@@ -220,28 +277,23 @@ class ShipmentView(GenericAPIView):
     ordering_fields = ["created_at"]
     ordering = ["created_at"]
 
-    def get_queryset(self):
-        # Define your custom queryset based on your model relationships
-        queryset = Shipment.objects.filter(is_deleted=False)
+    def get_owned_queryset(self):
+        """The shipments of the requesting user, soft-deleted ones included."""
+        queryset = Shipment.objects.all()
 
+        # Filter through the role relation rather than fetching the Driver /
+        # WarehouseUser row first; a user without a profile simply matches nothing.
         if self.request.user.user_type == "driver":
-            try:
-                driver = Driver.objects.get(user=self.request.user)
-
-                queryset = queryset.filter(driver_id=driver)
-            except Driver.DoesNotExist:
-                # If the driver does not exist, return an empty queryset.
-                queryset = Shipment.objects.none()
+            queryset = queryset.filter(driver__user=self.request.user)
         if self.request.user.user_type == "warehouse":
-            try:
-                warehouse = WarehouseUser.objects.get(user=self.request.user)
-
-                queryset = queryset.filter(warehouse_id=warehouse)
-            except WarehouseUser.DoesNotExist:
-                # If the driver does not exist, return an empty queryset.
-                queryset = Shipment.objects.none()
+            queryset = queryset.filter(warehouse__user=self.request.user)
         if self.request.user.user_type == "backoffice":
             queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def get_queryset(self):
+        # Define your custom queryset based on your model relationships
+        queryset = self.get_owned_queryset().filter(is_deleted=False)
 
         timeframe = self.request.query_params.get("timeframe")
         # now = timezone.now().date()
@@ -338,46 +390,149 @@ class ShipmentView(GenericAPIView):
 
         return queryset
 
-    def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-
-        platform = request.headers.get("Platform")
-        search_param = request.query_params.get("search")
+    def search_and_filter(self, queryset):
+        search_param = self.request.query_params.get("search")
         if search_param:
             queryset = queryset.filter(
                 container__container_number__icontains=search_param
             )
 
         # Create a new QueryDict with the updated parameters
-        updated_query_params = QueryDict(request.META["QUERY_STRING"], mutable=True)
+        updated_query_params = QueryDict(
+            self.request.META["QUERY_STRING"], mutable=True
+        )
         # Apply custom filters based on the updated QueryDict
         queryset = queryset.order_by("-updated_at")
 
-        queryset = self.apply_custom_filters(queryset, updated_query_params)
-        # Paginate the queryset
+        return self.apply_custom_filters(queryset, updated_query_params)
+
+    def get_serializer_class(self):
+        if self.request.headers.get("Platform") == "mobile":
+            return ShipmentSerializerMobileView
+        return ShipmentSerializer
+
+    def list_etag(self, queryset):
+        """The list's ETag and its number of rows, from one aggregate query."""
+        # Any edit bumps updated_at and any insert or delete changes the count,
+        # so an unchanged tag means an unchanged list for this user and query.
+        stamp = queryset.aggregate(latest=Max("updated_at"), count=Count("id"))
+        etag = make_etag(
+            self.request.user.pk,
+            self.request.META.get("QUERY_STRING", ""),
+            self.request.headers.get("Platform", ""),
+            stamp["latest"],
+            stamp["count"],
+        )
+        return etag, stamp["count"]
 
-        page = self.paginate_queryset(queryset)
+    def get(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        queryset = self.search_and_filter(self.get_queryset())
+
+        # Answer unchanged polls before loading or serializing anything. Cursor
+        # pages carry no ETag: its stamp would aggregate the whole filtered set,
+        # which keyset pagination exists to avoid.
+        etag = count = None
+        if self.paginator is None or not self.paginator.is_keyset(request):
+            etag, count = self.list_etag(queryset)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+        # Join every relation the chosen serializer nests so a page costs a
+        # fixed number of queries regardless of how many rows it holds.
+        queryset = serializer_class.setup_eager_loading(queryset)
+        # Paginate the queryset, reusing the count of the ETag stamp
+
+        page = None
+        if self.paginator is not None:
+            page = self.paginator.paginate_queryset(
+                queryset, request, view=self, count=count
+            )
 
-        if platform == "mobile":
-            serializer = ShipmentSerializerMobileView(page, many=True)
-            return self.get_paginated_response(serializer.data)
         if page is not None:
-            serializer = ShipmentSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            serializer = serializer_class(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            serializer = serializer_class(queryset, many=True)
+            response = Response(serializer.data)
+        if etag is not None:
+            response["ETag"] = etag
+        return response
 
-        serializer = ShipmentSerializer(queryset, many=True)
-        return Response(serializer.data)
+
+class ShipmentExportView(ShipmentView):
+    """
+    Stream the backoffice user's shipments as a CSV, NDJSON or XLSX file.
+
+    Takes the filters of the shipment list (``status``, ``timeframe``,
+    ``search``) plus ``export_format`` (``csv``, the default, ``ndjson`` or
+    ``xlsx``). Rows are read through a cursor and written as they arrive, so
+    memory stays flat however many shipments match.
+    """
+
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        if request.user.user_type != "backoffice":
+            return Response(
+                {"error": "Only backoffice users can export shipments"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": "export_format must be one of csv, ndjson, xlsx"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.search_and_filter(self.get_queryset())
+        _, content_type, extension = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            export_shipments(queryset, export_format), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shipments.{extension}"'
+        )
+        return response
+
+
+class ShipmentSyncView(ShipmentView):
+    """
+    Delta sync of the user's shipments for the mobile apps.
+
+    Without ``since`` the response is a full sync (``reset``). Each response
+    carries a ``since`` token for the next request, which then returns only
+    the shipments changed after it, plus in ``deleted`` the ids of shipments
+    deleted or reassigned away from the user. While ``more`` is set the next
+    page is ready and should be requested right away.
+    """
+
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        owned = serializer_class.setup_eager_loading(self.get_owned_queryset())
+        try:
+            changes = sync_shipments(
+                request.user, owned, request.query_params.get("since")
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid sync token"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        changes["shipments"] = serializer_class(changes["shipments"], many=True).data
+        return Response(changes)
 
 
 class ShipmentGetUpdateDeleteView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
 
-    def get_object(self, pk):
+    def get_object(self, pk, serializer_class=ShipmentSerializer):
         try:
-            return Shipment.objects.select_related("container").get(
-                pk=pk, is_deleted=False
-            )
+            queryset = serializer_class.setup_eager_loading(Shipment.objects.all())
+            return queryset.select_related("created_by").get(pk=pk, is_deleted=False)
         # return Shipment.objects.get(pk=pk, is_deleted=False)
         except Shipment.DoesNotExist:
             return Response(
@@ -386,16 +541,25 @@ class ShipmentGetUpdateDeleteView(APIView):
 
     def get(self, request, pk, format=None):
         platform = request.headers.get("Platform")
-        shipment = self.get_object(pk)
-        if not shipment:
+        serializer_class = (
+            ShipmentSerializerMobileView if platform == "mobile" else ShipmentSerializer
+        )
+        shipment = self.get_object(pk, serializer_class)
+        if isinstance(shipment, Response):
             return Response(
                 {"error": "Shipment Does not exist"}, status=status.HTTP_404_NOT_FOUND
             )
-        if platform == "mobile":
-            serializer = ShipmentSerializerMobileView(shipment)
-            return Response(serializer.data)
-        serializer = ShipmentSerializer(shipment)
-        return Response(serializer.data)
+        # Revalidated against the fetched row: a 304 still skips serialization
+        # and URL signing, without a separate query for the stamp.
+        etag = make_etag(pk, platform, shipment.updated_at)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        serializer = serializer_class(shipment)
+        response = Response(serializer.data)
+        response["ETag"] = etag
+        return response
 
     def put(self, request, pk, format=None):
         current_user_type = request.user.user_type
@@ -474,10 +638,6 @@ class ShipmentGetUpdateDeleteView(APIView):
                 serializer_data["status"] = "Picked Up"
         if shipment_status == "Accepted":
             serializer_data["warehouse_accepted_date"] = timezone.now()
-            shipment.warehouse_accepted_date = timezone.now()
-            shipment.save()
-            generate_shipment_pdf(shipment)
-            shipment.save()
 
         if shipment_status == "Delivered":
             serializer_data["driver_delivered_date"] = timezone.now()
@@ -511,6 +671,9 @@ class ShipmentGetUpdateDeleteView(APIView):
         )
         if serializer.is_valid():
             serializer.save()
+            if shipment_status == "Accepted":
+                # Rendered and uploaded by the render_pdfs workers.
+                queue_shipment_pdf(shipment)
             logging.warning("Shipment SAVED")
             logging.warning(" Shipment Update Status")
             logging.warning(shipment.status)
@@ -603,8 +766,9 @@ class ShipmentGetUpdateDeleteView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BasicPagination(PageNumberPagination):
+class BasicPagination(KeysetPageNumberPagination):
     page_size = 10
+    keyset_fields = ("-updated_at", "-id")
 
 
 class CustomerShipmentsView(APIView):
@@ -613,7 +777,10 @@ class CustomerShipmentsView(APIView):
     def get(self, request):
         search = request.query_params.get("search", None)
         # Fetch all WarehouseUsers and AssociateCompanies
-        backoffice_user, _ = BackOfficeUser.objects.get_or_create(user=request.user)
+        # Preloaded by the authentication backend for token requests.
+        backoffice_user = getattr(request.user, "backoffice", None)
+        if backoffice_user is None:
+            backoffice_user, _ = BackOfficeUser.objects.get_or_create(user=request.user)
         company_id = backoffice_user.company_id
 
         warehouses_query = WarehouseUser.objects.all()
@@ -626,34 +793,74 @@ class CustomerShipmentsView(APIView):
                 associate_company_name__icontains=search
             )
 
-        # Fetch latest shipment for each WarehouseUser
-        for warehouse in warehouses_query:
-            latest_shipment = (
+        # Latest live shipment of each row, resolved by the database
+        def latest_shipment(owner_field):
+            return Subquery(
                 Shipment.objects.filter(
-                    warehouse=warehouse, status__in=["Picked Up", "Assigned"]
+                    **{owner_field: OuterRef("pk")},
+                    status__in=["Picked Up", "Assigned"],
+                    is_deleted=False,
                 )
                 .order_by("-updated_at")
-                .first()
+                .values("id")[:1]
             )
-            warehouse.latest_shipment = latest_shipment
 
-        # Fetch latest shipment for each AssociateCompany
-        for company in companies_query:
-            latest_shipment = (
-                Shipment.objects.filter(
-                    customer=company, status__in=["Picked Up", "Assigned"]
-                )
-                .order_by("-updated_at")
-                .first()
+        # Model fields come before annotations in the combined SELECT
+        columns = ("id", "updated_at", "type", "latest_shipment_id")
+        customers = (
+            warehouses_query.annotate(
+                type=Value("Warehouse", output_field=CharField()),
+                latest_shipment_id=latest_shipment("warehouse"),
+            )
+            .values_list(*columns)
+            .union(
+                companies_query.annotate(
+                    type=Value("Company", output_field=CharField()),
+                    latest_shipment_id=latest_shipment("customer"),
+                ).values_list(*columns),
+                all=True,
             )
-            company.latest_shipment = latest_shipment
+            .order_by("-updated_at", "type", "-id")
+        )
+
+        # Sort and paginate the merged rows in SQL; only the page is loaded
+        page = request.query_params.get("page", 1)
+        paginator = Paginator(customers, 10)  # Adjust page size as needed
+        try:
+            paginated_data = paginator.page(page)
+        except PageNotAnInteger:
+            # If page is not an integer, deliver first page.
+            paginated_data = paginator.page(1)
+        except EmptyPage:
+            # If page is out of range, deliver last page of results.
+            paginated_data = paginator.page(paginator.num_pages)
+        rows = list(paginated_data.object_list)
+
+        warehouses = WarehouseUser.objects.select_related("user", "company").in_bulk(
+            [row_id for row_id, _, row_type, _ in rows if row_type == "Warehouse"]
+        )
+        companies = AssociateCompany.objects.in_bulk(
+            [row_id for row_id, _, row_type, _ in rows if row_type == "Company"]
+        )
+        shipments = ShipmentUpdateSerializer.setup_eager_loading(
+            Shipment.objects.all()
+        ).in_bulk([shipment_id for _, _, _, shipment_id in rows if shipment_id])
+        warehouses_page, companies_page = [], []
+        for row_id, _, row_type, shipment_id in rows:
+            if row_type == "Warehouse":
+                customer = warehouses[row_id]
+                warehouses_page.append(customer)
+            else:
+                customer = companies[row_id]
+                companies_page.append(customer)
+            customer.latest_shipment = shipments.get(shipment_id)
 
         # Serialize data
         warehouse_data = CustomerWarehouseSerializer(
-            warehouses_query, many=True, context={"request": request}
+            warehouses_page, many=True, context={"request": request}
         ).data
         company_data = CustomerCompanySerializer(
-            companies_query, many=True, context={"request": request}
+            companies_page, many=True, context={"request": request}
         ).data
 
         combined_data = []
@@ -697,22 +904,12 @@ class CustomerShipmentsView(APIView):
                     "updated_at": company.get("updated_at"),
                 }
             )
-            # Sort the combined data by 'updated_at' in descending order
-        sorted_combined_data = sorted(
-            combined_data, key=lambda x: parse(x["updated_at"]), reverse=True
-        )
-
-        # Implement manual pagination on the sorted_combined_data
-        page = request.query_params.get("page", 1)
-        paginator = Paginator(sorted_combined_data, 10)  # Adjust page size as needed
-        try:
-            paginated_data = paginator.page(page)
-        except PageNotAnInteger:
-            # If page is not an integer, deliver first page.
-            paginated_data = paginator.page(1)
-        except EmptyPage:
-            # If page is out of range, deliver last page of results.
-            paginated_data = paginator.page(paginator.num_pages)
+        # Restore the SQL order across the two serialized sources
+        position = {
+            (row_type, row_id): index
+            for index, (row_id, _, row_type, _) in enumerate(rows)
+        }
+        combined_data.sort(key=lambda item: position[(item["type"], item["id"])])
 
         # Construct the paginated response manually
         return Response(
@@ -720,7 +917,7 @@ class CustomerShipmentsView(APIView):
                 "count": paginator.count,
                 "next": paginated_data.has_next(),
                 "previous": paginated_data.has_previous(),
-                "results": paginated_data.object_list,
+                "results": combined_data,
             }
         )
         # return paginator.get_paginated_response(sorted_combined_data)
@@ -734,7 +931,7 @@ class CustomerShipmentsHistoryView(APIView):
         shipment_type = request.query_params.get("type")
         status = request.query_params.get("status")
         container_number = request.query_params.get("container_number", None)
-        shipments_query = Shipment.objects.all()
+        shipments_query = Shipment.objects.filter(is_deleted=False)
 
         # Default status filters if not provided
         if not status:
@@ -759,6 +956,8 @@ class CustomerShipmentsHistoryView(APIView):
 
         # serializer = ShipmentSerializer(shipments, many=True)
 
+        shipments_query = ShipmentSerializer.setup_eager_loading(shipments_query)
+
         paginator = BasicPagination()
         paginated_shipments = paginator.paginate_queryset(shipments_query, request)
         serializer = ShipmentSerializer(
@@ -772,33 +971,135 @@ class DashboardStatsAPIView(APIView):
     permission_classes = [IsBackofficeUser]
 
     def get(self, request, *args, **kwargs):
-        backoffice_user, _ = BackOfficeUser.objects.get_or_create(user=request.user)
-        company_id = backoffice_user.company_id
-
-        today = timezone.now().date()
-        today_shipment_count = Shipment.objects.filter(
-            created_at__date=today, created_by=request.user, is_deleted=False
-        ).count()
-        total_shipment_count = Shipment.objects.filter(
-            created_by=request.user, is_deleted=False
-        ).count()
-
-        total_driver_count = Driver.objects.all().count()
-        associate_company_count = AssociateCompany.objects.filter(
-            company_id=company_id
-        ).count()
-
-        shipment_history_count = Shipment.objects.filter(
-            created_at__lte=today, created_by=request.user, is_deleted=False
-        ).count()
-
-        stats = {
-            "today_shipment": today_shipment_count,
-            "total_shipment": total_shipment_count,
-            "total_driver": total_driver_count,
-            "associate_company": associate_company_count,
-            "shipment_history": shipment_history_count,
-        }
+        # Counters are kept current by backoffice.signals; the first visit
+        # of a user computes them once.
+        counter = with_driver_total(
+            DashboardCounter.objects.filter(pk=request.user.pk)
+        ).first()
+        if counter is None or counter.total_driver is None:
+            counter, _ = refresh_dashboard_counter(request.user)
+        stats = get_dashboard_stats(counter)
 
         serializer = DashboardStatsSerializer(stats)
         return Response(serializer.data)
+
+
+class DashboardTimeseriesAPIView(APIView):
+    """
+    Shipments created, picked up, delivered and accepted per day or month.
+
+    Query parameters: ``interval`` (``day`` or ``month``, the default) and
+    ``from`` / ``to`` (YYYY-MM-DD, inclusive). Without dates the last 12 months,
+    or the last 30 days, are returned. Figures come from DailyShipmentRollup
+    and are as fresh as the last ``rollup_shipments`` run.
+    """
+
+    permission_classes = [IsBackofficeUser]
+    max_days = {"day": 366, "month": 3660}
+
+    def get(self, request, *args, **kwargs):
+        interval = request.query_params.get("interval", "month")
+        if interval not in self.max_days:
+            return Response(
+                {"error": "interval must be 'day' or 'month'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            date_to = request.query_params.get("to")
+            end = (
+                datetime.strptime(date_to, "%Y-%m-%d").date()
+                if date_to
+                else timezone.localdate()
+            )
+            date_from = request.query_params.get("from")
+            if date_from:
+                start = datetime.strptime(date_from, "%Y-%m-%d").date()
+            elif interval == "month":
+                start = end.replace(day=1) - relativedelta(months=11)
+            else:
+                start = end - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {"error": "Dates must be formatted as YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start > end or (end - start).days >= self.max_days[interval]:
+            return Response(
+                {"error": f"The range must span 1 to {self.max_days[interval]} days"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        backoffice_user = getattr(request.user, "backoffice", None)
+        company_id = backoffice_user.company_id if backoffice_user else None
+        return Response(
+            {
+                "interval": interval,
+                "from": start,
+                "to": end,
+                "results": shipment_timeseries(company_id, start, end, interval),
+            }
+        )
+
+
+class ShipmentPdfExportView(APIView):
+    """
+    Stream the shipment detail PDFs of the backoffice user as one zip archive.
+
+    Optional filters: ``from`` / ``to`` (YYYY-MM-DD, inclusive, on the creation
+    date) and ``status`` (comma separated status names).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.user_type != "backoffice":
+            return Response(
+                {"error": "Only backoffice users can export shipments"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        queryset = Shipment.objects.filter(is_deleted=False, created_by=request.user)
+
+        try:
+            date_from = request.query_params.get("from")
+            if date_from:
+                start = datetime.strptime(date_from, "%Y-%m-%d")
+                queryset = queryset.filter(created_at__gte=timezone.make_aware(start))
+            date_to = request.query_params.get("to")
+            if date_to:
+                end = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+                queryset = queryset.filter(created_at__lt=timezone.make_aware(end))
+        except ValueError:
+            return Response(
+                {"error": "Dates must be formatted as YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        status_param = request.query_params.get("status")
+        if status_param:
+            try:
+                statuses = [
+                    ShipmentStatus[name.strip()].value
+                    for name in status_param.split(",")
+                ]
+            except KeyError:
+                return Response(
+                    {"error": "Invalid status value."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(status__in=statuses)
+
+        if not queryset.exists():
+            return Response(
+                {"error": "No shipments to export"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Rendered on this process's long-lived pool, never one per request.
+        workers = settings.PDF_EXPORT_WORKERS
+        pool = shared_pool(workers) if workers > 1 else None
+        response = StreamingHttpResponse(
+            export_shipment_pdfs(queryset, workers, pool),
+            content_type="application/zip",
+        )
+        response["Content-Disposition"] = 'attachment; filename="shipments.zip"'
+        return response
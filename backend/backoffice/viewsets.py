@@ -3,6 +3,7 @@ from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from users.models import BackOfficeUser, Driver, WarehouseUser
+from utils.response_cache import cache_response
 
 from .models import AssociateCompany, Company
 from .permissions import IsBackofficeUser
@@ -21,6 +22,10 @@ class AssociateCompanyViewSet(viewsets.ModelViewSet):
     permission_classes = [IsBackofficeUser]
     pagination_class = None
 
+    @cache_response("associate-company-list", lambda request: ["associate-companies"])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         user_id = request.data.get("user_id")
 
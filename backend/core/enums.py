@@ -8,3 +8,18 @@ class ShipmentStatus(Enum):
     DELIVERED = "Delivered"
     ACCEPTED = "Accepted"
     RETURNED_EMPTY = "Returned Empty"
+
+
+class PdfStatus(Enum):
+    NONE = "None"
+    QUEUED = "Queued"
+    RENDERING = "Rendering"
+    READY = "Ready"
+    FAILED = "Failed"
+
+
+class ShipmentMilestone(Enum):
+    CREATED = "created"
+    PICKED_UP = "picked_up"
+    DELIVERED = "delivered"
+    ACCEPTED = "accepted"
@@ -62,7 +62,7 @@ urlpatterns = [
     path(
         "delete-all/notifications/",
         DeleteAllNotification.as_view(),
-        name="mark-notification-read",
+        name="delete-all-notifications",
     ),
     path("delete-user/", DeleteUserAPIView.as_view(), name="delete-user"),
 ]
@@ -10,8 +10,6 @@ from django.shortcuts import get_object_or_404, render
 from django.template.loader import render_to_string
 from django.utils.encoding import force_bytes, force_text
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
-from google.auth.transport import requests
-from google.oauth2 import id_token
 from home.api.v1.serializers import (
     BackOfficeUserSerializer,
     ChangePasswordSerializer,
@@ -31,15 +29,22 @@ from rest_framework.exceptions import ErrorDetail
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from services.google_outh import exchange_code_for_tokens, get_user_info_from_google
+from services.google_outh import (
+    GoogleUnavailable,
+    exchange_code_for_tokens,
+    get_user_info,
+    get_user_info_from_tokens,
+)
+from services.notification import delete_all_notifications, mark_all_read
+from users.authentication import forget_user
 from users.models import (
     BackOfficeUser,
     Device,
     Driver,
-    Notification,
     User,
     WarehouseUser,
 )
+from utils.response_cache import cache_response, user_scopes
 
 
 class ChangePasswordView(APIView):
@@ -197,6 +202,15 @@ class UserResetPasswordView(generics.CreateAPIView):
             )
 
 
+def google_unavailable(error):
+    # An outage on Google's side, not a bad token: the client should retry.
+    logging.error("Google unavailable: %s", error)
+    return Response(
+        {"error": "Google sign-in is unavailable, please try again later"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
 class GoogleLoginView(APIView):
     def post(self, request):
         serializer = GoogleAuthSerializer(data=request.data)
@@ -206,7 +220,16 @@ class GoogleLoginView(APIView):
 
         if platform == "mobile":
             user_type = request.data["user_type"]
-            user_info_response = get_user_info_from_google(token)
+            try:
+                # ID tokens are verified locally; access tokens ask Google.
+                user_info_response = get_user_info(token)
+            except GoogleUnavailable as error:
+                return google_unavailable(error)
+            except ValueError as error:
+                logging.error("Invalid token: %s", error)
+                return Response(
+                    {"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST
+                )
 
             if "error" in user_info_response:
                 logging.error(
@@ -302,8 +325,7 @@ class GoogleLoginView(APIView):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                access_token = tokens_response.get("access_token")
-                user_info_response = get_user_info_from_google(access_token)
+                user_info_response = get_user_info_from_tokens(tokens_response)
 
                 if "error" in user_info_response:
                     logging.error(
@@ -347,6 +369,8 @@ class GoogleLoginView(APIView):
                         {"error": "User does not exist. Please sign up."},
                         status=status.HTTP_404_NOT_FOUND,
                     )
+            except GoogleUnavailable as error:
+                return google_unavailable(error)
             except ValueError:
                 # Invalid token
                 logging.error("Invalid token")
@@ -374,8 +398,7 @@ class GoogleSignUpView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            access_token = tokens_response.get("access_token")
-            user_info_response = get_user_info_from_google(access_token)
+            user_info_response = get_user_info_from_tokens(tokens_response)
             if "error" in user_info_response:
                 logging.error(
                     "Error fetching user info from Google API: %s",
@@ -439,6 +462,8 @@ class GoogleSignUpView(APIView):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
+        except GoogleUnavailable as error:
+            return google_unavailable(error)
         except ValueError:
             # Invalid token
             logging.error("Invalid token")
@@ -491,6 +516,7 @@ class ContactUsView(APIView):
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_response("user-profile", user_scopes)
     def get(self, request, *args, **kwargs):
         user = request.user
         platform = request.headers.get("platform")
@@ -521,6 +547,7 @@ class UserLogoutView(APIView):
         ).first()
         if device:
             device.delete()
+        forget_user(request.user.pk)
         return Response(
             {"success": "User Logout successfully"}, status=status.HTTP_200_OK
         )
@@ -530,8 +557,8 @@ class MarkNotificationReadView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        # Mark all notifications for the user as read
-        Notification.objects.filter(recipient=request.user).update(read=True)
+        # Mark all notifications for the user as read, a chunk at a time
+        mark_all_read(request.user.id)
         return Response(
             {
                 "success": "All notifications have been marked as read.",
@@ -545,8 +572,8 @@ class DeleteAllNotification(APIView):
 
     def post(self, request, *args, **kwargs):
         logging.info(f"Received method: {request.method}")
-        # Mark all notifications for the user as read
-        Notification.objects.filter(recipient=request.user).delete()
+        # Delete all notifications of the user, a chunk at a time
+        delete_all_notifications(request.user.id)
         return Response(
             {
                 "success": "All notifications have been deleted.",
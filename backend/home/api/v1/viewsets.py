@@ -1,6 +1,7 @@
 import logging
 
 from backoffice.permissions import IsDriverUser, IsWarehouseUser
+from django.db import transaction
 from home.api.v1.serializers import (
     BackOfficeUserSerializer,
     DeviceSerializer,
@@ -15,11 +16,22 @@ from home.api.v1.serializers import (
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.decorators import action
 from rest_framework.exceptions import ErrorDetail
 from rest_framework.permissions import IsAuthenticated  # Import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet, ViewSet
-from users.models import Device, Driver, Feedback, Notification, WarehouseUser
+from services.notification import get_unread_count, mirror_changed, unread_changed
+from users.models import (
+    Device,
+    Driver,
+    Feedback,
+    MirrorOutbox,
+    Notification,
+    WarehouseUser,
+)
+from utils.pagination import KeysetPageNumberPagination
+from utils.response_cache import cache_response
 
 from .serializers import DriverSerializer, WarehouseUserSerializer
 
@@ -164,6 +176,10 @@ class DriverViewSet(ModelViewSet):
     permission_classes = [IsDriverUser]
     pagination_class = None
 
+    @cache_response("driver-list", lambda request: ["drivers"])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class WarehouseViewSet(ModelViewSet):
     queryset = WarehouseUser.objects.all()
@@ -181,10 +197,16 @@ class FeedbackViewSet(ModelViewSet):
         serializer.save(email=self.request.user.email)
 
 
+class NotificationPagination(KeysetPageNumberPagination):
+    page_size = 10
+    keyset_fields = ("-created_at", "-id")
+
+
 class NotificationViewSet(ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]  # En
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         queryset = Notification.objects.filter(recipient=self.request.user).order_by(
@@ -198,11 +220,50 @@ class NotificationViewSet(ModelViewSet):
 
         return queryset
 
+    def locked_state(self, notification):
+        # Lock the row so concurrent edits count from each other's result.
+        return (
+            Notification.objects.select_for_update()
+            .values_list("recipient_id", "read")
+            .get(pk=notification.pk)
+        )
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            notification = serializer.save()
+            unread_changed(None, (notification.recipient_id, notification.read))
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            before = self.locked_state(serializer.instance)
+            notification = serializer.save()
+            unread_changed(before, (notification.recipient_id, notification.read))
+            mirror_changed(
+                notification.recipient_id,
+                MirrorOutbox.MARK_READ,
+                [notification.id],
+                read=notification.read,
+            )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            before = self.locked_state(instance)
+            notification_id = instance.id
+            instance.delete()
+            unread_changed(before, None)
+            # Queued in the delete's transaction: the mirror is only changed
+            # once the row is gone for good.
+            mirror_changed(before[0], MirrorOutbox.DELETE, [notification_id])
+
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request, *args, **kwargs):
+        return Response({"unread_count": get_unread_count(request.user.pk)})
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
 
-        # Here we calculate the count of unread notifications
-        unread_count = queryset.filter(read=False).count()
+        # Kept current on every write, so the badge costs a primary key read.
+        unread_count = get_unread_count(request.user.pk)
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -0,0 +1,20 @@
+from django.conf import settings
+from google.oauth2 import service_account
+from storages.backends.gcloud import GoogleCloudStorage as BaseGoogleCloudStorage
+
+
+class GoogleCloudStorage(BaseGoogleCloudStorage):
+    """
+    Builds the service account credentials from GOOGLE_SERVICE_ACCOUNT_CONFIG
+    when the storage is first used rather than when settings are imported.
+    """
+
+    def get_default_settings(self):
+        defaults = super().get_default_settings()
+        if defaults["credentials"] is None and settings.GOOGLE_SERVICE_ACCOUNT_CONFIG:
+            defaults["credentials"] = (
+                service_account.Credentials.from_service_account_info(
+                    settings.GOOGLE_SERVICE_ACCOUNT_CONFIG
+                )
+            )
+        return defaults
@@ -0,0 +1,94 @@
+import tempfile
+import time
+
+from backoffice.models import Container
+from backoffice.serializers import ContainerSerializer, ShipmentContainersSerializer
+from core.enums import ShipmentStatus
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from services.ingestion import IMPORT_CHUNK_SIZE, import_manifest
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure manifest ingestion against the previous one-serializer-per-row "
+        "path. Everything written is rolled back."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--per-row-limit",
+            type=int,
+            default=10_000,
+            help="Largest manifest also imported row by row, which is slow.",
+        )
+
+    def handle(self, *args, **options):
+        for rows in options["rows"]:
+            try:
+                with transaction.atomic():
+                    self.run(rows, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, rows, options):
+        user = User.objects.create(
+            username="bench-import@example.com",
+            email="bench-import@example.com",
+            user_type="backoffice",
+        )
+        with tempfile.TemporaryFile() as manifest:
+            manifest.write(b"container_number,size,type,scac,vessel_name,voyage\n")
+            for i in range(rows):
+                manifest.write(f"BNCH{i:07d},40,HC,MSCU,Bench Vessel,{i}\n".encode())
+            manifest.seek(0)
+            start = time.perf_counter()
+            report = import_manifest(
+                manifest, "csv", user, chunk_size=options["chunk_size"]
+            )
+            self.report("chunked bulk import", report["created"], start)
+
+        if rows > options["per_row_limit"]:
+            return
+        Container.objects.filter(container_number__startswith="BNCH").delete()
+        start = time.perf_counter()
+        for i in range(rows):
+            serializer = ContainerSerializer(
+                data={
+                    "container_number": f"BNCH{i:07d}",
+                    "size": "40",
+                    "type": "HC",
+                    "scac": "MSCU",
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+            container = serializer.save()
+            shipment = ShipmentContainersSerializer(
+                data=[
+                    {
+                        "container": container.id,
+                        "status": ShipmentStatus.CONTAINER_QUEUED.value,
+                        "created_by": user.id,
+                        "vessel_name": "Bench Vessel",
+                        "voyage": str(i),
+                    }
+                ],
+                many=True,
+            )
+            shipment.is_valid(raise_exception=True)
+            shipment.save()
+        self.report("one serializer per row", rows, start)
+
+    def report(self, label, rows, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label:25} {rows:7} rows, {elapsed:7.2f} s, {rows / elapsed:8.0f} rows/s"
+        )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+from services.pdf_export import default_workers, render_documents
+from utils.streaming import stream_zip
+
+
+def synthetic_documents(count):
+    for index in range(count):
+        lines = [f"Container: CONT{index:05d}"] + [
+            f"Field {line}: value {index}-{line}" for line in range(30)
+        ]
+        yield (f"shipment_details_{index}.pdf", f"Shipment Details {index}", lines)
+
+
+class Command(BaseCommand):
+    help = "Compare bulk PDF export throughput for different worker counts."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--documents", type=int, default=300)
+        parser.add_argument(
+            "--workers",
+            default=f"1,2,{default_workers()}",
+            help="Comma separated worker counts to compare.",
+        )
+
+    def handle(self, *args, **options):
+        for workers in sorted({int(count) for count in options["workers"].split(",")}):
+            start = time.perf_counter()
+            size = 0
+            chunks = stream_zip(
+                render_documents(synthetic_documents(options["documents"]), workers)
+            )
+            for chunk in chunks:
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{workers:3} worker(s): {options['documents']} PDFs in {elapsed:6.2f} s"
+                f" ({options['documents'] / elapsed:6.1f} PDFs/s, {size // 1024} KiB zip)"
+            )
@@ -0,0 +1,138 @@
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from firebase_admin import messaging
+from services import fcm
+from services import notification as notification_service
+from services.firebase_mirror import InMemoryTransport, mirror
+from users.models import Device, NotificationOutbox, User
+from utils.outbound import CircuitBreaker
+
+
+class Rollback(Exception):
+    pass
+
+
+class FakeFCM:
+    """``messaging.send_each_for_multicast`` taking ``latency`` per call."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.pushes = 0
+
+    def send_each_for_multicast(self, message, app=None):
+        time.sleep(self.latency)
+        self.requests += 1
+        self.pushes += len(message.tokens)
+        return messaging.BatchResponse(
+            [messaging.SendResponse({"name": token}, None) for token in message.tokens]
+        )
+
+
+def send_push_notification(user, title, message, notification, shipment_id):
+    """The synchronous send the dispatcher replaced, kept as the baseline."""
+    registration_ids = list(
+        Device.objects.filter(user=user).values_list("registration_id", flat=True)
+    )
+    result = fcm.send_multicast(
+        registration_ids,
+        title,
+        message,
+        {"type": notification.type, "shipment_id": shipment_id},
+    )
+    mirror.created(notification)
+    mirror.flush()
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure push throughput against a fake FCM with a fixed latency. "
+        "Everything written is rolled back."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--recipients", type=int, default=200)
+        parser.add_argument(
+            "--notifications",
+            type=int,
+            default=1000,
+            help="Notifications queued; payloads repeat across recipients.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.02,
+            help="Simulated FCM round trip in seconds.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Only FCM is measured; the Firebase mirror is kept in memory.
+        server = FakeFCM(options["latency"])
+        with mock.patch.object(
+            messaging, "send_each_for_multicast", server.send_each_for_multicast
+        ), mock.patch("utils.firebase.firebase_app"), mock.patch.object(
+            fcm, "breaker", CircuitBreaker()
+        ), mock.patch.object(
+            mirror, "transport", InMemoryTransport()
+        ):
+            try:
+                with transaction.atomic():
+                    self.run(server, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, server, options):
+        User.objects.bulk_create(
+            User(username=f"bench-{i}@example.com", email=f"bench-{i}@example.com")
+            for i in range(options["recipients"])
+        )
+        users = list(User.objects.filter(username__startswith="bench-"))
+        Device.objects.bulk_create(
+            Device(user=user, registration_id=f"token-{user.pk}") for user in users
+        )
+        notifications = [
+            notification_service.create_and_send_notification(
+                users[i % len(users)],
+                f"CONT{i % 50:05d}",
+                f"Container {i % 50} has been Picked Up.",
+                "Picked Up",
+                None,
+            )
+            for i in range(options["notifications"])
+        ]
+
+        start = time.perf_counter()
+        for notification in notifications:
+            # One request per notification, as before batching.
+            send_push_notification(
+                notification.recipient,
+                notification.title,
+                notification.message,
+                notification,
+                None,
+            )
+        self.report("one request per notification", server, start, notifications)
+
+        server.requests = server.pushes = 0
+        start = time.perf_counter()
+        while notification_service.dispatch_notifications(options["batch_size"]):
+            pass
+        self.report("batched dispatcher", server, start, notifications)
+        pending = NotificationOutbox.objects.filter(status=NotificationOutbox.PENDING)
+        self.stdout.write(f"outbox rows left pending: {pending.count()}")
+
+    def report(self, label, server, start, notifications):
+        # Identical payloads for the same device are merged by the dispatcher,
+        # so throughput is counted in notifications delivered, not device hits.
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label:30} {len(notifications):6} notifications,"
+            f" {server.requests:5} requests, {server.pushes:6} device pushes,"
+            f" {elapsed:6.2f} s, {len(notifications) / elapsed:7.0f} pushes/s"
+        )
@@ -0,0 +1,72 @@
+import time
+
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from utils import aws
+
+
+class Command(BaseCommand):
+    help = "Measure the cost of presigning the media URLs of one shipment page."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--rows", type=int, default=10, help="Rows per page.")
+        parser.add_argument(
+            "--urls-per-row",
+            type=int,
+            default=5,
+            help="Signed URLs per row (3 shipment files + nested profile pictures).",
+        )
+        parser.add_argument("--pages", type=int, default=20, help="Pages to time.")
+
+    def handle(self, *args, **options):
+        credentials = {
+            "bucket_name": settings.AWS_STORAGE_BUCKET_NAME or "benchmark-bucket",
+            "access_key_id": settings.AWS_ACCESS_KEY_ID or "AKIABENCHMARK",
+            "secret_access_key": settings.AWS_SECRET_ACCESS_KEY or "benchmark",
+            "region_name": settings.AWS_STORAGE_REGION or "us-east-1",
+        }
+        keys = [
+            f"media/shipment/{row}/{url}.pdf"
+            for row in range(options["rows"])
+            for url in range(options["urls_per_row"])
+        ]
+
+        def per_session(key):
+            # What every call did before the client and URLs were shared.
+            session = boto3.Session(
+                aws_access_key_id=credentials["access_key_id"],
+                aws_secret_access_key=credentials["secret_access_key"],
+                region_name=credentials["region_name"],
+            )
+            return session.client("s3").generate_presigned_url(
+                "get_object",
+                Params={"Bucket": credentials["bucket_name"], "Key": key},
+                ExpiresIn=aws.SIGNED_URL_EXPIRES_IN,
+            )
+
+        def shared(key):
+            return aws.generate_signed_url(object_key=key, **credentials)
+
+        def cold(key):
+            aws._signed_urls.clear()
+            return shared(key)
+
+        aws.clear_signed_url_cache()
+        shared(keys[0])  # build the shared client outside the timings
+        for label, sign in (
+            ("new client per URL", per_session),
+            ("shared client, no cache hits", cold),
+            ("shared client, cached URLs", shared),
+        ):
+            timings = []
+            for _ in range(options["pages"]):
+                start = time.perf_counter()
+                for key in keys:
+                    sign(key)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            self.stdout.write(
+                f"{label:30} median {timings[len(timings) // 2] * 1000:8.2f} ms/page"
+                f"  ({len(keys)} URLs)"
+            )
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+# Run in a fresh interpreter: what a new instance does before its first request.
+# -X importtime only logs imports made through __import__, and Django loads
+# settings, apps and models with importlib.import_module, so that is routed
+# through __import__ first; otherwise those modules would have no importer.
+STARTUP_SCRIPT = """
+import importlib
+import importlib.util
+import sys
+import time
+
+def import_module(name, package=None):
+    name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+
+importlib.import_module = import_module
+start = time.perf_counter()
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+import_module(settings.ROOT_URLCONF)
+print(time.perf_counter() - start)
+"""
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+
+class Module:
+    def __init__(self, name, self_us, level):
+        self.name = name
+        self.self_us = self_us
+        self.level = level
+        self.children = []
+
+
+def parse_importtime(output):
+    """
+    Turn ``python -X importtime`` output into a forest of Modules.
+
+    Each module is printed after the modules it imported, indented one level
+    deeper, so the lines are read with a stack of pending children.
+    """
+    stack = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, _, indent, name = match.groups()
+        module = Module(name, int(self_us), (len(indent) - 1) // 2)
+        while stack and stack[-1].level > module.level:
+            module.children.insert(0, stack.pop())
+        stack.append(module)
+    return stack
+
+
+def owner_of(name, owners):
+    for owner, package in owners:
+        if name == package or name.startswith(package + "."):
+            return owner
+    return None
+
+
+def attribute(roots, owners, default="(other)"):
+    """
+    Microseconds spent importing modules, per owner.
+
+    ``owners`` is a list of ``(label, package)``, most specific package first.
+    A module is charged to the owner of its package or, failing that, to the
+    owner of the closest module that imported it, so third-party libraries
+    count against the app that pulled them in.
+    """
+    totals = {}
+    pending = [(root, default) for root in roots]
+    while pending:
+        module, owner = pending.pop()
+        owner = owner_of(module.name, owners) or owner
+        totals[owner] = totals.get(owner, 0) + module.self_us
+        pending.extend((child, owner) for child in module.children)
+    return totals
+
+
+def measure_startup(environment=None):
+    """
+    Start a fresh interpreter under ``-X importtime`` and return its startup
+    time in seconds and the Modules it imported.
+    """
+    environment = dict(
+        os.environ if environment is None else environment,
+        DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise CommandError(result.stderr.strip().splitlines()[-1])
+    wall = float(result.stdout.strip().splitlines()[-1])
+    return wall, parse_importtime(result.stderr)
+
+
+def startup_owners():
+    owners = [(config.label, config.name) for config in apps.get_app_configs()]
+    owners.append(("settings", settings.SETTINGS_MODULE))
+    owners.append(("urls", settings.ROOT_URLCONF))
+    # Nested packages (django.contrib.admin) before their parents (django).
+    return sorted(owners, key=lambda owner: -owner[1].count("."))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start: import time per installed app when a fresh "
+        "interpreter loads settings, the WSGI application and the URLconf."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the medians as JSON, for tracking across releases.",
+        )
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            help=(
+                "Fail when the median import time exceeds this many "
+                "milliseconds; for a CI job on a known machine."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        owners = startup_owners()
+        walls, runs = [], []
+        for _ in range(options["runs"]):
+            wall, roots = measure_startup()
+            walls.append(wall)
+            runs.append(attribute(roots, owners))
+
+        labels = {label for run in runs for label in run}
+        medians = {
+            label: statistics.median(run.get(label, 0) for run in runs) / 1000
+            for label in labels
+        }
+        wall = statistics.median(walls) * 1000
+        imports = statistics.median(sum(run.values()) for run in runs) / 1000
+        if options["json"]:
+            self.stdout.write(
+                json.dumps(
+                    {
+                        "startup_ms": round(wall, 1),
+                        "total_imports_ms": round(imports, 1),
+                        "imports_ms": {
+                            label: round(value, 1) for label, value in medians.items()
+                        },
+                    }
+                )
+            )
+        else:
+            self.report(medians, wall, imports, len(runs))
+        if options["budget_ms"] is not None and imports > options["budget_ms"]:
+            raise CommandError(
+                f"Imports took {imports:.1f} ms, over the budget of "
+                f"{options['budget_ms']:g} ms"
+            )
+
+    def report(self, medians, wall, imports, runs):
+        for label, elapsed in sorted(medians.items(), key=lambda item: -item[1]):
+            self.stdout.write(f"{label:25} {elapsed:9.1f} ms")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"startup {wall:.1f} ms, imports {imports:.1f} ms including "
+                f"interpreter start (median of {runs} runs)"
+            )
+        )
@@ -0,0 +1,62 @@
+import time
+
+from backoffice.models import Company
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from users.authentication import CachedTokenAuthentication
+from users.models import BackOfficeUser, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request authentication cost, including the role lookups "
+        "views make, with and without the cached token backend. Everything "
+        "written is rolled back."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["requests"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, requests):
+        company = Company.objects.create(company_name="Bench")
+        user = User.objects.create(
+            username="bench-auth@example.com",
+            email="bench-auth@example.com",
+            user_type="backoffice",
+        )
+        BackOfficeUser.objects.create(user=user, company=company)
+        key = Token.objects.create(user=user).key
+        cache.clear()
+
+        for label, backend in (
+            ("TokenAuthentication", TokenAuthentication()),
+            ("CachedTokenAuthentication", CachedTokenAuthentication()),
+        ):
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(requests):
+                    user, _ = backend.authenticate_credentials(key)
+                    # What views do next with request.user.
+                    if hasattr(user, "backoffice"):
+                        user.backoffice.company.company_name
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{label:26} {len(queries) / requests:4.2f} queries/request,"
+                f" {1000 * elapsed / requests:6.3f} ms/request"
+            )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+from services.notification import dispatch_mirror_changes, dispatch_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued push notifications and Firebase mirror changes from "
+        "their outboxes."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Outbox rows claimed per transaction.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when there is nothing to deliver.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the due rows once and exit instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        total = changes = 0
+        try:
+            while True:
+                processed = dispatch_notifications(options["batch_size"])
+                mirrored = dispatch_mirror_changes(options["batch_size"])
+                total += processed
+                changes += mirrored
+                if processed or mirrored:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {total} notification(s), {changes} mirror change(s)."
+            )
+        )
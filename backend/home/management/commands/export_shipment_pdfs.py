@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from backoffice.models import Shipment
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+from services.pdf_export import default_workers, export_shipment_pdfs
+
+
+class Command(BaseCommand):
+    help = "Write the shipment detail PDFs of a date range into one zip archive."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("output", help="Path of the zip archive to write.")
+        parser.add_argument(
+            "--email", help="Only shipments created by this backoffice user."
+        )
+        parser.add_argument(
+            "--from", dest="date_from", help="First creation date, YYYY-MM-DD."
+        )
+        parser.add_argument(
+            "--to", dest="date_to", help="Last creation date, YYYY-MM-DD."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=default_workers(),
+            help="Rendering processes (defaults to the number of CPU cores).",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Shipment.objects.filter(is_deleted=False)
+        if options["email"]:
+            queryset = queryset.filter(created_by__email=options["email"])
+        try:
+            if options["date_from"]:
+                start = datetime.strptime(options["date_from"], "%Y-%m-%d")
+                queryset = queryset.filter(created_at__gte=timezone.make_aware(start))
+            if options["date_to"]:
+                end = datetime.strptime(options["date_to"], "%Y-%m-%d")
+                queryset = queryset.filter(
+                    created_at__lt=timezone.make_aware(end + timedelta(days=1))
+                )
+        except ValueError:
+            raise CommandError("Dates must be formatted as YYYY-MM-DD")
+
+        size = 0
+        with open(options["output"], "wb") as archive:
+            for chunk in export_shipment_pdfs(queryset, options["workers"]):
+                archive.write(chunk)
+                size += len(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}.")
+        )
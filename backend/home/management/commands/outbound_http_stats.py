@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandParser
+from utils.cache import is_shared_cache
+from utils.outbound import LATENCY_BUCKETS, latency_percentile, outbound_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the per-host counters and latencies of outbound HTTP calls (FCM, "
+        "Google). Counters are flushed to the cache in batches, so they span "
+        "processes only with a shared CACHE_URL or REDIS_URL."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters after reading."
+        )
+
+    def describe_latency(self, stats):
+        if not stats["requests"]:
+            return "no requests"
+        parts = [f"avg {stats['latency_ms'] / stats['requests']:.1f}ms"]
+        for label, fraction in (("p50", 0.5), ("p95", 0.95)):
+            bound = latency_percentile(stats, fraction)
+            if bound is None:
+                parts.append(f"{label} >{LATENCY_BUCKETS[-1]}ms")
+            else:
+                parts.append(f"{label} <={bound}ms")
+        return " ".join(parts)
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            self.stderr.write(
+                "The cache is local to this process: only the calls made by "
+                "this command are shown. Set CACHE_URL or REDIS_URL."
+            )
+        for host, stats in outbound_stats(reset=options["reset"]).items():
+            self.stdout.write(
+                f"{host:35} {stats['requests']:8} requests {stats['errors']:6} errors"
+                f" {stats['retries']:6} retries {stats['rejected']:6} rejected "
+                + self.describe_latency(stats)
+            )
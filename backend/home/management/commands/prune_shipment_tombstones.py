@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from services.shipment_sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete shipment sync tombstones older than the retention period. "
+        "Clients that last synced before it start over with a full sync. Meant "
+        "to run daily from a scheduler."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstone(s)."))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.utils import timezone
+from services.notification import MAINTENANCE_CHUNK_SIZE, purge_read_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete read notifications older than the retention period, in "
+        "primary key chunks of one transaction each. Meant to run daily from a "
+        "scheduler."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.NOTIFICATION_RETENTION_DAYS,
+            help="Keep read notifications created in the last DAYS days.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=MAINTENANCE_CHUNK_SIZE,
+            help="Notifications deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options["days"])
+        deleted = purge_read_notifications(older_than, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} notification(s)."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandParser
+from services.dashboard import refresh_dashboard_counter, refresh_driver_counter
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the dashboard counters of backoffice users and repair drift. "
+        "Meant to run periodically (e.g. nightly from a scheduler)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--email", help="Only reconcile the counters of this backoffice user."
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(user_type="backoffice")
+        if options["email"]:
+            users = users.filter(email=options["email"])
+        _, drivers_drifted = refresh_driver_counter()
+        if drivers_drifted:
+            self.stdout.write("The driver total had drifted.")
+        checked = drifted = 0
+        for user in users.iterator():
+            _, drift = refresh_dashboard_counter(user)
+            checked += 1
+            drifted += drift
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled {checked} counter(s), {drifted} had drifted."
+            )
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandParser
+from services.notification import refresh_unread_count
+from users.models import NotificationCounter, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the unread notification counters and repair drift. Meant to "
+        "run periodically (e.g. nightly from a scheduler)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--email", help="Only reconcile the counter of this user.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options["email"]:
+            users = users.filter(email=options["email"])
+        checked = drifted = 0
+        for user_id in users.values_list("pk", flat=True).iterator():
+            before = (
+                NotificationCounter.objects.filter(pk=user_id)
+                .values_list("unread", flat=True)
+                .first()
+            )
+            unread = refresh_unread_count(user_id)
+            checked += 1
+            drifted += before is not None and before != unread
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled {checked} counter(s), {drifted} had drifted."
+            )
+        )
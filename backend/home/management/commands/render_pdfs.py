@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+from services.pdf_jobs import run_pdf_jobs
+
+
+class Command(BaseCommand):
+    help = "Render queued proof of delivery PDFs on a pool of worker threads."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Documents rendered in parallel."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=20, help="Jobs claimed at a time."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when there is nothing to render.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Render the queued documents once and exit instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                claimed = run_pdf_jobs(options["workers"], options["batch_size"])
+                total += claimed
+                if claimed:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} document(s)."))
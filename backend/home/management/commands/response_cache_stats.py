@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandParser
+from utils.response_cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the hit/miss counters of the cached read endpoints. Counters live "
+        "in the cache, so they span processes only with a shared CACHE_URL."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters after reading."
+        )
+
+    def handle(self, *args, **options):
+        # Cached views register themselves when their module is imported.
+        import backoffice.views  # noqa F401
+        import backoffice.viewsets  # noqa F401
+        import home.api.v1.views  # noqa F401
+        import home.api.v1.viewsets  # noqa F401
+
+        for name, counts in cache_stats(reset=options["reset"]).items():
+            total = counts["hits"] + counts["misses"]
+            rate = counts["hits"] / total if total else 0
+            self.stdout.write(
+                f"{name:25} {counts['hits']:8} hits {counts['misses']:8} misses"
+                f" {rate:6.1%} hit rate"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandParser
+from services.dashboard import rollup_shipments
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the daily shipment rollup behind the dashboard time series from "
+        "shipments changed since the last run. Meant to run periodically (e.g. "
+        "every few minutes from a scheduler)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild the whole rollup, e.g. after shipments were hard deleted.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rollup_shipments(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} day bucket(s)."))
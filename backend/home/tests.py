@@ -1,3 +1,1453 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import boto3
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from firebase_admin import exceptions as firebase_exceptions
+from firebase_admin import messaging
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from backoffice.models import AssociateCompany, Company, Container, Shipment
+from home.management.commands.benchmark_startup import (
+    attribute,
+    measure_startup,
+    parse_importtime,
+)
+from modules import manifest
+from modules import utils as module_utils
+from services import fcm, google_outh
+from services import notification as notification_service
+from services.firebase_mirror import InMemoryTransport, MirrorSync, mirror
+from users.authentication import CachedTokenAuthentication, token_cache_key
+from users.models import (
+    BackOfficeUser,
+    Device,
+    Driver,
+    MirrorOutbox,
+    Notification,
+    NotificationCounter,
+    NotificationOutbox,
+    User,
+)
+from utils import aws, firebase, secret_settings
+from utils.cache import is_shared_cache
+from utils.outbound import (
+    BREAKER_THRESHOLD,
+    CircuitBreaker,
+    CircuitOpenError,
+    OutboundClient,
+    flush_stats,
+    outbound_stats,
+)
+from utils.response_cache import cache_stats
+
+
+def enter_context(test, context):
+    """``TestCase.enterContext``, which only exists from Python 3.11."""
+    result = context.__enter__()
+    test.addCleanup(context.__exit__, None, None, None)
+    return result
+
+
+class FakeHTTPServer:
+    """
+    Local HTTP/1.1 server with keep-alive, for tests of outbound calls.
+
+    Answers every GET and POST with ``body`` as JSON (plus ``headers``) after
+    ``latency`` seconds. ``fail_next(count, status)`` makes the next ``count``
+    requests answer ``status`` instead, or drop the connection without an
+    answer when ``status`` is None. ``requests`` records ``(method, path)``
+    and ``connections`` the client ports seen, one per TCP connection.
+
+        with FakeHTTPServer(body={"ok": True}, latency=0.05) as server:
+            outbound.get(server.url)
+    """
+
+    def __init__(self, body=None, headers=None, latency=0.0):
+        self.body = body if body is not None else {}
+        self.headers = headers or {}
+        self.latency = latency
+        self.requests = []
+        self.connections = set()
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.host = f"127.0.0.1:{self._server.server_port}"
+        self.url = f"http://{self.host}/"
+
+    def fail_next(self, count, status=503):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def answer(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                with fake._lock:
+                    fake.requests.append((self.command, self.path))
+                    fake.connections.add(self.client_address[1])
+                    failure = fake._failures.pop(0) if fake._failures else 200
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if failure is None:
+                    self.close_connection = True
+                    return
+                response = json.dumps(fake.body).encode()
+                try:
+                    self.send_response(failure)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(response)))
+                    for name, value in fake.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(response)
+                except ConnectionError:
+                    # The client gave up waiting, e.g. on its deadline.
+                    self.close_connection = True
+
+            do_GET = do_POST = answer
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeMessaging:
+    """
+    Stand-in for ``messaging.send_each_for_multicast`` while entered.
+
+    Records every MulticastMessage in ``requests``. ``fail_next(count)`` makes
+    the next ``count`` calls raise ``error``; ``token_errors`` maps tokens to
+    the exception FCM reports for them on every call.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.token_errors = {}
+        self._failures = []
+        self._patches = [
+            mock.patch.object(
+                messaging, "send_each_for_multicast", self.send_each_for_multicast
+            ),
+            mock.patch("utils.firebase.firebase_app"),
+            mock.patch.object(fcm, "breaker", CircuitBreaker()),
+        ]
+
+    def fail_next(self, count, error=None):
+        error = error or firebase_exceptions.UnavailableError("503 Unavailable")
+        self._failures.extend([error] * count)
+
+    def send_each_for_multicast(self, message, app=None):
+        self.requests.append(message)
+        if self._failures:
+            raise self._failures.pop(0)
+        return messaging.BatchResponse(
+            [
+                (
+                    messaging.SendResponse(None, self.token_errors[token])
+                    if token in self.token_errors
+                    else messaging.SendResponse({"name": f"messages/{token}"}, None)
+                )
+                for token in message.tokens
+            ]
+        )
+
+    def __enter__(self):
+        for patch in self._patches:
+            patch.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        for patch in reversed(self._patches):
+            patch.__exit__(*exc_info)
+
+
+class NotificationKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="driver@example.com", email="driver@example.com", password="pass"
+        )
+        Notification.objects.bulk_create(
+            Notification(
+                recipient=cls.user, title=f"n{i}", message="m", read=bool(i % 2)
+            )
+            for i in range(15)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_walk_keeps_unread_count(self):
+        url = reverse("notification-list")
+        response = self.client.get(url, {"cursor": ""})
+        seen = [row["id"] for row in response.data["results"]["notifications"]]
+        self.assertEqual(response.data["results"]["unread_count"], 8)
+        response = self.client.get(response.data["next"])
+        seen += [row["id"] for row in response.data["results"]["notifications"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(len(set(seen)), 15)
+
+
+class NotificationCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="badge@example.com", email="badge@example.com", password="pass"
+        )
+
+    def setUp(self):
+        enter_context(self, mock.patch.object(mirror, "transport", InMemoryTransport()))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queue(self, count):
+        return [
+            notification_service.create_and_send_notification(
+                self.user, f"n{i}", "m", "Picked Up", None
+            )
+            for i in range(count)
+        ]
+
+    def unread_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("notification-unread-count"))
+        self.assertEqual(response.status_code, 200)
+        return response.data["unread_count"]
+
+    def test_counter_follows_every_write(self):
+        first, second, third = self.queue(3)
+        self.assertEqual(self.unread_count(), 3)
+
+        url = reverse("notification-detail", args=[first.id])
+        self.client.patch(url, {"read": True})
+        self.client.patch(url, {"read": True})
+        self.assertEqual(self.unread_count(), 2)
+        self.client.patch(url, {"read": False})
+        self.assertEqual(self.unread_count(), 3)
+
+        self.client.delete(reverse("notification-detail", args=[second.id]))
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.post(reverse("mark-notification-read"))
+        self.assertEqual(self.unread_count(), 0)
+        self.queue(2)
+        self.client.post(reverse("delete-all-notifications"))
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.filter(recipient=self.user).exists())
+
+    def test_list_reads_the_counter(self):
+        self.queue(2)
+        response = self.client.get(reverse("notification-list"))
+        self.assertEqual(response.data["results"]["unread_count"], 2)
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.user).unread,
+            2,
+        )
+
+    def test_reconcile_repairs_drift(self):
+        self.queue(2)
+        NotificationCounter.objects.filter(user=self.user).update(unread=7)
+        out = StringIO()
+        call_command(
+            "reconcile_notification_counters", email="badge@example.com", stdout=out
+        )
+        self.assertIn("Reconciled 1 counter(s), 1 had drifted.", out.getvalue())
+        self.assertEqual(self.unread_count(), 2)
+
+    @unittest.skipUnless(
+        connection.features.has_select_for_update, "Needs SELECT ... FOR UPDATE"
+    )
+    def test_recount_locks_the_counter_first(self):
+        self.queue(1)
+        with CaptureQueriesContext(connection) as context:
+            notification_service.refresh_unread_count(self.user.id)
+        sql = [query["sql"] for query in context.captured_queries]
+        (lock,) = [i for i, query in enumerate(sql) if "FOR UPDATE" in query]
+        (count,) = [i for i, query in enumerate(sql) if "COUNT(" in query]
+        self.assertIn('"users_notificationcounter"', sql[lock])
+        self.assertLess(lock, count)
+
+
+class NotificationMaintenanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="heavy@example.com", email="heavy@example.com", password="pass"
+        )
+
+    def setUp(self):
+        self.firebase = InMemoryTransport()
+        enter_context(self, mock.patch.object(mirror, "transport", self.firebase))
+
+    def queue(self, count):
+        return [
+            notification_service.create_and_send_notification(
+                self.user, f"n{i}", "m", "Picked Up", None
+            )
+            for i in range(count)
+        ]
+
+    def writes(self, context, verb):
+        return [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(verb)
+        ]
+
+    def test_mark_all_read_in_chunks(self):
+        notifications = self.queue(5)
+        with CaptureQueriesContext(connection) as context:
+            marked = notification_service.mark_all_read(self.user.id, chunk_size=2)
+        self.assertEqual(marked, [notification.id for notification in notifications])
+        updates = self.writes(context, 'UPDATE "users_notification"')
+        self.assertEqual(len(updates), 3)
+        self.assertTrue(all("BETWEEN" in sql for sql in updates))
+        self.assertFalse(Notification.objects.filter(read=False).exists())
+        self.assertEqual(notification_service.get_unread_count(self.user.id), 0)
+
+    def test_delete_all_in_chunks(self):
+        first, *_ = self.queue(5)
+        first.read = True
+        first.save()
+        notification_service.refresh_unread_count(self.user.id)
+        deleted = notification_service.delete_all_notifications(
+            self.user.id, chunk_size=2
+        )
+        self.assertEqual(deleted, 5)
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(notification_service.get_unread_count(self.user.id), 0)
+
+    def test_purge_keeps_unread_and_recent(self):
+        old_read, old_unread, recent_read, *expired = self.queue(5)
+        Notification.objects.exclude(pk=old_unread.pk).update(read=True)
+        Notification.objects.exclude(pk=recent_read.pk).update(
+            created_at=timezone.now() - timedelta(days=91)
+        )
+        notification_service.refresh_unread_count(self.user.id)
+        for notification in Notification.objects.all():
+            mirror.created(notification)
+        mirror.flush()
+
+        out = StringIO()
+        call_command("purge_read_notifications", "--chunk-size", "2", stdout=out)
+        self.assertIn("Deleted 3 notification(s).", out.getvalue())
+        while notification_service.dispatch_mirror_changes():
+            pass
+        self.assertEqual(
+            set(Notification.objects.values_list("pk", flat=True)),
+            {old_unread.pk, recent_read.pk},
+        )
+        self.assertEqual(
+            set(self.firebase.get(f"notifications/{self.user.id}")),
+            {str(old_unread.pk), str(recent_read.pk)},
+        )
+        self.assertEqual(notification_service.get_unread_count(self.user.id), 1)
+
+
+def make_google_key(key_id):
+    """A keypair and its self-signed certificate, as Google publishes them."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+    return signer, certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@override_settings(GOOGLE_ID_TOKEN_AUDIENCES=["mobile-client"])
+class GoogleIdTokenTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer, cls.certificate = make_google_key("key-1")
+
+    def setUp(self):
+        google_outh.clear_certs_cache()
+        self.addCleanup(google_outh.clear_certs_cache)
+        self.fetch_certs = enter_context(
+            self,
+            mock.patch(
+                "services.google_outh.fetch_certs",
+                return_value=({"key-1": self.certificate}, 3600),
+            ),
+        )
+        self.userinfo = enter_context(
+            self, mock.patch("services.google_outh.get_user_info_from_google")
+        )
+        self.client = APIClient()
+
+    def id_token(self, signer=None, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": "mobile-client",
+            "sub": "1234",
+            "email": "google@example.com",
+            "given_name": "Ada",
+            "family_name": "Lovelace",
+            "iat": now,
+            "exp": now + 3600,
+            **claims,
+        }
+        return google_jwt.encode(signer or self.signer, payload).decode()
+
+    def mobile_login(self, token):
+        return self.client.post(
+            reverse("google_auth"),
+            {"token": token, "user_type": "driver"},
+            HTTP_PLATFORM="mobile",
+        )
+
+    def test_id_token_logs_in_without_calling_google(self):
+        response = self.mobile_login(self.id_token())
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(email="google@example.com")
+        self.assertEqual((user.first_name, user.last_name), ("Ada", "Lovelace"))
+        self.assertEqual(self.mobile_login(self.id_token()).status_code, 200)
+        self.userinfo.assert_not_called()
+        self.assertEqual(self.fetch_certs.call_count, 1)
+
+    def test_rejected_id_tokens(self):
+        forger, _ = make_google_key("key-1")
+        now = int(time.time())
+        for token in (
+            self.id_token(aud="someone-else"),
+            self.id_token(iss="https://evil.example.com"),
+            self.id_token(iat=now - 7200, exp=now - 3600),
+            self.id_token(email=""),
+            self.id_token(signer=forger),
+            "not.a.token",
+        ):
+            with self.subTest(token=token):
+                self.assertEqual(self.mobile_login(token).status_code, 400)
+        self.assertFalse(User.objects.exists())
+
+    def test_unknown_key_refetches_certs_once(self):
+        rotated, certificate = make_google_key("key-2")
+        self.fetch_certs.return_value = (
+            {"key-1": self.certificate, "key-2": certificate},
+            3600,
+        )
+        google_outh.google_certs()
+        # Past the minimum interval between fetches.
+        google_outh._certs["fetched"] -= google_outh.CERTS_MIN_REFETCH_INTERVAL
+        self.assertEqual(self.mobile_login(self.id_token(rotated)).status_code, 201)
+        unknown, _ = make_google_key("key-3")
+        self.assertEqual(self.mobile_login(self.id_token(unknown)).status_code, 400)
+        google_outh._certs["fetched"] -= google_outh.CERTS_MIN_REFETCH_INTERVAL
+        self.assertEqual(self.mobile_login(self.id_token(unknown)).status_code, 400)
+        self.assertEqual(self.mobile_login(self.id_token(unknown)).status_code, 400)
+        # The initial fetch, the rotation to key-2, then one fetch per interval
+        # for key-3.
+        self.assertEqual(self.fetch_certs.call_count, 3)
+
+    def test_code_exchange_uses_the_id_token_claims(self):
+        User.objects.create_user(
+            username="google@example.com",
+            email="google@example.com",
+            password="pass",
+            user_type="backoffice",
+        )
+        with mock.patch(
+            "home.api.v1.views.exchange_code_for_tokens",
+            return_value={"access_token": "opaque", "id_token": self.id_token()},
+        ):
+            response = self.client.post(reverse("google_auth"), {"token": "code"})
+        self.assertEqual(response.status_code, 200)
+        self.userinfo.assert_not_called()
+
+    def test_access_tokens_still_use_userinfo(self):
+        self.userinfo.return_value = {"email": "google@example.com"}
+        self.assertEqual(self.mobile_login("opaque-access-token").status_code, 201)
+        self.userinfo.assert_called_once_with("opaque-access-token")
+
+    def test_google_outage_is_unavailable_not_invalid(self):
+        self.fetch_certs.side_effect = google_outh.GoogleUnavailable("503")
+        self.assertEqual(self.mobile_login(self.id_token()).status_code, 503)
+        with mock.patch(
+            "services.google_outh.outbound.request",
+            side_effect=CircuitOpenError("Circuit open"),
+        ):
+            response = self.client.post(reverse("google_auth"), {"token": "code"})
+            self.assertEqual(response.status_code, 503)
+            response = self.client.post(
+                reverse("google_signup"), {"token": "code", "user_type": "driver"}
+            )
+            self.assertEqual(response.status_code, 503)
+        self.assertFalse(User.objects.exists())
+
+
+class OutboundClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        outbound_stats(reset=True)
+        self.outbound = OutboundClient()
+        self.server = enter_context(self, FakeHTTPServer(body={"ok": True}))
+        enter_context(self, mock.patch("utils.outbound.RETRY_BASE_DELAY", 0.01))
+
+    def test_connections_are_kept_alive(self):
+        for _ in range(3):
+            self.assertEqual(self.outbound.get(self.server.url).json(), {"ok": True})
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_idempotent_calls_are_retried(self):
+        self.server.fail_next(1, status=503)
+        self.server.fail_next(1, status=None)
+        response = self.outbound.get(self.server.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        stats = outbound_stats()[self.server.host]
+        self.assertEqual((stats["requests"], stats["errors"]), (3, 2))
+        self.assertEqual(stats["retries"], 2)
+
+    def test_posts_are_not_retried_unless_asked(self):
+        self.server.fail_next(2, status=502)
+        self.assertEqual(self.outbound.post(self.server.url).status_code, 502)
+        self.assertEqual(
+            self.outbound.post(self.server.url, retries=1).status_code, 200
+        )
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_deadline_bounds_the_whole_call(self):
+        self.server.latency = 0.3
+        started = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            self.outbound.get(self.server.url, deadline=0.1)
+        self.assertLess(time.monotonic() - started, 0.3)
+
+    def test_circuit_opens_and_recovers(self):
+        self.server.fail_next(5, status=None)
+        for _ in range(5):
+            with self.assertRaises(requests.ConnectionError):
+                self.outbound.get(self.server.url, retries=0)
+        with self.assertRaises(CircuitOpenError):
+            self.outbound.get(self.server.url)
+        self.assertEqual(len(self.server.requests), 5)
+
+        breaker = self.outbound.breaker(self.server.host)
+        breaker.opened_at -= breaker.reset_timeout
+        self.assertEqual(self.outbound.get(self.server.url).status_code, 200)
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(outbound_stats()[self.server.host]["rejected"], 1)
+
+    def test_failed_trial_reopens_the_circuit(self):
+        breaker = self.outbound.breaker(self.server.host)
+        for _ in range(breaker.threshold):
+            breaker.failed()
+        breaker.opened_at -= breaker.reset_timeout
+        self.server.fail_next(1, status=500)
+        self.assertEqual(self.outbound.get(self.server.url).status_code, 500)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.outbound.get(self.server.url)
+
+    def test_every_failed_trial_reopens_the_circuit(self):
+        breaker = self.outbound.breaker(self.server.host)
+        for error in (requests.exceptions.ContentDecodingError, RuntimeError):
+            for _ in range(breaker.threshold):
+                breaker.failed()
+            breaker.opened_at -= breaker.reset_timeout
+            with mock.patch.object(
+                self.outbound.session, "request", side_effect=error
+            ) as request:
+                with self.assertRaises(error):
+                    self.outbound.get(self.server.url)
+            # Not retried, and the circuit is open again rather than half-open.
+            request.assert_called_once()
+            self.assertEqual(breaker.state, "open")
+            breaker.succeeded()
+
+    def test_stats_command(self):
+        self.server.latency = 0.06
+        self.outbound.get(self.server.url)
+        out = StringIO()
+        call_command("outbound_http_stats", "--reset", stdout=out)
+        self.assertIn(self.server.host, out.getvalue())
+        self.assertIn("p95 <=100ms", out.getvalue())
+        self.assertEqual(outbound_stats(), {})
+
+    def test_stats_are_flushed_to_a_shared_cache_in_batches(self):
+        enter_context(self, mock.patch("utils.outbound.is_shared_cache", lambda: True))
+        flush_stats()
+        with mock.patch("utils.outbound.flush_stats", wraps=flush_stats) as flush:
+            for _ in range(3):
+                self.outbound.get(self.server.url)
+            # Nothing reaches the cache until the flush interval has passed.
+            flush.assert_not_called()
+            with mock.patch("utils.outbound.STATS_FLUSH_INTERVAL", 0):
+                self.outbound.get(self.server.url)
+            flush.assert_called_once()
+
+        self.outbound.get(self.server.url)
+        flush_stats()
+        # The host was registered once, whatever the number of flushes.
+        self.assertEqual(cache.get("outbound:hosts"), 1)
+        stats = outbound_stats(reset=True)
+        self.assertEqual(list(stats), [self.server.host])
+        self.assertEqual(stats[self.server.host]["requests"], 5)
+        self.assertEqual(outbound_stats(), {})
+
+    def test_google_certs_come_through_the_client(self):
+        self.server.body = {"key-1": "PEM"}
+        self.server.headers = {"Cache-Control": "public, max-age=600"}
+        self.server.fail_next(1, status=503)
+        with mock.patch("services.google_outh.CERTS_ENDPOINT", self.server.url):
+            self.assertEqual(google_outh.fetch_certs(), ({"key-1": "PEM"}, 600))
+            # An error answer, then a connection dropped on every attempt.
+            for count, failure in ((1, 500), (1, 404), (3, None)):
+                self.server.fail_next(count, status=failure)
+                with self.assertRaises(google_outh.GoogleUnavailable):
+                    google_outh.fetch_certs()
+            self.assertEqual(len(self.server.requests), 7)
+
+
+class LazyStartupTests(TestCase):
+    def setUp(self):
+        enter_context(self, mock.patch.object(firebase, "_app", None))
+        self.cache_path = os.path.join(
+            enter_context(self, tempfile.TemporaryDirectory()), "settings.env"
+        )
+        self.fetch = enter_context(
+            self,
+            mock.patch.object(
+                secret_settings, "fetch_secret_payload", return_value="DEBUG=on\n"
+            ),
+        )
+
+    def test_firebase_app_is_initialised_once_on_first_use(self):
+        certificate = enter_context(
+            self, mock.patch.object(firebase.credentials, "Certificate")
+        )
+        initialize_app = enter_context(
+            self, mock.patch.object(firebase.firebase_admin, "initialize_app")
+        )
+
+        self.assertIs(firebase.firebase_app(), firebase.firebase_app())
+        certificate.assert_called_once_with(settings.FCM_JSON_FILE)
+        initialize_app.assert_called_once_with(
+            certificate.return_value, {"databaseURL": settings.FIREBASE_DATABASE_URL}
+        )
+
+    @override_settings(FCM_JSON_FILE="/nonexistent/firebase.json")
+    def test_missing_certificate_only_fails_on_use(self):
+        with self.assertRaises((OSError, ValueError)):
+            firebase.firebase_app()
+        self.assertIsNone(firebase._app)
+
+    def test_secret_payload_cached_until_ttl(self):
+        load = secret_settings.load_secret_payload
+        self.assertEqual(load("django_settings", self.cache_path, ttl=60), "DEBUG=on\n")
+        self.assertEqual(os.stat(self.cache_path).st_mode & 0o777, 0o600)
+
+        self.fetch.return_value = "DEBUG=off\n"
+        self.assertEqual(load("django_settings", self.cache_path, ttl=60), "DEBUG=on\n")
+        self.assertEqual(self.fetch.call_count, 1)
+
+        expired = time.time() - 61
+        os.utime(self.cache_path, (expired, expired))
+        self.assertEqual(
+            load("django_settings", self.cache_path, ttl=60), "DEBUG=off\n"
+        )
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_secret_payload_without_cache_or_credentials(self):
+        load = secret_settings.load_secret_payload
+        load("django_settings")
+        load("django_settings")
+        self.assertEqual(self.fetch.call_count, 2)
+
+        self.fetch.return_value = None
+        self.assertIsNone(load("django_settings", self.cache_path))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_import_time_charged_to_importing_app(self):
+        output = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       100 |        100 |       pandas",
+                "import time:        20 |        120 |     home.exports",
+                "import time:        10 |        130 |   home.views",
+                "import time:         5 |          5 |   django.utils",
+                "import time:        30 |        165 | testing_47394.urls",
+                "import time:         7 |          7 | json",
+            ]
+        )
+        roots = parse_importtime(output)
+        self.assertEqual([root.name for root in roots], ["testing_47394.urls", "json"])
+        owners = [("home", "home"), ("urls", "testing_47394.urls")]
+        self.assertEqual(
+            attribute(roots, owners), {"home": 130, "urls": 35, "(other)": 7}
+        )
+
+    def test_benchmark_startup_reports_apps(self):
+        out = StringIO()
+        call_command("benchmark_startup", runs=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertGreater(report["startup_ms"], 0)
+        self.assertIn("home", report["imports_ms"])
+        self.assertIn("settings", report["imports_ms"])
+
+    def test_benchmark_startup_enforces_budget(self):
+        with self.assertRaisesMessage(CommandError, "over the budget of 0.001 ms"):
+            call_command(
+                "benchmark_startup", runs=1, budget_ms=0.001, stdout=StringIO()
+            )
+
+
+class StartupImportTests(TestCase):
+    # SDKs only some code paths need; loading the URLconf must not import them.
+    DEFERRED_MODULES = (
+        "boto3",
+        "botocore",
+        "firebase_admin",
+        "google.auth",
+        "google.cloud",
+        "reportlab",
+    )
+
+    def test_urlconf_load_defers_heavy_sdks(self):
+        directory = enter_context(self, tempfile.TemporaryDirectory())
+        # A fresh cached secret payload, as a deployed worker would have.
+        cache_path = os.path.join(directory, "settings.env")
+        with open(cache_path, "w") as cached:
+            cached.write("# cached\n")
+
+        _, roots = measure_startup(dict(os.environ, SECRET_SETTINGS_CACHE=cache_path))
+        imported, pending = set(), list(roots)
+        while pending:
+            module = pending.pop()
+            imported.add(module.name)
+            pending.extend(module.children)
+
+        # Import time itself depends on the machine; CI can hold it to a
+        # budget with ``benchmark_startup --budget-ms``.
+        self.assertEqual([m for m in self.DEFERRED_MODULES if m in imported], [])
+
+
+class ModuleRegistryTests(TestCase):
+    def setUp(self):
+        self.project = enter_context(self, tempfile.TemporaryDirectory())
+        self.modules_dir = os.path.join(self.project, "modules") + "/"
+        enter_context(
+            self, mock.patch.object(manifest, "MODULES_DIR", self.modules_dir)
+        )
+        enter_context(
+            self,
+            mock.patch.object(
+                manifest,
+                "MANIFEST_FILE",
+                os.path.join(self.project, ".modules.manifest"),
+            ),
+        )
+        enter_context(self, mock.patch.object(manifest, "_registry", None))
+        enter_context(self, mock.patch.object(module_utils, "_options", {}))
+        enter_context(self, mock.patch.object(module_utils, "_global_options", {}))
+        self.add_files("apps.py", "urls.py", "admin.py")
+        self.add_files("apps.py", "urls.py", "options.py", module="shipping_rates")
+        self.add_files("cached.py", module="__pycache__")
+
+    def add_files(self, *names, module=""):
+        directory = os.path.join(self.modules_dir, module)
+        os.makedirs(directory, exist_ok=True)
+        for name in names:
+            open(os.path.join(directory, name), "w").close()
+
+    def test_registry_is_scanned_once_and_persisted(self):
+        self.assertEqual(
+            manifest.get_registry(),
+            {
+                "apps": ["modules/apps.py", "modules/shipping_rates/apps.py"],
+                "urls": ["modules/shipping_rates/urls.py", "modules/urls.py"],
+                "admin": ["modules/admin.py"],
+                "options": ["modules/shipping_rates/options.py"],
+            },
+        )
+        self.assertEqual(manifest.get_modules(), ["modules", "modules.shipping_rates"])
+        self.assertTrue(os.path.exists(manifest.MANIFEST_FILE))
+
+        # A new process reads the manifest instead of walking the tree.
+        manifest.clear_registry()
+        with mock.patch.object(manifest, "scan_modules") as scan:
+            manifest.get_modules()
+        scan.assert_not_called()
+
+    def test_registry_rebuilt_when_a_module_is_added(self):
+        manifest.get_registry()
+        manifest.clear_registry()
+        self.add_files("apps.py", module="pickups")
+
+        self.assertIn("modules.pickups", manifest.get_modules())
+
+    def test_get_options_is_memoised(self):
+        options_file = os.path.join(self.modules_dir, "options.json")
+        with open(options_file, "w") as f:
+            json.dump({"module_options": {"shipping-rates": {"currency": "EUR"}}}, f)
+        enter_context(
+            self,
+            mock.patch.object(module_utils, "GLOBAL_OPTIONS_FILE_PATH", options_file),
+        )
+        defaults = mock.Mock(currency="USD", precision=2)
+        import_module = enter_context(
+            self,
+            mock.patch.object(
+                module_utils.importlib, "import_module", return_value=defaults
+            ),
+        )
+
+        for _ in range(3):
+            self.assertEqual(
+                module_utils.get_options("shipping-rates", "currency"), "EUR"
+            )
+            self.assertEqual(module_utils.get_options("shipping-rates", "precision"), 2)
+        import_module.assert_has_calls([mock.call("modules.shipping_rates.options")])
+        self.assertEqual(import_module.call_count, 2)
+
+        os.remove(options_file)
+        self.assertEqual(module_utils.get_options("shipping-rates", "currency"), "EUR")
+
+
+class SignedUrlCacheTests(TestCase):
+    credentials = {
+        "bucket_name": "bucket",
+        "access_key_id": "AKIATEST",
+        "secret_access_key": "secret",
+        "region_name": "us-east-1",
+    }
+
+    def setUp(self):
+        aws.clear_signed_url_cache()
+        self.addCleanup(aws.clear_signed_url_cache)
+
+    def sign(self, key):
+        return aws.generate_signed_url(object_key=key, **self.credentials)
+
+    def test_client_is_shared_between_keys(self):
+        with mock.patch("boto3.Session", wraps=boto3.Session) as session:
+            first = self.sign("media/a.pdf")
+            second = self.sign("media/b.pdf")
+        self.assertEqual(session.call_count, 1)
+        self.assertIn("media/a.pdf", first)
+        self.assertNotEqual(first, second)
+
+    def test_url_is_reused_until_expiry_margin(self):
+        now = 1_700_000_000
+        reuse_until = now + aws.SIGNED_URL_EXPIRES_IN - aws.SIGNED_URL_EXPIRY_MARGIN
+        with mock.patch(
+            "utils.aws.get_s3_client", wraps=aws.get_s3_client
+        ) as get_client:
+            for moment in (now, reuse_until - 1, reuse_until):
+                with mock.patch("utils.aws.time.time", return_value=moment):
+                    self.sign("media/a.pdf")
+        # Signed at ``now``, served from cache, re-signed inside the margin.
+        self.assertEqual(get_client.call_count, 2)
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(aws, "SIGNED_URL_CACHE_SIZE", 3):
+            for index in range(5):
+                self.sign(f"media/{index}.pdf")
+        self.assertEqual(len(aws._signed_urls), 3)
+
+
+class NotificationOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="outbox@example.com", email="outbox@example.com", password="pass"
+        )
+        cls.other = User.objects.create_user(
+            username="other@example.com", email="other@example.com", password="pass"
+        )
+        Device.objects.create(user=cls.user, registration_id="token-user")
+        Device.objects.create(user=cls.other, registration_id="token-other")
+
+    def setUp(self):
+        self.fcm = enter_context(self, FakeMessaging())
+        self.firebase = InMemoryTransport()
+        enter_context(self, mock.patch.object(mirror, "transport", self.firebase))
+
+    def queue(self, recipient=None, message="Picked up", shipment_id=None):
+        return notification_service.create_and_send_notification(
+            recipient or self.user, "CONT00001", message, "Picked Up", shipment_id
+        )
+
+    def test_create_queues_without_pushing(self):
+        notification = self.queue()
+        self.assertEqual(self.firebase.updates, [])
+        self.assertEqual(self.fcm.requests, [])
+        self.assertEqual(notification.outbox.status, NotificationOutbox.PENDING)
+
+    def test_dispatch_delivers_due_rows(self):
+        notification = self.queue()
+        call_command("dispatch_notifications", "--once", stdout=StringIO())
+        mirrored = self.firebase.get(f"notifications/{self.user.id}/{notification.id}")
+        self.assertEqual(mirrored["message"], "Picked up")
+        (request,) = self.fcm.requests
+        self.assertEqual(request.tokens, ["token-user"])
+        self.assertEqual(request.notification.body, "Picked up")
+        outbox = NotificationOutbox.objects.get(notification=notification)
+        self.assertEqual(outbox.status, NotificationOutbox.SENT)
+        self.assertEqual(outbox.attempts, 1)
+        self.assertIsNotNone(outbox.sent_at)
+
+    def test_same_payload_is_one_multicast(self):
+        self.queue(self.user)
+        self.queue(self.other)
+        self.queue(self.user, message="Something else")
+        with self.assertNumQueries(6):
+            # claim, mark claimed, devices, bulk update, plus the savepoint of
+            # the claiming transaction
+            self.assertEqual(notification_service.dispatch_notifications(), 3)
+        # All three mirror entries are written in one multi-path update.
+        self.assertEqual(len(self.firebase.updates), 1)
+        self.assertEqual(len(self.firebase.updates[0]), 3)
+        recipients = {
+            request.notification.body: sorted(request.tokens)
+            for request in self.fcm.requests
+        }
+        self.assertEqual(
+            recipients,
+            {
+                "Picked up": ["token-other", "token-user"],
+                "Something else": ["token-user"],
+            },
+        )
+
+    def test_multicast_is_split_at_the_provider_limit(self):
+        Device.objects.bulk_create(
+            Device(user=self.user, registration_id=f"extra-{i}") for i in range(4)
+        )
+        self.queue()
+        with mock.patch("services.fcm.FCM_MULTICAST_LIMIT", 2):
+            notification_service.dispatch_notifications()
+        self.assertEqual(
+            [len(request.tokens) for request in self.fcm.requests],
+            [2, 2, 1],
+        )
+
+    def test_only_the_failed_multicast_is_retried(self):
+        self.queue(self.user)
+        self.queue(self.other)
+        self.fcm.fail_next(1)
+        with mock.patch("services.fcm.FCM_MULTICAST_LIMIT", 1):
+            notification_service.dispatch_notifications()
+            statuses = dict(
+                NotificationOutbox.objects.values_list(
+                    "notification__recipient__devices__registration_id", "status"
+                )
+            )
+            (failed,), (sent,) = [request.tokens for request in self.fcm.requests]
+            self.assertEqual(statuses[failed], NotificationOutbox.PENDING)
+            self.assertEqual(statuses[sent], NotificationOutbox.SENT)
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(notification_service.dispatch_notifications(), 1)
+        self.assertEqual(self.fcm.requests[-1].tokens, [failed])
+
+    def test_per_device_errors_are_mapped_to_rows(self):
+        Device.objects.create(user=self.user, registration_id="token-uninstalled")
+        user = self.queue(self.user)
+        other = self.queue(self.other)
+        self.fcm.token_errors = {
+            "token-uninstalled": messaging.UnregisteredError("not registered"),
+            "token-other": firebase_exceptions.UnavailableError("503 Unavailable"),
+        }
+        notification_service.dispatch_notifications()
+        statuses = dict(
+            NotificationOutbox.objects.values_list("notification_id", "status")
+        )
+        # Delivered to one of the user's devices; the uninstalled app's token
+        # is dropped.
+        self.assertEqual(statuses[user.pk], NotificationOutbox.SENT)
+        self.assertFalse(
+            Device.objects.filter(registration_id="token-uninstalled").exists()
+        )
+        # No device of the other user got it, and FCM may take it later.
+        self.assertEqual(statuses[other.pk], NotificationOutbox.PENDING)
+        self.assertIn(
+            "503", NotificationOutbox.objects.get(notification=other).last_error
+        )
+
+    def test_rows_stay_claimed_while_they_are_sent(self):
+        self.queue()
+        # The test case's own transaction is still open during the send.
+        savepoints = list(connection.savepoint_ids)
+
+        def send(*args):
+            self.assertEqual(connection.savepoint_ids, savepoints)
+            self.assertEqual(notification_service.dispatch_notifications(), 0)
+            return {}
+
+        with mock.patch("services.fcm.send_multicast", side_effect=send) as push:
+            self.assertEqual(notification_service.dispatch_notifications(), 1)
+        push.assert_called_once()
+
+    def test_updates_for_one_shipment_are_coalesced(self):
+        shipment = Shipment.objects.create(
+            container=Container.objects.create(container_number="CONT00001")
+        )
+        welcome = self.queue(message="Welcome")
+        stale = self.queue(message="Accepted", shipment_id=shipment.id)
+        latest = self.queue(message="Delivered", shipment_id=shipment.id)
+        notification_service.dispatch_notifications()
+        self.assertEqual(
+            sorted(request.notification.body for request in self.fcm.requests),
+            ["Delivered", "Welcome"],
+        )
+        statuses = dict(
+            NotificationOutbox.objects.values_list("notification_id", "status")
+        )
+        self.assertEqual(statuses[welcome.pk], NotificationOutbox.SENT)
+        self.assertEqual(statuses[stale.pk], NotificationOutbox.COALESCED)
+        self.assertEqual(statuses[latest.pk], NotificationOutbox.SENT)
+        # Only the push is coalesced; every notification is mirrored.
+        for notification in (welcome, stale, latest):
+            mirrored = self.firebase.get(
+                f"notifications/{self.user.id}/{notification.id}"
+            )
+            self.assertEqual(mirrored["message"], notification.message)
+
+    def test_coalesced_rows_wait_for_the_mirror(self):
+        shipment = Shipment.objects.create(
+            container=Container.objects.create(container_number="CONT00001")
+        )
+        stale = self.queue(message="Accepted", shipment_id=shipment.id)
+        self.queue(message="Delivered", shipment_id=shipment.id)
+        with mock.patch.object(
+            self.firebase, "update", side_effect=ConnectionError("down")
+        ):
+            notification_service.dispatch_notifications()
+        self.assertEqual(
+            NotificationOutbox.objects.get(notification=stale).status,
+            NotificationOutbox.PENDING,
+        )
+        self.assertEqual(self.fcm.requests, [])
+
+    def test_failures_back_off_then_give_up(self):
+        self.fcm.fail_next(notification_service.MAX_ATTEMPTS)
+        notification = self.queue()
+        outbox = NotificationOutbox.objects.get(notification=notification)
+        previous_delay = timedelta(0)
+        for attempt in range(1, notification_service.MAX_ATTEMPTS + 1):
+            before = timezone.now()
+            self.assertEqual(notification_service.dispatch_notifications(), 1)
+            outbox.refresh_from_db()
+            self.assertEqual(outbox.attempts, attempt)
+            # Once FCM has failed often enough its circuit opens and pushes
+            # fail fast, still backing off.
+            expected = "503" if attempt <= BREAKER_THRESHOLD else "Circuit open"
+            self.assertIn(expected, outbox.last_error)
+            if outbox.status == NotificationOutbox.FAILED:
+                break
+            # Not due again until the backoff has elapsed.
+            self.assertEqual(notification_service.dispatch_notifications(), 0)
+            delay = outbox.next_attempt_at - before
+            self.assertGreaterEqual(delay, previous_delay)
+            previous_delay = delay
+            NotificationOutbox.objects.filter(pk=outbox.pk).update(
+                next_attempt_at=timezone.now()
+            )
+        self.assertEqual(outbox.status, NotificationOutbox.FAILED)
+        self.assertEqual(outbox.attempts, notification_service.MAX_ATTEMPTS)
+        self.assertEqual(notification_service.dispatch_notifications(), 0)
+
+
+class FirebaseMirrorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="mirror@example.com", email="mirror@example.com", password="pass"
+        )
+        cls.notifications = [
+            Notification.objects.create(recipient=cls.user, title=f"n{i}", message="m")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.firebase = InMemoryTransport()
+        self.sync = MirrorSync(self.firebase)
+        for notification in self.notifications:
+            self.sync.created(notification)
+        self.sync.flush()
+        self.firebase.updates.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        enter_context(self, mock.patch.object(mirror, "transport", self.firebase))
+
+    def user_node(self):
+        return self.firebase.get(f"notifications/{self.user.id}") or {}
+
+    def test_mark_all_read_is_one_update(self):
+        response = self.client.post(reverse("mark-notification-read"))
+        self.assertEqual(response.status_code, 200)
+        # Nothing is written until the worker applies the queued change.
+        self.assertEqual(self.firebase.updates, [])
+        self.assertEqual(notification_service.dispatch_mirror_changes(), 1)
+        self.assertEqual(len(self.firebase.updates), 1)
+        self.assertTrue(all(item["read"] for item in self.user_node().values()))
+
+    def test_delete_all_clears_the_user_node(self):
+        self.client.post(reverse("delete-all-notifications"))
+        notification_service.dispatch_mirror_changes()
+        self.assertEqual(
+            self.firebase.updates, [{f"notifications/{self.user.id}": None}]
+        )
+        self.assertEqual(self.user_node(), {})
+
+    def test_single_read_and_delete_follow_the_table(self):
+        first, second, _ = self.notifications
+        self.client.patch(
+            reverse("notification-detail", args=[first.id]), {"read": True}
+        )
+        self.client.delete(reverse("notification-detail", args=[second.id]))
+        # One change per user and pass, in the order they were made.
+        self.assertEqual(notification_service.dispatch_mirror_changes(), 1)
+        self.assertEqual(notification_service.dispatch_mirror_changes(), 1)
+        self.assertEqual(notification_service.dispatch_mirror_changes(), 0)
+        node = self.user_node()
+        self.assertTrue(node[str(first.id)]["read"])
+        self.assertNotIn(str(second.id), node)
+        self.assertFalse(MirrorOutbox.objects.exists())
+
+    def test_delete_all_keeps_notifications_created_after_it(self):
+        self.client.post(reverse("delete-all-notifications"))
+        later = Notification.objects.create(recipient=self.user, title="later")
+        notification_service.dispatch_mirror_changes()
+        self.assertEqual(list(self.user_node()), [str(later.id)])
+
+    def test_failed_changes_back_off_in_order_then_give_up(self):
+        first = self.notifications[0]
+        self.client.patch(
+            reverse("notification-detail", args=[first.id]), {"read": True}
+        )
+        with mock.patch.object(self.firebase, "update", side_effect=OSError("down")):
+            self.assertEqual(notification_service.dispatch_mirror_changes(), 1)
+        self.client.delete(reverse("notification-detail", args=[first.id]))
+        read, delete = MirrorOutbox.objects.order_by("pk")
+        self.assertEqual((read.attempts, read.status), (1, MirrorOutbox.PENDING))
+        self.assertIn("down", read.last_error)
+        # The delete waits for the read-mark backing off before it.
+        self.assertEqual(notification_service.dispatch_mirror_changes(), 0)
+
+        with mock.patch.object(self.firebase, "update", side_effect=OSError("down")):
+            for _ in range(notification_service.MAX_ATTEMPTS - 1):
+                MirrorOutbox.objects.update(next_attempt_at=timezone.now())
+                notification_service.dispatch_mirror_changes()
+        read.refresh_from_db()
+        self.assertEqual(read.status, MirrorOutbox.FAILED)
+        self.assertEqual(read.attempts, notification_service.MAX_ATTEMPTS)
+        # Given up on, it no longer holds back the delete.
+        MirrorOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(notification_service.dispatch_mirror_changes(), 1)
+        self.assertNotIn(str(first.id), self.user_node())
+
+    def test_pending_changes_are_merged_per_notification(self):
+        sync = MirrorSync(InMemoryTransport())
+        first, second, third = self.notifications
+        for notification in self.notifications:
+            sync.created(notification)
+        sync.marked_read(self.user.id, [first.id])
+        sync.deleted(self.user.id, [second.id])
+        sync.flush()
+        (update,) = sync.transport.updates
+        base = f"notifications/{self.user.id}"
+        self.assertEqual(len(update), 3)
+        self.assertTrue(update[f"{base}/{first.id}"]["read"])
+        self.assertIsNone(update[f"{base}/{second.id}"])
+        self.assertEqual(update[f"{base}/{third.id}"]["title"], "n2")
+
+    def test_created_after_delete_all_survives_the_reset(self):
+        sync = MirrorSync(self.firebase)
+        first, second, _ = self.notifications
+        sync.deleted_all(self.user.id)
+        sync.created(first)
+        sync.marked_read(self.user.id, [first.id, second.id])
+        sync.flush()
+        self.assertEqual(list(self.user_node()), [str(first.id)])
+        self.assertTrue(self.user_node()[str(first.id)]["read"])
+
+    def test_failed_flush_is_retried_with_newer_changes(self):
+        first = self.notifications[0]
+        with mock.patch.object(self.firebase, "update", side_effect=OSError):
+            self.sync.marked_read(self.user.id, [first.id])
+            with self.assertRaises(OSError):
+                self.sync.flush()
+        self.sync.deleted(self.user.id, [first.id])
+        self.sync.flush()
+        self.assertNotIn(str(first.id), self.user_node())
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(company_name="Acme")
+        cls.user = User.objects.create_user(
+            username="office@example.com",
+            email="office@example.com",
+            password="pass",
+            user_type="backoffice",
+        )
+        BackOfficeUser.objects.create(user=cls.user, company=cls.company)
+        cls.driver = User.objects.create_user(
+            username="driver@example.com", email="driver@example.com", password="pass"
+        )
+        Driver.objects.create(user=cls.driver)
+
+    def setUp(self):
+        cache.clear()
+        # The test cache is LocMem; stand in for a shared one.
+        enter_context(
+            self, mock.patch("users.authentication.is_shared_cache", return_value=True)
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self, key=None, queries=0):
+        with self.assertNumQueries(queries):
+            user, token = self.auth.authenticate_credentials(key or self.token.key)
+        self.assertEqual(token.key, key or self.token.key)
+        return user
+
+    def test_one_joined_query_then_cached(self):
+        user = self.authenticate(queries=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.backoffice.company.company_name, "Acme")
+            self.assertFalse(hasattr(user, "driver"))
+        user = self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(user.backoffice.company_id, self.company.id)
+
+        driver_token = Token.objects.create(user=self.driver)
+        driver = self.authenticate(driver_token.key, queries=1)
+        with self.assertNumQueries(0):
+            self.assertFalse(hasattr(driver, "backoffice"))
+            self.assertIsNotNone(driver.driver)
+
+    def test_requests_skip_the_token_lookup(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        url = reverse("notification-list")
+        client.get(url)
+        with self.assertNumQueries(2):  # Page count and page rows
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_and_profile_edits_invalidate(self):
+        self.authenticate(queries=1)
+        self.user.set_password("new-pass")
+        self.user.save()
+        self.authenticate(queries=1)
+
+        self.company.company_name = "Acme Logistics"
+        self.company.save()
+        user = self.authenticate(queries=1)
+        self.assertEqual(user.backoffice.company.company_name, "Acme Logistics")
+
+        Driver.objects.create(user=self.user)
+        self.assertTrue(hasattr(self.authenticate(queries=1), "driver"))
+
+    def test_rotated_token_and_inactive_user_are_rejected(self):
+        self.authenticate(queries=1)
+        key = self.token.key
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+        token = Token.objects.create(user=self.user)
+        self.authenticate(token.key, queries=1)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(token.key)
+
+    def test_logout_drops_the_cached_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertEqual(client.get(reverse("user-logout")).status_code, 200)
+        self.authenticate(queries=1)
+
+    def test_process_local_cache_is_not_used(self):
+        with mock.patch("users.authentication.is_shared_cache", return_value=False):
+            user = self.authenticate(queries=1)
+            with self.assertNumQueries(0):
+                self.assertEqual(user.backoffice.company_id, self.company.id)
+            self.authenticate(queries=1)
+            self.assertFalse(cache.get(token_cache_key(self.token.key)))
+
+            key = self.token.key
+            self.token.delete()
+            with self.assertRaises(AuthenticationFailed):
+                self.auth.authenticate_credentials(key)
+
+    def test_only_shared_backends_count_as_shared(self):
+        for backend, shared in [
+            ("django.core.cache.backends.locmem.LocMemCache", False),
+            ("django.core.cache.backends.dummy.DummyCache", False),
+            ("django_redis.cache.RedisCache", True),
+        ]:
+            with override_settings(CACHES={"default": {"BACKEND": backend}}):
+                self.assertIs(is_shared_cache(), shared)
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(company_name="Acme")
+        cls.other_company = Company.objects.create(company_name="Globex")
+        cls.user = User.objects.create_user(
+            username="office@example.com",
+            email="office@example.com",
+            password="pass",
+            user_type="backoffice",
+        )
+        BackOfficeUser.objects.create(user=cls.user, company=cls.company)
+        cls.other = User.objects.create_user(
+            username="globex@example.com",
+            email="globex@example.com",
+            password="pass",
+            user_type="backoffice",
+        )
+        BackOfficeUser.objects.create(user=cls.other, company=cls.other_company)
+        cls.driver = User.objects.create_user(
+            username="driver@example.com",
+            email="driver@example.com",
+            password="pass",
+            user_type="driver",
+        )
+        Driver.objects.create(user=cls.driver)
+
+    def setUp(self):
+        cache.clear()
+        # Authentication is cached too, as with the shared production cache.
+        enter_context(
+            self, mock.patch("users.authentication.is_shared_cache", return_value=True)
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def get(self, client, name, **headers):
+        response = client.get(reverse(name), **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_profiles_are_scoped_per_user_and_company(self):
+        client, other = self.client_for(self.user), self.client_for(self.other)
+        self.assertEqual(self.get(client, "company-view")["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.get(client, "company-view")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["company_name"], "Acme")
+        response = self.get(other, "company-view")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["company_name"], "Globex")
+
+        self.company.company_name = "Acme Logistics"
+        self.company.save()
+        response = self.get(client, "company-view")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["company_name"], "Acme Logistics")
+        self.assertEqual(self.get(other, "company-view")["X-Cache"], "HIT")
+
+    def test_user_profile_varies_by_platform_and_follows_the_user(self):
+        client = self.client_for(self.driver)
+        self.get(client, "user-profile")
+        mobile = self.get(client, "user-profile", HTTP_PLATFORM="mobile")
+        self.assertEqual(mobile["X-Cache"], "MISS")
+        self.assertIn("user_data", mobile.data)
+        self.assertEqual(self.get(client, "user-profile")["X-Cache"], "HIT")
+
+        self.driver.first_name = "Dana"
+        self.driver.save()
+        response = self.get(client, "user-profile")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["user"]["first_name"], "Dana")
+
+    def test_lists_are_invalidated_by_their_models(self):
+        client = self.client_for(self.user)
+        self.get(client, "driver-list")
+        self.get(client, "associatecompany-list")
+        self.assertEqual(self.get(client, "driver-list")["X-Cache"], "HIT")
+
+        self.driver.last_name = "Doe"
+        self.driver.save()
+        response = self.get(client, "driver-list")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data[0]["user"]["last_name"], "Doe")
+
+        self.assertEqual(self.get(client, "associatecompany-list")["X-Cache"], "HIT")
+        AssociateCompany.objects.create(
+            company=self.company, associate_company_name="Customer Co"
+        )
+        response = self.get(client, "associatecompany-list")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data), 1)
+
+    def test_hit_and_miss_counters(self):
+        client = self.client_for(self.user)
+        for _ in range(3):
+            self.get(client, "company-view")
+        out = StringIO()
+        call_command("response_cache_stats", "--reset", stdout=out)
+        self.assertIn("company-profile", out.getvalue())
+        self.assertEqual(cache_stats()["company-profile"], {"hits": 0, "misses": 0})
+        self.assertIn("2 hits", " ".join(out.getvalue().split()))
@@ -1,16 +1,17 @@
 from importlib import import_module
 from pathlib import Path
 
+from .manifest import get_registry
 from .utils import posixpath_to_modulepath
 
 # BE CAREFUL! Do not remove or change this code snippet, this is needed to get
 # Crowdbotics' official modules working properly.
 
 try:
-    admins = Path(".").rglob("admin.py")
+    admins = map(Path, get_registry()["admin"])
 
     for admin in admins:
-        module = import_module(posixpath_to_modulepath(admin), package="modules")
-        from module import *  # noqa
+        if not admin.parent.name == "modules":
+            import_module(posixpath_to_modulepath(admin), package="modules")
 except (ImportError, IndexError):
     pass
@@ -1,19 +1,104 @@
+import json
+import os
+import tempfile
 from pathlib import Path
-from django.urls import path, include
 
 MODULES_PACKAGE_NAME = "modules"
 MODULES_DIR = f"{Path.cwd()}/{MODULES_PACKAGE_NAME}/"
-APPS = Path(MODULES_DIR).rglob("apps.py")
+# The module files found under MODULES_DIR, kept between processes. It is
+# rebuilt when the mtime of MODULES_DIR or of a package directly inside it
+# changes, i.e. when a module, or a file at the top of a module, is added or
+# removed. It lives outside MODULES_DIR, whose mtime writing it would change.
+MANIFEST_FILE = f"{Path.cwd()}/.modules.manifest"
+# Files recorded in the manifest, by kind.
+MODULE_FILES = {
+    "apps": "apps.py",
+    "urls": "urls.py",
+    "admin": "admin.py",
+    "options": "options.py",
+}
+SKIPPED_DIRS = {"__pycache__", "migrations"}
 
+_registry = None
 
-def get_modules():
+
+def is_module_dir(name):
+    return name not in SKIPPED_DIRS and not name.startswith(".")
+
+
+def directory_stamp():
+    """mtimes of MODULES_DIR and of every package directly inside it."""
+    stamp = {".": os.stat(MODULES_DIR).st_mtime_ns}
+    with os.scandir(MODULES_DIR) as entries:
+        for entry in entries:
+            if entry.is_dir() and is_module_dir(entry.name):
+                stamp[entry.name] = entry.stat().st_mtime_ns
+    return stamp
+
+
+def scan_modules():
+    """Posix paths, relative to the project, of the MODULE_FILES by kind."""
+    kinds = {filename: kind for kind, filename in MODULE_FILES.items()}
+    found = {kind: [] for kind in MODULE_FILES}
+    project_dir = Path(MODULES_DIR).parent
+    for directory, dirnames, filenames in os.walk(MODULES_DIR):
+        dirnames[:] = [name for name in dirnames if is_module_dir(name)]
+        for filename in filenames:
+            if filename in kinds:
+                path = Path(directory, filename).relative_to(project_dir)
+                found[kinds[filename]].append(path.as_posix())
+    return {kind: sorted(paths) for kind, paths in found.items()}
+
+
+def write_manifest(manifest):
     try:
-        modules = []
-        python_package_separator = "."
-        for app in APPS:
-            app_name = app.as_posix().replace(MODULES_DIR, f"{MODULES_PACKAGE_NAME}/")
-            app_name = python_package_separator.join(app_name.split("/")[:-1])
-            modules.append(app_name)
-        return modules
-    except (ImportError, IndexError):
-        pass
+        fd, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(MANIFEST_FILE), prefix=".modules-"
+        )
+    except OSError:
+        # Read-only checkout: every process scans, as it did before.
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temporary, MANIFEST_FILE)
+    except OSError:
+        os.unlink(temporary)
+
+
+def get_registry():
+    """
+    The module files under MODULES_DIR, as ``{kind: [path, ...]}``.
+
+    Read from MANIFEST_FILE while the directory stamp it was built with still
+    matches, otherwise scanned and written back; kept in memory afterwards.
+    """
+    global _registry
+    if _registry is not None:
+        return _registry
+    try:
+        stamp = directory_stamp()
+    except OSError:
+        # Not started from the project directory: there are no modules.
+        _registry = {kind: [] for kind in MODULE_FILES}
+        return _registry
+    try:
+        with open(MANIFEST_FILE) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("stamp") == stamp:
+        _registry = manifest["modules"]
+    else:
+        _registry = scan_modules()
+        write_manifest({"stamp": stamp, "modules": _registry})
+    return _registry
+
+
+def clear_registry():
+    global _registry
+    _registry = None
+
+
+def get_modules():
+    return [".".join(Path(app).parent.parts) for app in get_registry()["apps"]]
@@ -1,8 +1,8 @@
 from pathlib import Path
-from django.conf import settings
 from django.urls import path, include
 from django.db.utils import ProgrammingError
 
+from .manifest import get_registry
 from .utils import posixpath_to_modulepath
 
 urlpatterns = []
@@ -12,17 +12,14 @@ urlpatterns = []
 # Crowdbotics' official modules working properly.
 
 try:
-    base_dir = Path(settings.BASE_DIR)
-    modules_dir = base_dir / "modules"
-    urls = modules_dir.rglob("urls.py")
-    for url in urls:
+    for url in map(Path, get_registry()["urls"]):
         module_name, _ = url.as_posix().split("/")[-2:]
         if not module_name == "modules":
             module_url = module_name.replace("_", "-")
             urlpatterns += [
                 path(
                     f"{module_url}/",
-                    include(posixpath_to_modulepath(url.relative_to(base_dir))),
+                    include(posixpath_to_modulepath(url)),
                 )  # noqa
             ]
 except (ImportError, IndexError, ProgrammingError):
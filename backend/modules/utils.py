@@ -3,18 +3,48 @@ import json
 
 from pathlib import Path
 
+from .manifest import get_registry
+
 GLOBAL_OPTIONS_FILE_PATH = f"{Path.cwd()}/modules/options.json"
 
+# Option values by (module slug, option key), and the parsed options.json.
+_options = {}
+_global_options = {}
+
 
 def posixpath_to_modulepath(posixpath):
     module_parent_path = posixpath.parent.as_posix().replace("/", ".")
     return f"{module_parent_path}.{posixpath.stem}"
 
 
+def get_global_options():
+    if "module_options" not in _global_options:
+        with open(GLOBAL_OPTIONS_FILE_PATH, "r") as f:
+            all_module_options = json.loads(f.read())
+        _global_options["module_options"] = all_module_options.get(
+            "module_options", None
+        )
+    return _global_options["module_options"]
+
+
+def clear_options():
+    _options.clear()
+    _global_options.clear()
+
+
 def get_options(module_slug, option_key):
-    with open(GLOBAL_OPTIONS_FILE_PATH, "r") as f:
-        all_module_options = json.loads(f.read())
-        all_module_options = all_module_options.get("module_options", None)
+    """
+    Return ``option_key`` of a module: its value in options.json, else the
+    default in the module's options.py. Memoised per process.
+    """
+    key = (module_slug, option_key)
+    if key not in _options:
+        _options[key] = load_option(module_slug, option_key)
+    return _options[key]
+
+
+def load_option(module_slug, option_key):
+    all_module_options = get_global_options()
 
     option_value = None
 
@@ -23,8 +53,11 @@ def get_options(module_slug, option_key):
         if module_options:
             option_value = module_options.get(option_key, None)
 
+    module_dir = module_slug.replace("-", "_")
     module_options_file = next(
-        Path(".").rglob(f"**/{module_slug.replace('-', '_')}/**/options.py")
+        options_file
+        for options_file in map(Path, get_registry()["options"])
+        if module_dir in options_file.parts[:-1]
     )
 
     options_module = posixpath_to_modulepath(module_options_file)
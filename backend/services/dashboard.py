@@ -0,0 +1,270 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from backoffice.models import (
+    AssociateCompany,
+    DailyShipmentRollup,
+    DashboardCounter,
+    GlobalCounter,
+    RollupWatermark,
+    Shipment,
+)
+from core.enums import ShipmentMilestone
+from django.db import transaction
+from django.db.models import Case, Count, F, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from users.models import BackOfficeUser, Driver
+
+# GlobalCounter row holding the number of drivers, shown to every user.
+DRIVER_COUNTER = "drivers"
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def count_dashboard(user):
+    """Compute the dashboard figures of ``user`` from scratch."""
+    today = timezone.localdate()
+    start_of_today = start_of_day(today)
+    shipments = Shipment.objects.filter(created_by=user, is_deleted=False)
+    company_id = (
+        BackOfficeUser.objects.filter(user=user)
+        .values_list("company_id", flat=True)
+        .first()
+    )
+    return {
+        "day": today,
+        "today_shipment": shipments.filter(
+            created_at__gte=start_of_today,
+            created_at__lt=start_of_today + timedelta(days=1),
+        ).count(),
+        "total_shipment": shipments.count(),
+        "associate_company": (
+            AssociateCompany.objects.filter(company_id=company_id).count()
+            if company_id
+            else 0
+        ),
+    }
+
+
+def refresh_dashboard_counter(user):
+    """
+    Recount the figures of ``user``; returns the counter and whether it drifted.
+
+    The counter row is locked (created first if missing) before counting, so
+    an event adjusting it concurrently waits and lands on top of the recount
+    instead of being overwritten.
+    """
+    with transaction.atomic():
+        counter, created = DashboardCounter.objects.select_for_update().get_or_create(
+            user=user, defaults={"day": timezone.localdate()}
+        )
+        values = count_dashboard(user)
+        values["reconciled_at"] = timezone.now()
+        expected = DashboardCounter(**values)
+        counter.total_driver = expected.total_driver = driver_total()
+        current = get_dashboard_stats(counter, values["day"])
+        expected = get_dashboard_stats(expected, values["day"])
+        for field, value in values.items():
+            setattr(counter, field, value)
+        counter.save()
+    return counter, not created and current != expected
+
+
+def refresh_driver_counter():
+    """Recount the drivers; returns the total and whether the counter drifted."""
+    with transaction.atomic():
+        counter, created = GlobalCounter.objects.select_for_update().get_or_create(
+            name=DRIVER_COUNTER
+        )
+        current, counter.value = counter.value, Driver.objects.count()
+        counter.save(update_fields=["value"])
+    return counter.value, not created and current != counter.value
+
+
+def driver_total():
+    """The number of drivers, counted once if there is no counter yet."""
+    total = (
+        GlobalCounter.objects.filter(name=DRIVER_COUNTER)
+        .values_list("value", flat=True)
+        .first()
+    )
+    if total is None:
+        total, _ = refresh_driver_counter()
+    return total
+
+
+def with_driver_total(queryset):
+    """Annotate DashboardCounter rows with ``total_driver``, in the same query."""
+    return queryset.annotate(
+        total_driver=Subquery(
+            GlobalCounter.objects.filter(name=DRIVER_COUNTER).values("value")[:1]
+        )
+    )
+
+
+def get_dashboard_stats(counter, today=None):
+    """
+    The figures shown on the dashboard; ``counter`` carries ``total_driver``
+    (see ``with_driver_total``).
+    """
+    today = today or timezone.localdate()
+    today_shipment = counter.today_shipment if counter.day == today else 0
+    return {
+        "today_shipment": today_shipment,
+        "total_shipment": counter.total_shipment,
+        "total_driver": counter.total_driver,
+        "associate_company": counter.associate_company,
+        # Shipments created before today
+        "shipment_history": counter.total_shipment - today_shipment,
+    }
+
+
+def shipment_counted(user_id, created_at, delta):
+    """Add ``delta`` live shipments created at ``created_at`` by ``user_id``."""
+    if not user_id:
+        return
+    today = timezone.localdate()
+    today_delta = delta if timezone.localdate(created_at) == today else 0
+    DashboardCounter.objects.filter(user_id=user_id).update(
+        total_shipment=F("total_shipment") + delta,
+        # A row last touched on an earlier day starts today's count afresh.
+        today_shipment=Case(
+            When(day=today, then=F("today_shipment") + today_delta),
+            default=Value(max(today_delta, 0)),
+        ),
+        day=today,
+    )
+
+
+def driver_counted(delta):
+    updated = GlobalCounter.objects.filter(name=DRIVER_COUNTER).update(
+        value=F("value") + delta
+    )
+    if not updated:
+        # No counter yet: count the table, which already holds this change.
+        refresh_driver_counter()
+
+
+def associate_company_counted(company_id, delta):
+    DashboardCounter.objects.filter(user__backoffice__company_id=company_id).update(
+        associate_company=F("associate_company") + delta
+    )
+
+
+# The Shipment date column recording each milestone.
+MILESTONE_FIELDS = {
+    ShipmentMilestone.CREATED.value: "created_at",
+    ShipmentMilestone.PICKED_UP.value: "pickedup_date",
+    ShipmentMilestone.DELIVERED.value: "driver_delivered_date",
+    ShipmentMilestone.ACCEPTED.value: "warehouse_accepted_date",
+}
+ROLLUP_WATERMARK = "shipment_rollup"
+# Rows are picked up again this long before the watermark, so a transaction
+# that committed after the previous run started is not missed. Rebuilding a
+# bucket twice is harmless.
+ROLLUP_OVERLAP = timedelta(minutes=5)
+COMPANY = "created_by__backoffice__company_id"
+
+
+def changed_buckets(since=None):
+    """Return ``{company id: {day, ...}}`` touched by shipments changed since ``since``."""
+    queryset = Shipment.objects.filter(**{f"{COMPANY}__isnull": False})
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    buckets = defaultdict(set)
+    rows = queryset.values_list(COMPANY, *MILESTONE_FIELDS.values())
+    for company_id, *dates in rows.iterator(chunk_size=2000):
+        for value in filter(None, dates):
+            buckets[company_id].add(timezone.localdate(value))
+    return buckets
+
+
+def count_buckets(company_id, days):
+    """Count the live shipments of ``company_id`` per milestone on ``days``."""
+    start = start_of_day(min(days))
+    end = start_of_day(max(days)) + timedelta(days=1)
+    shipments = Shipment.objects.filter(is_deleted=False, **{COMPANY: company_id})
+    rollups = []
+    for milestone, field in MILESTONE_FIELDS.items():
+        counts = (
+            shipments.filter(**{f"{field}__gte": start, f"{field}__lt": end})
+            .annotate(day=TruncDate(field))
+            .values("day")
+            .annotate(count=Count("id"))
+            .values_list("day", "count")
+        )
+        rollups.extend(
+            DailyShipmentRollup(
+                company_id=company_id, day=day, status=milestone, count=count
+            )
+            for day, count in counts
+            if day in days
+        )
+    return rollups
+
+
+def rollup_shipments(full=False):
+    """
+    Bring DailyShipmentRollup up to date; returns the number of buckets rebuilt.
+
+    Only the (company, day) buckets touched by shipments changed since the
+    watermark are recounted. Writes that bypass ``updated_at`` (hard deletes,
+    ``QuerySet.update()`` without it) are only picked up by a ``full`` rebuild.
+    """
+    started_at = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).first()
+    full = full or watermark is None
+    buckets = changed_buckets(None if full else watermark.value - ROLLUP_OVERLAP)
+    with transaction.atomic():
+        if full:
+            DailyShipmentRollup.objects.all().delete()
+        for company_id, days in buckets.items():
+            if not full:
+                DailyShipmentRollup.objects.filter(
+                    company_id=company_id, day__in=days
+                ).delete()
+            DailyShipmentRollup.objects.bulk_create(count_buckets(company_id, days))
+        RollupWatermark.objects.update_or_create(
+            name=ROLLUP_WATERMARK, defaults={"value": started_at}
+        )
+    return sum(len(days) for days in buckets.values())
+
+
+def periods(start, end, interval):
+    """Yield the first day of every ``interval`` ("day" or "month") in range."""
+    if interval == "month":
+        start = start.replace(day=1)
+    while start <= end:
+        yield start
+        if interval == "month":
+            start = (start + timedelta(days=32)).replace(day=1)
+        else:
+            start += timedelta(days=1)
+
+
+def shipment_timeseries(company_id, start, end, interval="day"):
+    """
+    Milestone counts of ``company_id`` per ``interval`` from ``start`` to ``end``.
+
+    Read from the rollup: a 12-month chart sums at most a few hundred rows.
+    Periods without shipments are filled with zeros.
+    """
+    rollups = DailyShipmentRollup.objects.filter(
+        company_id=company_id, day__gte=start, day__lte=end
+    )
+    if interval == "month":
+        rollups = rollups.annotate(period=TruncMonth("day"))
+    else:
+        rollups = rollups.annotate(period=F("day"))
+    counts = rollups.values("period", "status").annotate(total=Sum("count"))
+
+    series = {
+        period: {"period": period, **dict.fromkeys(MILESTONE_FIELDS, 0)}
+        for period in periods(start, end, interval)
+    }
+    for row in counts:
+        series[row["period"]][row["status"]] = row["total"]
+    return list(series.values())
@@ -0,0 +1,86 @@
+import logging
+
+from utils.outbound import CircuitBreaker
+
+# Tokens accepted by one messaging.send_each_for_multicast call.
+FCM_MULTICAST_LIMIT = 500
+# Codes of the per-device failures worth retrying; any other (an unregistered
+# or invalid token, a sender mismatch) would fail the same way again.
+RETRYABLE_CODES = {
+    "DEADLINE_EXCEEDED",
+    "INTERNAL",
+    "RESOURCE_EXHAUSTED",
+    "UNAVAILABLE",
+    "UNKNOWN",
+}
+
+# Fails pushes fast while FCM keeps failing, like the OutboundClient's
+# breaker per host: firebase_admin has its own HTTP session.
+breaker = CircuitBreaker()
+
+
+class FCMError(Exception):
+    pass
+
+
+def is_retryable(error):
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+
+def is_unregistered(error):
+    """Whether ``error`` means the token is gone for good (app uninstalled)."""
+    from firebase_admin import messaging
+
+    return isinstance(error, messaging.UnregisteredError)
+
+
+def send_multicast(registration_ids, title, body, data=None):
+    """
+    Send one notification payload to many devices through the FCM HTTP v1 API
+    (``messaging.send_each_for_multicast``).
+
+    ``registration_ids`` is split into calls of at most ``FCM_MULTICAST_LIMIT``
+    tokens. Returns ``{token: exception}`` for the devices FCM did not deliver
+    to. Raises FCMError when a call fails as a whole or the circuit is open,
+    so the caller can retry; callers that need the outcome of each call pass
+    at most ``FCM_MULTICAST_LIMIT`` tokens at a time.
+    """
+    # firebase_admin is loaded by the process that pushes, not by every
+    # process that imports this module.
+    from firebase_admin import exceptions, messaging
+    from utils.firebase import firebase_app
+
+    failed = {}
+    for start in range(0, len(registration_ids), FCM_MULTICAST_LIMIT):
+        chunk = registration_ids[start : start + FCM_MULTICAST_LIMIT]
+        if not breaker.allow():
+            raise FCMError("Circuit open for FCM")
+        message = messaging.MulticastMessage(
+            tokens=chunk,
+            notification=messaging.Notification(title=title, body=body),
+            # FCM only accepts string data values.
+            data={
+                key: str(value)
+                for key, value in (data or {}).items()
+                if value is not None
+            },
+        )
+        try:
+            batch = messaging.send_each_for_multicast(message, app=firebase_app())
+        except (exceptions.FirebaseError, ValueError, OSError) as error:
+            # OSError and ValueError: the service account could not be loaded.
+            breaker.failed()
+            raise FCMError(str(error)) from error
+        errors = {
+            token: response.exception
+            for token, response in zip(chunk, batch.responses)
+            if not response.success
+        }
+        if not batch.success_count and any(map(is_retryable, errors.values())):
+            breaker.failed()
+        else:
+            breaker.succeeded()
+        for token, error in errors.items():
+            logging.warning("FCM rejected %s: %s", token, error)
+        failed.update(errors)
+    return failed
@@ -0,0 +1,177 @@
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+ROOT = "notifications"
+
+
+class FirebaseTransport:
+    """Applies multi-path updates to the Firebase Realtime Database."""
+
+    def update(self, updates):
+        # firebase_admin is loaded by the process that flushes, not by every
+        # worker importing the views.
+        from firebase_admin import db
+        from utils.firebase import firebase_app
+
+        db.reference("/", app=firebase_app()).update(updates)
+
+
+class InMemoryTransport:
+    """
+    Local stand-in for the Realtime Database, for tests.
+
+    Keeps the tree in ``data`` and every update it received in ``updates``.
+    Like Firebase, rejects an update where one path is an ancestor of another.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.updates = []
+
+    def update(self, updates):
+        paths = sorted(updates)
+        for parent, child in zip(paths, paths[1:]):
+            if child.startswith(parent + "/"):
+                raise ValueError(f"{parent} is an ancestor of {child}")
+        self.updates.append(dict(updates))
+        for path, value in updates.items():
+            *parents, leaf = path.split("/")
+            node = self.data
+            for key in parents:
+                node = node.setdefault(key, {})
+            if value is None:
+                node.pop(leaf, None)
+            else:
+                node[leaf] = value
+
+    def get(self, path):
+        node = self.data
+        for key in path.split("/"):
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node
+
+
+def merge(older, newer):
+    """Combine two pending changes to one notification, ``newer`` last."""
+    if older is None or newer[0] != "patch" or older[0] == "delete":
+        return newer
+    return older[0], {**older[1], **newer[1]}
+
+
+class MirrorSync:
+    """
+    Collects changes to the Firebase notification mirror and writes them as one
+    multi-path ``update()`` per flush.
+
+    Each notification lives at ``notifications/<recipient id>/<notification
+    id>``. Changes recorded between flushes are merged per notification, so a
+    create followed by a read-mark is written once and a delete discards any
+    earlier pending change. Requests do not flush: their read-marks and
+    deletes are queued as ``MirrorOutbox`` rows and applied by the dispatch
+    worker (see ``services.notification.dispatch_mirror_changes``).
+    """
+
+    def __init__(self, transport=None):
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def get_transport(self):
+        if self.transport is None:
+            self.transport = import_string(settings.FIREBASE_MIRROR_TRANSPORT)()
+        return self.transport
+
+    def _user(self, recipient_id):
+        # {"reset": bool, "items": {notification id: (op, value)}}. A reset
+        # replaces the whole user node with the surviving ``set`` items.
+        return self._users.setdefault(str(recipient_id), {"reset": False, "items": {}})
+
+    def created(self, notification):
+        value = {
+            "title": notification.title,
+            "message": notification.message,
+            "read": notification.read,
+            "type": notification.type,
+            "shipment_id": notification.shipment_id,
+            "timestamp": {".sv": "timestamp"},  # Use Firebase server timestamp
+        }
+        with self._lock:
+            user = self._user(notification.recipient_id)
+            user["items"][str(notification.pk)] = ("set", value)
+
+    def marked_read(self, recipient_id, notification_ids, read=True):
+        with self._lock:
+            user = self._user(recipient_id)
+            for notification_id in map(str, notification_ids):
+                op, value = user["items"].get(notification_id, ("patch", {}))
+                if op == "delete":
+                    continue
+                if op == "set" or not user["reset"]:
+                    user["items"][notification_id] = (op, {**value, "read": read})
+
+    def deleted(self, recipient_id, notification_ids):
+        with self._lock:
+            user = self._user(recipient_id)
+            for notification_id in map(str, notification_ids):
+                if user["reset"]:
+                    user["items"].pop(notification_id, None)
+                else:
+                    user["items"][notification_id] = ("delete", None)
+
+    def deleted_all(self, recipient_id):
+        with self._lock:
+            self._users[str(recipient_id)] = {"reset": True, "items": {}}
+
+    def _take_updates(self):
+        with self._lock:
+            users, self._users = self._users, {}
+        updates = {}
+        for recipient_id, user in users.items():
+            base = f"{ROOT}/{recipient_id}"
+            if user["reset"]:
+                children = {
+                    notification_id: value
+                    for notification_id, (op, value) in user["items"].items()
+                    if op == "set"
+                }
+                updates[base] = children or None
+                continue
+            for notification_id, (op, value) in user["items"].items():
+                path = f"{base}/{notification_id}"
+                if op == "patch":
+                    for field, field_value in value.items():
+                        updates[f"{path}/{field}"] = field_value
+                else:
+                    updates[path] = value
+        return users, updates
+
+    def _restore(self, users):
+        # Put back what failed to flush, letting newer changes win.
+        with self._lock:
+            for recipient_id, user in users.items():
+                newer = self._users.get(recipient_id)
+                if newer is None:
+                    self._users[recipient_id] = user
+                elif not newer["reset"]:
+                    for notification_id, change in newer["items"].items():
+                        older = user["items"].get(notification_id)
+                        user["items"][notification_id] = merge(older, change)
+                    self._users[recipient_id] = user
+
+    def flush(self):
+        """Write every pending change in one update; returns the paths written."""
+        users, updates = self._take_updates()
+        if not updates:
+            return 0
+        try:
+            self.get_transport().update(updates)
+        except Exception:
+            self._restore(users)
+            raise
+        return len(updates)
+
+mirror = MirrorSync()
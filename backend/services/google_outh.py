@@ -3,8 +3,131 @@ import requests
 
 """
 
+import re
+import threading
+import time
+
 import requests
 from django.conf import settings
+from utils.outbound import outbound
+
+TOKEN_ENDPOINT = "https://oauth2.googleapis.com/token"
+USER_INFO_ENDPOINT = "https://www.googleapis.com/oauth2/v3/userinfo"
+# PEM certificates of the keys Google signs ID tokens with, by key id.
+CERTS_ENDPOINT = "https://www.googleapis.com/oauth2/v1/certs"
+ID_TOKEN_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Seconds allowed for a call to any Google endpoint, retries included.
+REQUEST_TIMEOUT = 10
+# Certificates are kept for the max-age Google sends with them, else this long.
+CERTS_DEFAULT_MAX_AGE = 3600
+# A token signed with an unknown key refetches the certificates (Google rotated
+# them) at most this often, so forged key ids cannot trigger a fetch per request.
+CERTS_MIN_REFETCH_INTERVAL = 60
+# Tolerated clock drift, in seconds, when checking iat and exp.
+ID_TOKEN_CLOCK_SKEW = 60
+
+_lock = threading.Lock()
+# {"keys": {key id: PEM}, "expires": timestamp, "fetched": timestamp}
+_certs = {"keys": {}, "expires": 0, "fetched": 0}
+
+
+class InvalidIdToken(ValueError):
+    pass
+
+
+class GoogleUnavailable(Exception):
+    """Google could not be reached or failed; the client's token is not at fault."""
+
+
+def call_google(method, url, **kwargs):
+    """
+    Send a request to a Google endpoint and return the response.
+
+    Raises GoogleUnavailable on a transport error, an open circuit or a 5xx
+    answer, so that an outage is not reported as an invalid token.
+    """
+    try:
+        response = outbound.request(method, url, deadline=REQUEST_TIMEOUT, **kwargs)
+    except requests.RequestException as error:
+        raise GoogleUnavailable(str(error)) from error
+    if response.status_code >= 500:
+        raise GoogleUnavailable(f"Google returned {response.status_code}")
+    return response
+
+
+def fetch_certs():
+    """
+    Download Google's signing certificates; returns ``(certs, max_age)``.
+    Raises GoogleUnavailable when they cannot be fetched.
+    """
+    response = call_google("GET", CERTS_ENDPOINT)
+    try:
+        response.raise_for_status()
+        certs = response.json()
+    except requests.RequestException as error:
+        raise GoogleUnavailable(str(error)) from error
+    max_age = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    return certs, int(max_age.group(1)) if max_age else CERTS_DEFAULT_MAX_AGE
+
+
+def clear_certs_cache():
+    with _lock:
+        _certs.update(keys={}, expires=0, fetched=0)
+
+
+def google_certs(key_id=None):
+    """
+    Return Google's signing certificates from the process-wide cache.
+
+    The set is refetched when it expires, or early when ``key_id`` is not in
+    it because Google started signing with a new key.
+    """
+
+    def stale(now):
+        rotated = (
+            key_id is not None
+            and key_id not in _certs["keys"]
+            and now - _certs["fetched"] >= CERTS_MIN_REFETCH_INTERVAL
+        )
+        return rotated or now >= _certs["expires"]
+
+    if stale(time.time()):
+        with _lock:
+            now = time.time()
+            if stale(now):
+                keys, max_age = fetch_certs()
+                _certs.update(keys=keys, expires=now + max_age, fetched=now)
+    return _certs["keys"]
+
+
+def verify_id_token(token):
+    """
+    Return the claims of a Google ID token after checking it locally: the
+    signature against the cached certificates, the expiry, the issuer and the
+    audience (``GOOGLE_ID_TOKEN_AUDIENCES``). Raises InvalidIdToken, or
+    GoogleUnavailable when the certificates cannot be fetched.
+    """
+    # google.auth.jwt pulls in the cryptography backend; only sign-in needs it.
+    from google.auth import exceptions, jwt
+
+    try:
+        key_id = jwt.decode_header(token).get("kid")
+        claims = jwt.decode(
+            token,
+            certs=google_certs(key_id),
+            audience=list(settings.GOOGLE_ID_TOKEN_AUDIENCES),
+            clock_skew_in_seconds=ID_TOKEN_CLOCK_SKEW,
+        )
+    except (ValueError, exceptions.GoogleAuthError) as error:
+        raise InvalidIdToken(str(error))
+    if claims.get("iss") not in ID_TOKEN_ISSUERS:
+        raise InvalidIdToken(f"Unexpected issuer {claims.get('iss')}")
+    return claims
+
+
+def is_id_token(token):
+    # ID tokens are JWTs; OAuth access tokens are opaque.
+    return token.count(".") == 2
 
 
 def exchange_code_for_tokens(code):
@@ -24,7 +147,6 @@ def exchange_code_for_tokens(code):
     client_secret = settings.GOOGLE_CLIENT_SECRET
     redirect_uri = settings.GOOGLE_REDIRECT_URI
 
-    token_endpoint = "https://oauth2.googleapis.com/token"
     payload = {
         "code": code,
         "client_id": client_id,
@@ -35,7 +157,8 @@ def exchange_code_for_tokens(code):
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
     }
-    response = requests.post(token_endpoint, data=payload, headers=headers)
+    # Not retried: an authorization code can be redeemed only once.
+    response = call_google("POST", TOKEN_ENDPOINT, data=payload, headers=headers)
     return response.json()
 
 
@@ -51,10 +174,41 @@ def get_user_info_from_google(access_token):
     endpoint with the provided access token and returns the JSON response containing the user
     information.
     """
-    user_info_endpoint = "https://www.googleapis.com/oauth2/v3/userinfo"
     params = {
         "access_token": access_token,
     }
 
-    response = requests.get(user_info_endpoint, params=params)
+    response = call_google("GET", USER_INFO_ENDPOINT, params=params)
     return response.json()
+
+
+def get_user_info(token):
+    """
+    Return the Google profile behind a token sent by a client.
+
+    An ID token is verified locally and its claims used as they are, with no
+    request to Google; anything else is taken for an access token and sent to
+    the userinfo endpoint. Raises InvalidIdToken for a bad ID token and
+    GoogleUnavailable when Google cannot be reached.
+    """
+    if is_id_token(token):
+        claims = verify_id_token(token)
+        if not claims.get("email"):
+            raise InvalidIdToken("The ID token carries no email; request the scope.")
+        return claims
+    return get_user_info_from_google(token)
+
+
+def get_user_info_from_tokens(tokens_response):
+    """
+    Return the Google profile for a code exchange response.
+
+    The ID token in the response is verified locally and used when it carries
+    the email; the userinfo endpoint is only called when it does not.
+    """
+    id_token = tokens_response.get("id_token")
+    if id_token:
+        claims = verify_id_token(id_token)
+        if claims.get("email"):
+            return claims
+    return get_user_info_from_google(tokens_response.get("access_token"))
@@ -0,0 +1,158 @@
+import codecs
+import csv
+import json
+
+from backoffice.models import Container, Shipment
+from backoffice.serializers import ContainerImportSerializer, ShipmentImportSerializer
+from core.enums import ShipmentStatus
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .dashboard import shipment_counted
+
+IMPORT_CHUNK_SIZE = 1000
+# Rejected rows listed in the report; the rest are only counted.
+MAX_REPORTED_ERRORS = 1000
+
+
+def manifest_format(name, content_type=None):
+    """Return "csv" or "jsonl" for an uploaded manifest, or None."""
+    name = (name or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or content_type in (
+        "application/jsonl",
+        "application/x-ndjson",
+    ):
+        return "jsonl"
+    return None
+
+
+def read_csv(stream):
+    """Yield ``(line, row, error)`` per CSV record; the first line names the columns."""
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+    for row in reader:
+        # Empty cells mean "not given", so model defaults apply.
+        row = {
+            key.strip(): value.strip()
+            for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()
+        }
+        yield reader.line_num, row, None
+
+
+def read_jsonl(stream):
+    """Yield ``(line, row, error)`` per line holding one JSON object."""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, None, f"Invalid JSON: {error}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, row, None
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+class ManifestImport:
+    """
+    Validates manifest rows in chunks and writes each chunk of valid rows as
+    one transaction of bulk INSERTs: a Container and a queued Shipment per row.
+
+    Invalid rows are skipped and reported with their line number; the rows
+    around them are still imported.
+    """
+
+    def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        # Field lists are built once and reused for every row.
+        self.container_fields = ContainerImportSerializer()
+        self.shipment_fields = ShipmentImportSerializer()
+        self.report = {"created": 0, "failed": 0, "errors": []}
+
+    def reject(self, line, errors):
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"row": line, "errors": errors})
+
+    def validate(self, line, row):
+        errors = {}
+        values = []
+        for fields in (self.container_fields, self.shipment_fields):
+            try:
+                values.append(fields.run_validation(row))
+            except ValidationError as error:
+                errors.update(error.detail)
+        if errors:
+            self.reject(line, errors)
+            return None
+        return values
+
+    def write(self, valid):
+        now = timezone.now()
+        containers = [Container(**container) for container, _ in valid]
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Container.objects.bulk_create(containers, batch_size=self.chunk_size)
+            else:
+                # Without INSERT ... RETURNING (SQLite before Django 4) the new
+                # ids are only known row by row.
+                for container in containers:
+                    container.save()
+            Shipment.objects.bulk_create(
+                [
+                    Shipment(
+                        container=container,
+                        status=ShipmentStatus.CONTAINER_QUEUED.value,
+                        created_by=self.user,
+                        **shipment,
+                    )
+                    for container, (_, shipment) in zip(containers, valid)
+                ],
+                batch_size=self.chunk_size,
+            )
+            # bulk_create sends no post_save, so count the shipments here.
+            shipment_counted(self.user.pk, now, len(valid))
+        self.report["created"] += len(valid)
+
+    def process(self, chunk):
+        valid = []
+        for line, row, error in chunk:
+            if error:
+                self.reject(line, {"non_field_errors": [error]})
+                continue
+            values = self.validate(line, row)
+            if values:
+                valid.append(values)
+        if valid:
+            self.write(valid)
+
+    def run(self, rows):
+        chunk = []
+        try:
+            for item in rows:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    self.process(chunk)
+                    chunk = []
+        except (UnicodeDecodeError, csv.Error) as error:
+            # The rest of the file cannot be read; keep what came before.
+            line = chunk[-1][0] + 1 if chunk else None
+            self.reject(line, {"non_field_errors": [f"Unreadable manifest: {error}"]})
+        self.process(chunk)
+        return self.report
+
+
+def import_manifest(stream, file_format, user, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import a CSV or JSON-lines manifest read from ``stream``; returns the report."""
+    rows = READERS[file_format](stream)
+    return ManifestImport(user, chunk_size).run(rows)
@@ -1,59 +1,475 @@
 import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
 
-from django.conf import settings
-from firebase_admin import credentials, db
-from pyfcm import FCMNotification
-from users.models import Device, Notification
-
-
-def send_push_notification(user, title, message, notification, shipment_id):
-    devices = Device.objects.filter(user=user)
-    registration_ids = devices.values_list("registration_id", flat=True)
-    push_service = FCMNotification(api_key=settings.FCM_SERVER_KEY)
-
-    result = push_service.notify_multiple_devices(
-        registration_ids=list(registration_ids),
-        message_title=title,
-        message_body=message,
-        data_message={
-            "type": notification.type,
-            "shipment_id": shipment_id,
-        },
+from core.enums import ShipmentStatus
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from users.models import (
+    Device,
+    MirrorOutbox,
+    Notification,
+    NotificationCounter,
+    NotificationOutbox,
+)
+from utils.chunks import pk_chunks
+
+from . import fcm
+from .firebase_mirror import MirrorSync, mirror
+
+# Delivery attempts before an outbox row (push or mirror change) is marked
+# failed.
+MAX_ATTEMPTS = 8
+# Retry n waits RETRY_BASE_DELAY * 2**(n - 1) seconds (jittered), capped.
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 60 * 60
+# Pushes for the same shipment and recipient created this close together are
+# collapsed into the most recent one.
+COALESCE_WINDOW = timedelta(seconds=30)
+SHIPMENT_STATUSES = {status.value for status in ShipmentStatus}
+# Notifications written per transaction by the bulk operations below.
+MAINTENANCE_CHUNK_SIZE = 1000
+# Claimed outbox rows are not due again for this long, so other workers skip
+# them while this one mirrors and pushes outside the claiming transaction. If
+# the worker dies they are picked up again once it has passed.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def refresh_unread_count(user_id):
+    """
+    Recount the unread notifications of ``user_id``; returns the count.
+
+    The counter row is locked (created first if missing) before counting, so
+    an increment racing with the recount waits and lands on top of it instead
+    of being overwritten.
+    """
+    with transaction.atomic():
+        counter, _ = NotificationCounter.objects.select_for_update().get_or_create(
+            user_id=user_id
+        )
+        counter.unread = Notification.objects.filter(
+            recipient_id=user_id, read=False
+        ).count()
+        counter.save(update_fields=["unread"])
+    return counter.unread
+
+
+def unread_counted(user_id, delta):
+    """Add ``delta`` unread notifications to the counter of ``user_id``."""
+    if not user_id or not delta:
+        return
+    updated = NotificationCounter.objects.filter(user_id=user_id).update(
+        unread=F("unread") + delta
     )
+    if not updated:
+        # No counter yet: count the table, which already holds this change.
+        refresh_unread_count(user_id)
+
+
+def unread_changed(before, after):
+    """
+    Count a notification going from ``before`` to ``after``, each a
+    ``(recipient_id, read)`` pair or None for a row created or deleted.
+    """
+    deltas = defaultdict(int)
+    for state, sign in ((before, -1), (after, 1)):
+        if state is not None and not state[1]:
+            deltas[state[0]] += sign
+    for user_id, delta in deltas.items():
+        unread_counted(user_id, delta)
+
+
+def get_unread_count(user_id):
+    counter = (
+        NotificationCounter.objects.filter(pk=user_id)
+        .values_list("unread", flat=True)
+        .first()
+    )
+    if counter is None:
+        return refresh_unread_count(user_id)
+    return counter
+
 
-    notifications_ref = db.reference(f"notifications/{user.id}")
-    new_notification_ref = notifications_ref.push()
-    new_notification_ref.set(
-        {
-            "title": title,
-            "message": message,
-            "read": False,  # Mark as unread initially
-            "timestamp": {".sv": "timestamp"},  # Use Firebase server timestamp
-        }
+def mirror_changed(recipient_id, operation, notification_ids=(), read=True):
+    """
+    Queue a change to the Firebase mirror of ``recipient_id``'s notifications.
+
+    Call it in the transaction making the change in SQL, so the change is
+    mirrored if and only if it commits.
+    """
+    MirrorOutbox.objects.create(
+        recipient_id=recipient_id,
+        operation=operation,
+        notification_ids=list(notification_ids),
+        read=read,
     )
-    return result
+
+
+def deleted_count(result):
+    # QuerySet.delete() also counts the cascaded outbox rows.
+    return result[1].get(Notification._meta.label, 0)
+
+
+def mark_all_read(user_id, chunk_size=MAINTENANCE_CHUNK_SIZE):
+    """Mark every notification of ``user_id`` read; returns the ids marked."""
+    unread = Notification.objects.filter(recipient_id=user_id, read=False)
+    marked_ids = []
+    for pks in pk_chunks(unread, chunk_size):
+        with transaction.atomic():
+            # Rows read concurrently drop out of the filter and stay counted.
+            marked = unread.filter(pk__range=(pks[0], pks[-1])).update(read=True)
+            unread_counted(user_id, -marked)
+            mirror_changed(user_id, MirrorOutbox.MARK_READ, pks)
+        marked_ids += pks
+    return marked_ids
+
+
+def delete_all_notifications(user_id, chunk_size=MAINTENANCE_CHUNK_SIZE):
+    """Delete every notification of ``user_id``; returns how many were deleted."""
+    notifications = Notification.objects.filter(recipient_id=user_id)
+    deleted = 0
+    for pks in pk_chunks(notifications, chunk_size):
+        chunk = notifications.filter(pk__range=(pks[0], pks[-1]))
+        with transaction.atomic():
+            unread = deleted_count(chunk.filter(read=False).delete())
+            unread_counted(user_id, -unread)
+            deleted += unread + deleted_count(chunk.delete())
+    mirror_changed(user_id, MirrorOutbox.DELETE_ALL)
+    return deleted
+
+
+def purge_read_notifications(older_than, chunk_size=MAINTENANCE_CHUNK_SIZE):
+    """
+    Delete the read notifications created before ``older_than`` and queue
+    their removal from the Firebase mirror; returns how many were deleted.
+    """
+    expired = Notification.objects.filter(read=True, created_at__lt=older_than)
+    deleted = 0
+    for pks in pk_chunks(expired, chunk_size):
+        with transaction.atomic():
+            rows = list(
+                expired.filter(pk__range=(pks[0], pks[-1]))
+                .select_for_update()
+                .values_list("recipient_id", "pk")
+            )
+            deleted += deleted_count(
+                Notification.objects.filter(pk__in=[pk for _, pk in rows]).delete()
+            )
+            by_recipient = defaultdict(list)
+            for recipient_id, pk in rows:
+                by_recipient[recipient_id].append(pk)
+            for recipient_id, notification_ids in by_recipient.items():
+                mirror_changed(recipient_id, MirrorOutbox.DELETE, notification_ids)
+    return deleted
 
 
 def create_and_send_notification(recipient, title, message, status, shipment_id):
-    notification = Notification.objects.create(
-        recipient=recipient,
-        title=title,
-        message=message,
-        type=status,
-        read=False,
-        shipment_id=shipment_id,
-        data={"shipment_id": shipment_id, "type": status},
+    """
+    Store a notification and queue its push delivery.
+
+    The Notification and its outbox row are committed together; the push
+    itself is made by the ``dispatch_notifications`` worker, so callers never
+    wait on FCM or Firebase.
+    """
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            recipient=recipient,
+            title=title,
+            message=message,
+            type=status,
+            read=False,
+            shipment_id=shipment_id,
+            data={"shipment_id": shipment_id, "type": status},
+        )
+        NotificationOutbox.objects.create(notification=notification)
+        unread_counted(notification.recipient_id, 1)
+    logging.warning("Notification queued for: {}".format(recipient))
+    return notification
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def coalesce(batch):
+    """
+    Split ``batch`` into rows to deliver and rows superseded by a newer push
+    for the same shipment and recipient within ``COALESCE_WINDOW``.
+
+    Status updates supersede each other; other notification types (such as
+    ``pdf_ready``) are only merged with pushes of the same type.
+    """
+    deliver, superseded, kept = [], [], {}
+    newest_first = sorted(
+        batch, key=lambda outbox: outbox.notification.created_at, reverse=True
     )
-    send_push_notification(recipient, title, message, notification, shipment_id)
-    logging.warning("Notification sent to: {}".format(recipient))
+    for outbox in newest_first:
+        notification = outbox.notification
+        kind = "status" if notification.type in SHIPMENT_STATUSES else notification.type
+        key = (notification.recipient_id, notification.shipment_id, kind)
+        newer = kept.get(key)
+        if (
+            notification.shipment_id is not None
+            and newer is not None
+            and newer.notification.created_at - notification.created_at
+            <= COALESCE_WINDOW
+        ):
+            superseded.append(outbox)
+            continue
+        kept[key] = outbox
+        deliver.append(outbox)
+    return deliver, superseded
+
+
+def multicast_chunks(members, tokens):
+    """
+    Split rows sharing one payload into multicasts of at most
+    ``FCM_MULTICAST_LIMIT`` device tokens; yields ``(rows, registration_ids)``.
+
+    A row's devices are never split across requests, so a failed request fails,
+    and later retries, only its own rows.
+    """
+    seen = set()
+    rows, registration_ids = [], []
+    for outbox in members:
+        own = [
+            registration_id
+            for registration_id in dict.fromkeys(
+                tokens[outbox.notification.recipient_id]
+            )
+            if registration_id not in seen
+        ]
+        seen.update(own)
+        if registration_ids and (
+            len(registration_ids) + len(own) > fcm.FCM_MULTICAST_LIMIT
+        ):
+            yield rows, registration_ids
+            rows, registration_ids = [], []
+        rows.append(outbox)
+        registration_ids += own
+    if registration_ids:
+        yield rows, registration_ids
+
+
+def push_batch(batch):
+    """
+    Push every row of ``batch`` using as few FCM requests as possible.
+
+    Device tokens for all recipients are loaded in one query and rows carrying
+    the same payload are merged into multicasts (see ``multicast_chunks``).
+    Returns the errors keyed by outbox primary key: a row fails when its
+    multicast failed, or when none of its devices got the push and FCM may
+    accept it later. Devices FCM reports unregistered are deleted.
+    """
+    tokens = defaultdict(list)
+    devices = Device.objects.filter(
+        user_id__in={outbox.notification.recipient_id for outbox in batch}
+    ).values_list("user_id", "registration_id")
+    for user_id, registration_id in devices:
+        tokens[user_id].append(registration_id)
+
+    groups = defaultdict(list)
+    for outbox in batch:
+        notification = outbox.notification
+        payload = (
+            notification.title,
+            notification.message,
+            notification.type,
+            notification.shipment_id,
+        )
+        groups[payload].append(outbox)
+
+    errors, unregistered = {}, set()
+    for (title, message, type_, shipment_id), members in groups.items():
+        for rows, registration_ids in multicast_chunks(members, tokens):
+            try:
+                failed = fcm.send_multicast(
+                    registration_ids,
+                    title,
+                    message,
+                    {"type": type_, "shipment_id": shipment_id},
+                )
+            except fcm.FCMError as error:
+                for outbox in rows:
+                    errors[outbox.pk] = error
+                continue
+            unregistered.update(
+                token for token, error in failed.items() if fcm.is_unregistered(error)
+            )
+            for outbox in rows:
+                own = tokens[outbox.notification.recipient_id]
+                if own and all(token in failed for token in own):
+                    retryable = [failed[t] for t in own if fcm.is_retryable(failed[t])]
+                    if retryable:
+                        errors[outbox.pk] = fcm.FCMError(str(retryable[0]))
+    if unregistered:
+        Device.objects.filter(registration_id__in=unregistered).delete()
+    return errors
+
+
+def deliver_batch(batch, push=None):
+    """
+    Mirror every row of ``batch`` and push the rows of ``push`` (all of
+    ``batch`` by default); returns the errors keyed by outbox pk.
+
+    Coalesced rows are left out of ``push`` but still mirrored: they are
+    notifications the user can list, only their push is superseded.
+    """
+    for outbox in batch:
+        mirror.created(outbox.notification)
+    try:
+        mirror.flush()
+    except Exception as error:
+        return {outbox.pk: error for outbox in batch}
+    return push_batch(batch if push is None else push)
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to ``batch_size`` due outbox rows by moving them ``CLAIM_TIMEOUT``
+    into the future, in one short transaction.
+
+    Rows are selected with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    workers can claim side by side without taking the same rows.
+    """
+    with transaction.atomic():
+        batch = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("notification")
+            .filter(
+                status=NotificationOutbox.PENDING, next_attempt_at__lte=timezone.now()
+            )
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if batch:
+            NotificationOutbox.objects.filter(
+                pk__in=[outbox.pk for outbox in batch]
+            ).update(next_attempt_at=timezone.now() + CLAIM_TIMEOUT)
+    return batch
+
+
+def dispatch_notifications(batch_size=100):
+    """
+    Deliver one batch of due outbox rows and return how many were processed.
+
+    The rows are claimed first (see ``claim_batch``); mirroring and the FCM
+    requests then run outside any transaction, so no row lock or connection is
+    held across the network calls, and the outcome is written afterwards. A
+    worker that dies mid-batch leaves its claim to expire and the rows are
+    picked up again (at-least-once).
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0
+    deliver, superseded = coalesce(batch)
+    errors = deliver_batch(batch, push=deliver)
+
+    now = timezone.now()
+    superseded = {outbox.pk for outbox in superseded}
+    for outbox in batch:
+        outbox.attempts += 1
+        error = errors.get(outbox.pk)
+        if error is None:
+            if outbox.pk in superseded:
+                outbox.status = NotificationOutbox.COALESCED
+            else:
+                outbox.status = NotificationOutbox.SENT
+                outbox.sent_at = now
+            outbox.last_error = ""
+            continue
+        logging.warning(
+            "Notification %s delivery failed (attempt %s): %s",
+            outbox.notification_id,
+            outbox.attempts,
+            error,
+        )
+        outbox.last_error = repr(error)
+        if outbox.attempts >= MAX_ATTEMPTS:
+            outbox.status = NotificationOutbox.FAILED
+        else:
+            outbox.next_attempt_at = now + retry_delay(outbox.attempts)
+    NotificationOutbox.objects.bulk_update(
+        batch, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+    )
+    return len(batch)
+
+
+def claim_mirror_changes(batch_size):
+    """
+    Claim up to ``batch_size`` due mirror changes, oldest first, the way
+    ``claim_batch`` claims outbox rows.
+
+    Only the oldest pending change of each recipient is taken, so one user's
+    changes are applied in the order they were made, also across workers and
+    while an earlier change is backing off.
+    """
+    pending = MirrorOutbox.objects.filter(status=MirrorOutbox.PENDING)
+    older = pending.filter(recipient_id=OuterRef("recipient_id"), pk__lt=OuterRef("pk"))
+    with transaction.atomic():
+        batch = list(
+            pending.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=timezone.now())
+            .exclude(Exists(older))
+            .order_by("pk")[:batch_size]
+        )
+        if batch:
+            MirrorOutbox.objects.filter(pk__in=[change.pk for change in batch]).update(
+                next_attempt_at=timezone.now() + CLAIM_TIMEOUT
+            )
+    return batch
+
 
+def apply_mirror_changes(batch):
+    """Write the changes of ``batch`` to the Firebase mirror in one update."""
+    # A MirrorSync of its own, so a failed flush is not left pending in the
+    # shared one and written by an unrelated flush.
+    sync = MirrorSync(mirror.get_transport())
+    for change in batch:
+        if change.operation == MirrorOutbox.MARK_READ:
+            sync.marked_read(
+                change.recipient_id, change.notification_ids, read=change.read
+            )
+        elif change.operation == MirrorOutbox.DELETE:
+            sync.deleted(change.recipient_id, change.notification_ids)
+        else:
+            sync.deleted_all(change.recipient_id)
+            # Notifications created since the delete survive the reset.
+            for notification in Notification.objects.filter(
+                recipient_id=change.recipient_id
+            ):
+                sync.created(notification)
+    sync.flush()
 
-# from pyfcm import FCMNotification
 
-# push_service = FCMNotification(api_key="<api-key>")
+def dispatch_mirror_changes(batch_size=100):
+    """
+    Apply one batch of due mirror changes and return how many were processed.
 
-# registration_id = "<device registration_id>"
-# message_title = "Uber update"
-# message_body = "Hi john, your customized news for today is ready"
-# result = push_service.notify_single_device(registration_id=registration_id, message_title=message_title, message_body=message_body)
-# print result
+    Applied changes are deleted. When the flush fails every change of the
+    batch backs off like a failed push and is marked failed once
+    ``MAX_ATTEMPTS`` is spent.
+    """
+    batch = claim_mirror_changes(batch_size)
+    if not batch:
+        return 0
+    try:
+        apply_mirror_changes(batch)
+    except Exception as error:
+        logging.warning("Firebase mirror flush failed: %s", error)
+        now = timezone.now()
+        for change in batch:
+            change.attempts += 1
+            change.last_error = repr(error)
+            if change.attempts >= MAX_ATTEMPTS:
+                change.status = MirrorOutbox.FAILED
+            else:
+                change.next_attempt_at = now + retry_delay(change.attempts)
+        MirrorOutbox.objects.bulk_update(
+            batch, ["status", "attempts", "next_attempt_at", "last_error"]
+        )
+    else:
+        MirrorOutbox.objects.filter(pk__in=[change.pk for change in batch]).delete()
+    return len(batch)
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.generate_pdf import (
+    init_render_worker,
+    render_document,
+    shipment_pdf_filename,
+    shipment_pdf_lines,
+)
+from utils.streaming import stream_zip
+
+EXPORT_CHUNK_SIZE = 200
+
+_lock = threading.Lock()
+# The render pool shared by the exports of this process, see shared_pool().
+_pool = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def start_pool(workers):
+    # Workers are spawned rather than forked: the web process runs threads and
+    # holds database connections, and rendering needs neither.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_render_worker,
+    )
+
+
+def shared_pool(workers):
+    """
+    Return this process's render pool, started with ``workers`` processes on
+    first use and kept for every later export.
+
+    Concurrent exports queue their documents on the same pool, so a web
+    process never runs more than ``workers`` renderers however many requests
+    export at once.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = start_pool(workers)
+        return _pool
+
+
+def discard_pool(pool):
+    """Drop ``pool`` as the shared pool, e.g. once a worker died and broke it."""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def shipment_documents(queryset):
+    """Yield a picklable ``(filename, title, lines)`` document per shipment."""
+    queryset = queryset.select_related(
+        "container",
+        "customer",
+        "driver__user",
+        "warehouse__company",
+    ).order_by("id")
+    for shipment in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            shipment_pdf_filename(shipment),
+            f"Shipment Details {shipment.id}",
+            shipment_pdf_lines(shipment),
+        )
+
+
+def submit_in_order(pool, documents, workers):
+    in_flight = deque()
+    try:
+        for document in documents:
+            in_flight.append(pool.submit(render_document, document))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        # An abandoned download leaves nothing queued on a shared pool.
+        for future in in_flight:
+            future.cancel()
+
+
+def render_documents(documents, workers, pool=None):
+    """
+    Render ``documents`` in order, on ``workers`` processes when above one.
+
+    ``pool`` is an already running pool to render on (see ``shared_pool``);
+    without it one is started for this call and shut down afterwards. Only
+    ``2 * workers`` documents are in flight at a time, so memory stays flat
+    however many shipments are exported.
+    """
+    if workers <= 1:
+        init_render_worker()
+        for document in documents:
+            yield render_document(document)
+        return
+
+    if pool is None:
+        with start_pool(workers) as pool:
+            yield from submit_in_order(pool, documents, workers)
+        return
+    try:
+        yield from submit_in_order(pool, documents, workers)
+    except BrokenProcessPool:
+        discard_pool(pool)
+        raise
+
+
+def export_shipment_pdfs(queryset, workers=None, pool=None):
+    """Stream the PDFs of ``queryset`` as one zip archive, chunk by chunk."""
+    workers = workers or default_workers()
+    return stream_zip(render_documents(shipment_documents(queryset), workers, pool))
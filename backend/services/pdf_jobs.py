@@ -0,0 +1,120 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from backoffice.models import Shipment
+from core.enums import PdfStatus
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from utils.generate_pdf import generate_shipment_pdf
+
+from .notification import create_and_send_notification
+
+# A job still rendering after this long belongs to a dead worker and is
+# claimed again.
+STALE_AFTER = timedelta(minutes=10)
+
+
+def queue_shipment_pdf(shipment):
+    """Ask the PDF workers to (re)render the proof of delivery of ``shipment``."""
+    now = timezone.now()
+    Shipment.objects.filter(pk=shipment.pk).update(
+        pdf_status=PdfStatus.QUEUED.value, pdf_updated_at=now, updated_at=now
+    )
+    shipment.pdf_status = PdfStatus.QUEUED.value
+    shipment.pdf_updated_at = now
+
+
+def claim_pdf_jobs(limit):
+    """Mark up to ``limit`` due jobs as rendering and return their shipment ids."""
+    now = timezone.now()
+    due = Q(pdf_status=PdfStatus.QUEUED.value) | Q(
+        pdf_status=PdfStatus.RENDERING.value, pdf_updated_at__lt=now - STALE_AFTER
+    )
+    with transaction.atomic():
+        shipment_ids = list(
+            Shipment.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("pdf_updated_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        Shipment.objects.filter(id__in=shipment_ids).update(
+            pdf_status=PdfStatus.RENDERING.value, pdf_updated_at=now
+        )
+    return shipment_ids
+
+
+def render_pdf_job(shipment_id):
+    """Render and store one proof of delivery; returns True once it is ready."""
+    try:
+        shipment = Shipment.objects.select_related(
+            "container",
+            "customer",
+            "created_by",
+            "driver__user",
+            "warehouse__user",
+            "warehouse__company",
+        ).get(pk=shipment_id)
+        generate_shipment_pdf(shipment, save=False)
+    except Exception as error:
+        logging.warning("Shipment %s PDF rendering failed: %s", shipment_id, error)
+        Shipment.objects.filter(
+            pk=shipment_id, pdf_status=PdfStatus.RENDERING.value
+        ).update(pdf_status=PdfStatus.FAILED.value, pdf_updated_at=timezone.now())
+        return False
+
+    now = timezone.now()
+    # Only finish the job we claimed: a shipment queued again meanwhile is
+    # rendered again with its newer data.
+    finished = Shipment.objects.filter(
+        pk=shipment_id, pdf_status=PdfStatus.RENDERING.value
+    ).update(
+        proof_of_delivery_file=shipment.proof_of_delivery_file.name,
+        pdf_status=PdfStatus.READY.value,
+        pdf_updated_at=now,
+        updated_at=now,
+    )
+    if not finished:
+        return False
+
+    message = (
+        f"Proof of delivery for container "
+        f"{shipment.container.container_number} is ready."
+    )
+    recipients = [shipment.created_by]
+    if shipment.warehouse:
+        recipients.append(shipment.warehouse.user)
+    for recipient in filter(None, recipients):
+        create_and_send_notification(
+            recipient,
+            shipment.container.container_number,
+            message,
+            "pdf_ready",
+            shipment.id,
+        )
+    return True
+
+
+def _render_in_worker(shipment_id):
+    try:
+        return render_pdf_job(shipment_id)
+    finally:
+        close_old_connections()
+
+
+def run_pdf_jobs(workers=4, batch_size=20):
+    """
+    Claim one batch of jobs and render it on a pool of ``workers`` threads.
+
+    Returns the number of jobs claimed. Rendering is mostly spent waiting on
+    storage uploads, so threads keep several uploads in flight.
+    """
+    shipment_ids = claim_pdf_jobs(batch_size)
+    if workers <= 1:
+        for shipment_id in shipment_ids:
+            render_pdf_job(shipment_id)
+    elif shipment_ids:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_in_worker, shipment_ids))
+    return len(shipment_ids)
@@ -0,0 +1,51 @@
+from utils.streaming import stream_csv, stream_ndjson, stream_xlsx
+
+# Rows fetched per round trip; on Postgres through a server-side cursor.
+EXPORT_CHUNK_SIZE = 2000
+
+# (column name, lookup) of every exported column, in order.
+EXPORT_COLUMNS = (
+    ("id", "id"),
+    ("container_number", "container__container_number"),
+    ("status", "status"),
+    ("customer", "customer__associate_company_name"),
+    ("driver", "driver__user__name"),
+    ("warehouse", "warehouse__company__company_name"),
+    ("pickup_location", "pickup_location"),
+    ("delivery_location", "delivery_location"),
+    ("assigned_date", "assigned_date"),
+    ("picked_up", "pickedup_date"),
+    ("delivered", "driver_delivered_date"),
+    ("accepted", "warehouse_accepted_date"),
+    ("vessel_name", "vessel_name"),
+    ("voyage", "voyage"),
+    ("master_bill_of_landing", "master_bill_of_landing"),
+    ("reference_number", "reference_number"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+)
+
+# format: (writer, content type, file extension)
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv", "csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson", "ndjson"),
+    "xlsx": (
+        stream_xlsx,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "xlsx",
+    ),
+}
+
+
+def export_rows(queryset):
+    """Yield the export columns of ``queryset`` as tuples, a chunk at a time."""
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    # Tuples straight from the cursor: no model instances, no serializer.
+    return queryset.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_shipments(queryset, export_format):
+    """Stream ``queryset`` in ``export_format``; returns the body chunks."""
+    writer = EXPORT_FORMATS[export_format][0]
+    header = [name for name, _ in EXPORT_COLUMNS]
+    return writer(header, export_rows(queryset))
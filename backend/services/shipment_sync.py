@@ -0,0 +1,148 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from backoffice.models import ShipmentTombstone
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from users.models import User
+
+# Changed shipments returned per sync request; the client asks again while
+# ``more`` is set.
+SYNC_PAGE_SIZE = 200
+# Rows are picked up again this long before the client's watermark, so a
+# transaction that committed after the previous sync started is not missed.
+# Receiving a row twice is harmless.
+SYNC_OVERLAP = timedelta(seconds=30)
+# Tombstones older than this are pruned; a client that has not synced for
+# longer starts over with a full sync.
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+OWNER_FIELDS = ("created_by_id", "driver_id", "warehouse_id")
+
+
+def encode_token(since, after=None):
+    """``since`` is the client's watermark, ``after`` its (updated_at, id) position."""
+    position = None if after is None else [after[0].isoformat(), after[1]]
+    values = [since.isoformat(), position]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None or timezone.is_naive(moment):
+        raise ValueError(value)
+    return moment
+
+
+def decode_token(token):
+    """Return ``(since, after)``; raises ValueError for a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        since, after = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        since = parse_moment(since)
+        if after is not None:
+            moment, shipment_id = after
+            if not isinstance(shipment_id, int):
+                raise ValueError(token)
+            after = (parse_moment(moment), shipment_id)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError(token)
+    return since, after
+
+
+def owner_users(created_by_id=None, driver_id=None, warehouse_id=None):
+    """Ids of the users behind the owner columns of a shipment."""
+    owners = Q()
+    if created_by_id is not None:
+        owners |= Q(pk=created_by_id)
+    if driver_id is not None:
+        owners |= Q(driver__pk=driver_id)
+    if warehouse_id is not None:
+        owners |= Q(warehouse__pk=warehouse_id)
+    if not owners:
+        return []
+    return list(User.objects.filter(owners).values_list("pk", flat=True))
+
+
+def record_departures(shipment_id, **owners):
+    """Tombstone ``shipment_id`` for the users behind ``owners``."""
+    ShipmentTombstone.objects.bulk_create(
+        ShipmentTombstone(shipment_id=shipment_id, user_id=user_id)
+        for user_id in owner_users(**owners)
+    )
+
+
+def prune_tombstones():
+    """Delete tombstones past retention; returns how many were deleted."""
+    cutoff = timezone.now() - SYNC_TOMBSTONE_RETENTION
+    deleted, _ = ShipmentTombstone.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def sync_shipments(user, owned, token=None, page_size=SYNC_PAGE_SIZE):
+    """
+    Changes to the shipments of ``user`` since ``token``.
+
+    ``owned`` holds every shipment the user owns, soft-deleted ones included.
+    Without a token, or with one older than the tombstone retention, the
+    result is a full sync (``reset``): every live shipment, and the client
+    replaces its copy. Otherwise it holds the live shipments changed since the
+    token and, in ``deleted``, the ids the client must drop: soft-deleted rows
+    and rows reassigned to someone else or deleted outright.
+
+    Rows come oldest change first, ``page_size`` at a time; ``since`` is the
+    token of the next request, and ``more`` tells whether it should be sent
+    right away.
+    """
+    now = timezone.now()
+    since, after = decode_token(token) if token else (None, None)
+    reset = since is None or since < now - SYNC_TOMBSTONE_RETENTION
+    if reset:
+        since, after = now, None
+
+    window = since - SYNC_OVERLAP
+    rows = owned.order_by("updated_at", "id")
+    if after is not None:
+        moment, shipment_id = after
+        rows = rows.filter(
+            Q(updated_at__gt=moment) | Q(updated_at=moment, id__gt=shipment_id)
+        )
+    elif not reset:
+        rows = rows.filter(updated_at__gt=window)
+    if reset:
+        rows = rows.filter(is_deleted=False)
+    else:
+        # Rows deleted before the window were never sent, or already dropped.
+        rows = rows.filter(Q(is_deleted=False) | Q(updated_at__gt=window))
+
+    # Fetch one extra row to learn whether another page follows.
+    page = list(rows[: page_size + 1])
+    more = len(page) > page_size
+    page = page[:page_size]
+
+    deleted = {shipment.id for shipment in page if shipment.is_deleted}
+    if not reset:
+        deleted.update(
+            ShipmentTombstone.objects.filter(user=user, created_at__gt=window)
+            # Reassigned back since: the row is live again.
+            .exclude(
+                shipment_id__in=owned.filter(is_deleted=False).values("id")
+            ).values_list("shipment_id", flat=True)
+        )
+
+    if more:
+        last = page[-1]
+        next_token = encode_token(since, (last.updated_at, last.id))
+    else:
+        next_token = encode_token(now)
+    return {
+        "reset": reset,
+        "shipments": [shipment for shipment in page if not shipment.is_deleted],
+        "deleted": sorted(deleted),
+        "more": more,
+        "since": next_token,
+    }
@@ -18,15 +18,8 @@ import json
 import base64
 import binascii
 
-import firebase_admin
-
-import google.auth
-from firebase_admin import credentials
-from google.oauth2 import service_account
-from google.cloud import secretmanager
-from google.auth.exceptions import DefaultCredentialsError
-from google.api_core.exceptions import PermissionDenied
 from modules.manifest import get_modules
+from utils.secret_settings import SECRET_CACHE_TTL, load_secret_payload
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -38,16 +31,16 @@ env.read_env(env_file)
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool("DEBUG", default=False)
 
-try:
-    # Pull secrets from Secret Manager
-    _, project = google.auth.default()
-    client = secretmanager.SecretManagerServiceClient()
-    settings_name = os.environ.get("SETTINGS_NAME", "django_settings")
-    name = client.secret_version_path(project, settings_name, "latest")
-    payload = client.access_secret_version(name=name).payload.data.decode("UTF-8")
+# Pull secrets from Secret Manager. With SECRET_SETTINGS_CACHE set to a file
+# path, the payload is kept there and reused for SECRET_SETTINGS_CACHE_TTL
+# seconds, so short-lived processes (manage.py, new instances) skip the call.
+payload = load_secret_payload(
+    os.environ.get("SETTINGS_NAME", "django_settings"),
+    cache_path=env.str("SECRET_SETTINGS_CACHE", ""),
+    ttl=env.int("SECRET_SETTINGS_CACHE_TTL", SECRET_CACHE_TTL),
+)
+if payload is not None:
     env.read_env(io.StringIO(payload))
-except (DefaultCredentialsError, PermissionDenied):
-    pass
 
 
 # Quick-start development settings - unsuitable for production
@@ -133,15 +126,22 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'testing_47394.wsgi.application'
 
-FCM_SERVER_KEY = env.str("FCM_SERVER_KEY", "")
+FIREBASE_MIRROR_TRANSPORT = env.str(
+    "FIREBASE_MIRROR_TRANSPORT", "services.firebase_mirror.FirebaseTransport"
+)
+# Read notifications older than this many days are deleted by the
+# purge_read_notifications command.
+NOTIFICATION_RETENTION_DAYS = env.int("NOTIFICATION_RETENTION_DAYS", 90)
+# Processes of the render pool each web process keeps for bulk PDF exports,
+# shared by concurrent requests; 1 renders in the request thread instead.
+PDF_EXPORT_WORKERS = env.int("PDF_EXPORT_WORKERS", 2)
 FCM_JSON_FILE = os.path.join(
     BASE_DIR, "tradaill-firebase-adminsdk-ivcwm-1f5476b5e4.json"
 )
 # https://shippinglogistics-default-rtdb.firebaseio.com/
-
-cred = credentials.Certificate(FCM_JSON_FILE)
-firebase_admin.initialize_app(
-    cred, {"databaseURL": "https://tradaill-default-rtdb.firebaseio.com/"}
+# The Firebase app is initialised on first use, see utils.firebase.
+FIREBASE_DATABASE_URL = env.str(
+    "FIREBASE_DATABASE_URL", "https://tradaill-default-rtdb.firebaseio.com/"
 )
 
 
@@ -160,6 +160,36 @@ if env.str("DATABASE_URL", default=None):
         'default': env.db()
     }
 
+# Cache shared by every process, e.g. REDIS_URL=redis://redis:6379/1 for the
+# docker-compose Redis service. Without one, each process caches on its own
+# and the token, response and outbound-stats caches stay process-local (see
+# utils.cache.is_shared_cache).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CACHE_URL = env.str("CACHE_URL", default=None) or env.str("REDIS_URL", default=None)
+if CACHE_URL:
+    CACHES = {
+        'default': env.cache_url_config(
+            CACHE_URL,
+            backend=(
+                "django_redis.cache.RedisCache"
+                if CACHE_URL.startswith(("redis://", "rediss://"))
+                else None
+            ),
+        )
+    }
+
+# Seconds an authenticated token stays cached, see users.authentication.
+AUTH_TOKEN_CACHE_TIMEOUT = env.int("AUTH_TOKEN_CACHE_TIMEOUT", 300)
+# Seconds a cached read response lives, see utils.response_cache. Signals
+# invalidate entries on writes; keep this below SIGNED_URL_EXPIRY_MARGIN as
+# responses embed presigned S3 links.
+RESPONSE_CACHE_TIMEOUT = env.int("RESPONSE_CACHE_TIMEOUT", 120)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -229,6 +259,11 @@ SOCIALACCOUNT_ALLOW_REGISTRATION = env.bool("SOCIALACCOUNT_ALLOW_REGISTRATION",
 GOOGLE_CLIENT_ID = env.str("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = env.str("GOOGLE_CLIENT_SECRET", "")
 GOOGLE_REDIRECT_URI = env.str("GOOGLE_REDIRECT_URI", "")
+# Client ids accepted as the audience of Google ID tokens: the web client and
+# the Android / iOS clients of the mobile apps.
+GOOGLE_ID_TOKEN_AUDIENCES = env.list(
+    "GOOGLE_ID_TOKEN_AUDIENCES", default=[GOOGLE_CLIENT_ID] if GOOGLE_CLIENT_ID else []
+)
 SOCIALACCOUNT_PROVIDERS = {
     "google": {"SCOPE": ["profile", "email"], "AUTH_PARAMS": {"access_type": "online"}}
 }
@@ -243,7 +278,7 @@ REST_AUTH = {
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -324,13 +359,12 @@ def google_service_account_config():
         return json.loads(base64.b64decode(service_account_config))
     except (binascii.Error, ValueError):
         return {}
+# Turned into credentials by the storage on first use.
 GOOGLE_SERVICE_ACCOUNT_CONFIG = google_service_account_config()
-if GOOGLE_SERVICE_ACCOUNT_CONFIG:
-    GS_CREDENTIALS = service_account.Credentials.from_service_account_info(GOOGLE_SERVICE_ACCOUNT_CONFIG)
 GS_BUCKET_NAME = env.str("GS_BUCKET_NAME", "")
 if GS_BUCKET_NAME:
-    DEFAULT_FILE_STORAGE = "storages.backends.gcloud.GoogleCloudStorage"
-    STATICFILES_STORAGE = "storages.backends.gcloud.GoogleCloudStorage"
+    DEFAULT_FILE_STORAGE = "home.gcloud_storage.GoogleCloudStorage"
+    STATICFILES_STORAGE = "home.gcloud_storage.GoogleCloudStorage"
     GS_DEFAULT_ACL = "publicRead"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -0,0 +1,70 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from utils.cache import is_shared_cache
+
+CACHE_PREFIX = "auth-token:"
+
+# The role profile and company that views reach through ``request.user``.
+USER_RELATIONS = (
+    "user__backoffice__company",
+    "user__driver",
+    "user__warehouse__company",
+)
+
+
+def token_cache_key(key):
+    # Cache keys can show up in logs and key listings; never the token itself.
+    return CACHE_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(keys):
+    if is_shared_cache():
+        cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def forget_user(user_id):
+    """Drop the cached authentication of every token of ``user_id``."""
+    if is_shared_cache():
+        forget_tokens(
+            Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+        )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that resolves token, user, role profile and company
+    in one joined query and keeps the user in the shared cache.
+
+    ``request.user.backoffice`` / ``.driver`` / ``.warehouse`` and their
+    ``company`` are preloaded, and a missing role answers ``hasattr()`` without
+    a query. Cached entries are dropped by users.signals whenever the token,
+    the user or the profile changes, and on logout.
+
+    Those deletions must reach every process, so users are only cached when
+    the cache is shared (see utils.cache.is_shared_cache). With a
+    process-local cache every request looks the token up, as
+    TokenAuthentication does.
+    """
+
+    def authenticate_credentials(self, key):
+        shared = is_shared_cache()
+        cache_key = token_cache_key(key)
+        user = cache.get(cache_key) if shared else None
+        if user is None:
+            try:
+                token = Token.objects.select_related(*USER_RELATIONS).get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            user = token.user
+            if shared:
+                cache.set(cache_key, user, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return user, Token(key=key, user=user)
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.23 on 2026-10-17 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('coalesced', 'Coalesced')], default='pending', max_length=16),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.23 on 2026-10-17 12:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_notificationoutbox_coalesced'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to='users.user')),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
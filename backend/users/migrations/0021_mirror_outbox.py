@@ -0,0 +1,35 @@
+# Generated by Django 3.2.23 on 2026-10-17 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_notification_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirrorOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('mark_read', 'Mark read'), ('delete', 'Delete'), ('delete_all', 'Delete all')], max_length=16)),
+                ('notification_ids', models.JSONField(default=list)),
+                ('read', models.BooleanField(default=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mirroroutbox',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['recipient', 'next_attempt_at'], name='mirror_outbox_pending_idx'),
+        ),
+    ]
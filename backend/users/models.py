@@ -2,6 +2,7 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -168,6 +169,109 @@ class Notification(models.Model):
     data = models.JSONField(null=True, blank=True)
 
 
+class NotificationCounter(models.Model):
+    """
+    Unread notifications of one user, maintained incrementally.
+
+    Every write path of Notification adjusts the row in the same transaction
+    (see services.notification), so the badge is a primary key read.
+    ``reconcile_notification_counters`` repairs drift from writes that bypass
+    them, such as notifications deleted along with their shipment.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_counter",
+    )
+    unread = models.IntegerField(default=0)
+
+
+class NotificationOutbox(models.Model):
+    """
+    A pending push delivery for a Notification.
+
+    Rows are written in the same transaction as the Notification and delivered
+    by the ``dispatch_notifications`` worker, which retries failed pushes with
+    exponential backoff until its retry budget is spent.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    COALESCED = "coalesced"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+        (COALESCED, "Coalesced"),
+    )
+
+    notification = models.OneToOneField(
+        Notification, on_delete=models.CASCADE, related_name="outbox"
+    )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="outbox_pending_idx",
+                condition=models.Q(status="pending"),
+            )
+        ]
+
+
+class MirrorOutbox(models.Model):
+    """
+    A pending change to the Firebase notification mirror.
+
+    Read-marks and deletes are written in the transaction that makes them and
+    applied by the ``dispatch_notifications`` worker, which retries a failed
+    flush with exponential backoff until its retry budget is spent. Applied
+    rows are deleted; rows that ran out of attempts stay as ``failed``.
+    """
+
+    MARK_READ = "mark_read"
+    DELETE = "delete"
+    DELETE_ALL = "delete_all"
+    OPERATION_CHOICES = (
+        (MARK_READ, "Mark read"),
+        (DELETE, "Delete"),
+        (DELETE_ALL, "Delete all"),
+    )
+    PENDING = "pending"
+    FAILED = "failed"
+    STATUS_CHOICES = ((PENDING, "Pending"), (FAILED, "Failed"))
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    operation = models.CharField(max_length=16, choices=OPERATION_CHOICES)
+    notification_ids = models.JSONField(default=list)
+    read = models.BooleanField(default=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["recipient", "next_attempt_at"],
+                name="mirror_outbox_pending_idx",
+                condition=models.Q(status="pending"),
+            )
+        ]
+
+
 class Device(models.Model):
     """
     This class represents a device in a Python application.
@@ -0,0 +1,55 @@
+from backoffice.models import AssociateCompany, Company
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from utils.response_cache import invalidate
+
+from .authentication import forget_tokens, forget_user
+from .models import BackOfficeUser, Driver, User, WarehouseUser
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Covers token rotation, which deletes the old token before creating one.
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Password changes, deactivation and profile edits all save the user.
+    forget_user(instance.pk)
+    invalidate(f"user:{instance.pk}")
+    if instance.user_type == "driver":
+        # The driver list nests each driver's user.
+        invalidate("drivers")
+
+
+@receiver(post_save, sender=BackOfficeUser)
+@receiver(post_delete, sender=BackOfficeUser)
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+@receiver(post_save, sender=WarehouseUser)
+@receiver(post_delete, sender=WarehouseUser)
+def role_changed(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+    invalidate(f"user:{instance.user_id}")
+    if sender is Driver:
+        invalidate("drivers")
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def company_changed(sender, instance, **kwargs):
+    members = Q(user__backoffice__company=instance) | Q(
+        user__warehouse__company=instance
+    )
+    forget_tokens(Token.objects.filter(members).values_list("key", flat=True))
+    invalidate(f"company:{instance.pk}")
+
+
+@receiver(post_save, sender=AssociateCompany)
+@receiver(post_delete, sender=AssociateCompany)
+def associate_company_changed(sender, instance, **kwargs):
+    invalidate("associate-companies")
@@ -1,24 +1,93 @@
+import threading
+import time
 
-import boto3
-from botocore.exceptions import NoCredentialsError
+# Lifetime of the presigned URLs handed to clients.
+SIGNED_URL_EXPIRES_IN = 3600
+# A cached URL is re-signed once it has less than this many seconds left, so a
+# client never receives a link that expires while it is still being used.
+SIGNED_URL_EXPIRY_MARGIN = 300
+# Upper bound on cached URLs per process; expired entries are dropped first.
+SIGNED_URL_CACHE_SIZE = 10000
 
-# Your modified function to generate a signed URL
-def generate_signed_url(bucket_name, object_key, access_key_id, secret_access_key, region_name):
-    try:
-        session = boto3.Session(
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-            region_name=region_name
-        )
+_lock = threading.Lock()
+_clients = {}
+_signed_urls = {}
+
+
+def get_s3_client(access_key_id, secret_access_key, region_name):
+    """
+    Return the process-wide S3 client for these credentials.
+
+    Creating a boto3 session and client loads the service model from disk and
+    costs several milliseconds, so clients are built once and shared. boto3
+    clients are thread safe.
+    """
+    key = (access_key_id, secret_access_key, region_name)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # boto3 takes tens of milliseconds to import, so it is loaded
+                # on the first signing rather than with the serializers.
+                import boto3
+
+                session = boto3.Session(
+                    aws_access_key_id=access_key_id,
+                    aws_secret_access_key=secret_access_key,
+                    region_name=region_name,
+                )
+                client = _clients[key] = session.client("s3")
+    return client
+
+
+def _evict(now):
+    for key in [key for key, (_, expires) in _signed_urls.items() if expires <= now]:
+        del _signed_urls[key]
+    # Still full of live entries: drop the oldest inserted ones.
+    while len(_signed_urls) >= SIGNED_URL_CACHE_SIZE:
+        del _signed_urls[next(iter(_signed_urls))]
 
-        s3_client = session.client('s3')
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket_name, 'Key': object_key},
-            ExpiresIn=3600
-        )
 
-        return url
+def clear_signed_url_cache():
+    with _lock:
+        _clients.clear()
+        _signed_urls.clear()
 
+
+def generate_signed_url(
+    bucket_name, object_key, access_key_id, secret_access_key, region_name
+):
+    """
+    Return a presigned GET URL for ``object_key``.
+
+    URLs are cached per (bucket, key, credentials) and reused until
+    ``SIGNED_URL_EXPIRY_MARGIN`` seconds before they expire.
+    """
+    cache_key = (bucket_name, object_key, access_key_id, region_name)
+    now = time.time()
+    cached = _signed_urls.get(cache_key)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    from botocore.exceptions import NoCredentialsError
+
+    try:
+        url = get_s3_client(
+            access_key_id, secret_access_key, region_name
+        ).generate_presigned_url(
+            "get_object",
+            Params={"Bucket": bucket_name, "Key": object_key},
+            ExpiresIn=SIGNED_URL_EXPIRES_IN,
+        )
     except NoCredentialsError:
         return None
+
+    with _lock:
+        if len(_signed_urls) >= SIGNED_URL_CACHE_SIZE:
+            _evict(now)
+        _signed_urls[cache_key] = (
+            url,
+            now + SIGNED_URL_EXPIRES_IN - SIGNED_URL_EXPIRY_MARGIN,
+        )
+    return url
@@ -0,0 +1,20 @@
+from django.conf import settings
+
+# Backends whose entries only the current process (or host) can see.
+LOCAL_CACHE_BACKENDS = frozenset(
+    {
+        "django.core.cache.backends.locmem.LocMemCache",
+        "django.core.cache.backends.dummy.DummyCache",
+        "django.core.cache.backends.filebased.FileBasedCache",
+    }
+)
+
+
+def is_shared_cache(alias="default"):
+    """
+    Whether the ``alias`` cache is shared by every process of the deployment.
+
+    Caches that must be invalidated everywhere at once (authenticated tokens)
+    or aggregated across processes (outbound stats) are only used when it is.
+    """
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_CACHE_BACKENDS
@@ -0,0 +1,21 @@
+def pk_chunks(queryset, chunk_size):
+    """
+    Yield the primary keys of ``queryset`` in ascending runs of at most
+    ``chunk_size``.
+
+    Each run is read fresh from the key after the previous one, so rows the
+    caller updates or deletes in between are not skipped or revisited. Writing
+    one run per transaction keeps lock time and WAL volume bounded however many
+    rows match.
+    """
+    queryset = queryset.order_by("pk")
+    last = None
+    while True:
+        window = queryset if last is None else queryset.filter(pk__gt=last)
+        pks = list(window.values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        if len(pks) < chunk_size:
+            return
+        last = pks[-1]
@@ -0,0 +1,27 @@
+import hashlib
+import time
+
+from django.utils.cache import get_conditional_response
+
+from .aws import SIGNED_URL_EXPIRY_MARGIN
+
+
+def make_etag(*parts):
+    """
+    Weak ETag over ``parts``.
+
+    Shipment payloads embed presigned S3 links, so the tag also rolls over
+    every SIGNED_URL_EXPIRY_MARGIN seconds: a client revalidating an unchanged
+    resource still gets fresh links before the ones it holds expire.
+    """
+    epoch = int(time.time() // SIGNED_URL_EXPIRY_MARGIN)
+    value = "|".join(map(str, (*parts, epoch)))
+    return f'W/"{hashlib.sha256(value.encode()).hexdigest()[:32]}"'
+
+
+def not_modified(request, etag):
+    """Return a 304 response when ``If-None-Match`` matches ``etag``, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+    return response
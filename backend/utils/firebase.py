@@ -0,0 +1,27 @@
+import threading
+
+import firebase_admin
+from django.conf import settings
+from firebase_admin import credentials
+
+_lock = threading.Lock()
+_app = None
+
+
+def firebase_app():
+    """
+    Return the Firebase app, initialising it on first use.
+
+    Reading the service account certificate is deferred to the first call so
+    that processes which never talk to Firebase (migrations, most management
+    commands) neither pay for it nor fail when the file is missing.
+    """
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                certificate = credentials.Certificate(settings.FCM_JSON_FILE)
+                _app = firebase_admin.initialize_app(
+                    certificate, {"databaseURL": settings.FIREBASE_DATABASE_URL}
+                )
+    return _app
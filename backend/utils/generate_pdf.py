@@ -1,32 +1,12 @@
 import io
 
 from django.core.files.base import ContentFile
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 
 
-def generate_shipment_pdf(shipment):
-    # Prepare a buffer to write the PDF to
-    buffer = io.BytesIO()
-
-    # Create a canvas
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    # Title
-    p.setTitle(f"Shipment Details {shipment.id}")
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(30, height - 40, "Shipment Details")
-
-    # Reset font size
-    p.setFont("Helvetica", 10)
-    y_position = height - 60
-
-    # Function to write text to PDF and update y_position
-    def write_line(text):
-        nonlocal y_position
-        p.drawString(30, y_position, text)
-        y_position -= 20
+def shipment_pdf_lines(shipment):
+    """Return the text lines of the shipment details document."""
+    lines = []
+    write_line = lines.append
 
     # Example data from Shipment object
     write_line("Container Details")  #
@@ -52,19 +32,21 @@ def generate_shipment_pdf(shipment):
         write_line(f"Customer Phone Number: {shipment.customer.phone}")
 
     write_line("Driver Details")  #
-    write_line(
-        f"Driver Name: {shipment.driver.user.first_name} {shipment.driver.user.last_name}"
-    )
-    write_line(f"Driver Company: {shipment.driver.company_name}")
-    write_line(f"Driver Email: {shipment.driver.user.email}")
-    write_line(f"Driver Phone Number: {shipment.driver.user.phone_number}")
+    if shipment.driver:
+        write_line(
+            f"Driver Name: {shipment.driver.user.first_name} {shipment.driver.user.last_name}"
+        )
+        write_line(f"Driver Company: {shipment.driver.company_name}")
+        write_line(f"Driver Email: {shipment.driver.user.email}")
+        write_line(f"Driver Phone Number: {shipment.driver.user.phone_number}")
 
     write_line("Warehouse Details")  #
-    write_line(f"Warehouse: {shipment.warehouse.company.company_name}")
-    write_line(
-        f"Warehouse Phone Number: {shipment.warehouse.company.company_phone_number}"
-    )
-    write_line(f"Warehouse Email: {shipment.warehouse.company.company_email}")
+    if shipment.warehouse and shipment.warehouse.company:
+        write_line(f"Warehouse: {shipment.warehouse.company.company_name}")
+        write_line(
+            f"Warehouse Phone Number: {shipment.warehouse.company.company_phone_number}"
+        )
+        write_line(f"Warehouse Email: {shipment.warehouse.company.company_email}")
 
     write_line(
         f"Shipment Assigned Date: {shipment.assigned_date.strftime('%Y-%m-%d %H:%M:%S') if shipment.assigned_date else 'N/A'}"
@@ -77,22 +59,85 @@ def generate_shipment_pdf(shipment):
 
     write_line(f"Driver Delivered At: {shipment.driver_delivered_date}")
     write_line(f"Warehouse Receieved At: {shipment.warehouse_accepted_date}")
+    return lines
+
+
+def render_pdf_lines(title, lines):
+    """Render ``lines`` below the document heading and return the PDF bytes."""
+    # reportlab is only needed by the processes that render, not by every
+    # worker importing the views.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    # Prepare a buffer to write the PDF to
+    buffer = io.BytesIO()
+
+    # Create a canvas
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    # Title
+    p.setTitle(title)
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(30, height - 40, "Shipment Details")
+
+    # Reset font size
+    p.setFont("Helvetica", 10)
+    y_position = height - 60
+
+    # Write each line to the PDF and update y_position
+    for text in lines:
+        p.drawString(30, y_position, text)
+        y_position -= 20
+
     # Finalize the PDF
     p.showPage()
     p.save()
 
     # Move back to the beginning of the StringIO buffer
     buffer.seek(0)
+    content = buffer.read()
+    # Make sure to close the buffer
+    buffer.close()
+    return content
 
-    # Create a Django ContentFile from the buffer
-    pdf = ContentFile(buffer.read())
 
-    # Generate a filename
-    filename = f"shipment_details_{shipment.id}.pdf"
+def init_render_worker():
+    """
+    Process pool initializer for bulk rendering.
+
+    Loads the font metrics and exercises the canvas once, so every document a
+    worker renders reuses them instead of the first one paying for it.
+    """
+    from reportlab.pdfbase import pdfmetrics
+
+    pdfmetrics.getFont("Helvetica")
+    pdfmetrics.getFont("Helvetica-Bold")
+    render_pdf_lines("", [""])
+
+
+def render_document(document):
+    """Render a ``(filename, title, lines)`` document picked up by a worker."""
+    filename, title, lines = document
+    return filename, render_pdf_lines(title, lines)
+
+
+def render_shipment_pdf(shipment):
+    """Render the shipment details document and return the PDF bytes."""
+    return render_pdf_lines(
+        f"Shipment Details {shipment.id}", shipment_pdf_lines(shipment)
+    )
+
+
+def shipment_pdf_filename(shipment):
+    return f"shipment_details_{shipment.id}.pdf"
+
+
+def generate_shipment_pdf(shipment, save=True):
+    # Create a Django ContentFile from the rendered document
+    pdf = ContentFile(render_shipment_pdf(shipment))
 
     # Save the PDF file to the proof_of_delivery_form field of the Shipment instance
-    shipment.proof_of_delivery_file.save(filename, pdf)
-    # filename = "proof_of_delivery_{}.pdf".format(shipment.id)
-    # shipment.proof_of_delivery_file.save(filename, ContentFile(buffer.read()))
-    # Make sure to close the buffer
-    buffer.close()
+    shipment.proof_of_delivery_file.save(
+        shipment_pdf_filename(shipment), pdf, save=save
+    )
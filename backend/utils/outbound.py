@@ -0,0 +1,314 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from utils.cache import is_shared_cache
+
+# Keep-alive connections pooled per host, per process.
+POOL_SIZE = 10
+# Seconds allowed to open a connection, and for a whole call by default:
+# every attempt and the backoff between them.
+CONNECT_TIMEOUT = 3
+DEFAULT_DEADLINE = 10
+# Retries after a connection error, a timeout or one of RETRY_STATUSES. Only
+# idempotent methods are retried unless the caller asks otherwise.
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Retry n waits RETRY_BASE_DELAY * 2**(n - 1) seconds, jittered.
+RETRY_BASE_DELAY = 0.2
+# Consecutive failures (transport errors and 5xx) that open a host's circuit,
+# and seconds it stays open before a single trial request is let through.
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+# Upper bounds, in milliseconds, of the latency histogram kept per host.
+LATENCY_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+STATS_PREFIX = "outbound"
+STATS_FIELDS = ("requests", "errors", "retries", "rejected", "latency_ms")
+# Seconds the counts are collected in process before they are added to the
+# shared cache in one batch; what a process has not flushed when it exits is
+# lost.
+STATS_FLUSH_INTERVAL = 10
+
+_stats_lock = threading.Lock()
+# {host: {field: count}} not yet added to the cache.
+_pending = {}
+_flushed_at = time.monotonic()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast on a host that keeps failing.
+
+    After ``threshold`` consecutive failures the circuit opens and requests
+    are refused for ``reset_timeout`` seconds. Then one trial request goes
+    through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, threshold=None, reset_timeout=None):
+        self.threshold = threshold or BREAKER_THRESHOLD
+        self.reset_timeout = reset_timeout or BREAKER_RESET_TIMEOUT
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.trial else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial = True
+            return True
+
+    def succeeded(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+def _stats_key(host, field):
+    return f"{STATS_PREFIX}:{host}:{field}"
+
+
+def _host_key(host):
+    return f"{STATS_PREFIX}:host:{host}"
+
+
+def _hosts_key():
+    return f"{STATS_PREFIX}:hosts"
+
+
+def _host_slot_key(slot):
+    return f"{STATS_PREFIX}:hosts:{slot}"
+
+
+def _bucket(latency_ms):
+    for bound in LATENCY_BUCKETS:
+        if latency_ms <= bound:
+            return f"le_{bound}"
+    return "overflow"
+
+
+def _bucket_names():
+    return [f"le_{bound}" for bound in LATENCY_BUCKETS] + ["overflow"]
+
+
+def _incr(key, delta=1):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def _register(host):
+    """
+    Add ``host`` to the hosts known to ``outbound_stats``, once.
+
+    ``cache.add`` lets exactly one process claim the host, which then takes the
+    next numbered slot with ``cache.incr``; both are atomic in a shared cache,
+    unlike rewriting a set of hosts.
+    """
+    if cache.add(_host_key(host), True, None):
+        cache.add(_hosts_key(), 0, None)
+        cache.set(_host_slot_key(cache.incr(_hosts_key())), host, None)
+
+
+def _record(host, latency_ms=None, **counts):
+    """Count an outbound call in this process; see ``flush_stats``."""
+    with _stats_lock:
+        pending = _pending.setdefault(host, defaultdict(int))
+        for field, delta in counts.items():
+            pending[field] += delta
+        if latency_ms is not None:
+            pending["latency_ms"] += round(latency_ms)
+            pending[_bucket(latency_ms)] += 1
+        due = time.monotonic() - _flushed_at >= STATS_FLUSH_INTERVAL
+    if due and is_shared_cache():
+        flush_stats()
+
+
+def flush_stats():
+    """Add the counts collected in this process to the shared cache."""
+    global _pending, _flushed_at
+    with _stats_lock:
+        pending, _pending = _pending, {}
+        _flushed_at = time.monotonic()
+    for host, counts in pending.items():
+        _register(host)
+        for field, delta in counts.items():
+            if delta:
+                _incr(_stats_key(host, field), delta)
+
+
+def outbound_stats(reset=False):
+    """
+    Return ``{host: {...}}`` with the requests, errors, retries, rejected
+    (short-circuited) calls, total latency and latency histogram of every
+    host called.
+
+    With a shared cache these cover all processes, up to the counts each has
+    not flushed yet; otherwise only the calls made by this process.
+    """
+    fields = STATS_FIELDS + tuple(_bucket_names())
+    if not is_shared_cache():
+        with _stats_lock:
+            stats = {
+                host: {field: counts.get(field, 0) for field in fields}
+                for host, counts in sorted(_pending.items())
+            }
+            if reset:
+                _pending.clear()
+        return stats
+
+    flush_stats()
+    slots = [
+        _host_slot_key(slot) for slot in range(1, (cache.get(_hosts_key()) or 0) + 1)
+    ]
+    hosts = sorted(set(cache.get_many(slots).values()))
+    keys = [_stats_key(host, field) for host in hosts for field in fields]
+    values = cache.get_many(keys)
+    if reset:
+        cache.delete_many(
+            keys + slots + [_host_key(host) for host in hosts] + [_hosts_key()]
+        )
+    return {
+        host: {field: values.get(_stats_key(host, field), 0) for field in fields}
+        for host in hosts
+    }
+
+
+def latency_percentile(stats, fraction):
+    """Upper bound (ms) of the bucket holding the ``fraction`` quantile, or None."""
+    total = sum(stats[name] for name in _bucket_names())
+    seen = 0
+    for bound, name in zip(LATENCY_BUCKETS + (None,), _bucket_names()):
+        seen += stats[name]
+        if total and seen >= total * fraction:
+            return bound
+    return None
+
+
+class OutboundClient:
+    """
+    Shared client for calls to third-party HTTP APIs.
+
+    Connections are kept alive in a pool per host, every call has a deadline
+    covering all of its attempts, connection errors, timeouts and 502/503/504
+    answers of idempotent requests are retried with jittered exponential
+    backoff, and a circuit breaker per host fails calls fast while the host is
+    down. Per-host counts and latencies are recorded, see ``outbound_stats``.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker())
+        return breaker
+
+    def request(self, method, url, deadline=None, retries=None, **kwargs):
+        """
+        Send a request and return the last response received.
+
+        Raises CircuitOpenError while the host's circuit is open, and the
+        requests exception of the last attempt when none got a response. Only
+        connection errors and timeouts are retried; every attempt, whatever it
+        raised, is reported to the circuit breaker.
+        """
+        host = urlsplit(url).netloc
+        if retries is None:
+            retries = DEFAULT_RETRIES if method.upper() in IDEMPOTENT_METHODS else 0
+        expires = time.monotonic() + (deadline or DEFAULT_DEADLINE)
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                _record(host, rejected=1)
+                raise CircuitOpenError(f"Circuit open for {host}")
+            remaining = expires - time.monotonic()
+            started = time.monotonic()
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    timeout=(min(CONNECT_TIMEOUT, remaining), remaining),
+                    **kwargs,
+                )
+            except requests.RequestException as error:
+                response, failure = None, error
+            except BaseException:
+                # Still reported, or a half-open circuit would wait for the
+                # outcome of its trial request forever.
+                breaker.failed()
+                raise
+            latency_ms = (time.monotonic() - started) * 1000
+
+            failed = response is None or response.status_code >= 500
+            if failed:
+                breaker.failed()
+            else:
+                breaker.succeeded()
+            _record(host, latency_ms, requests=1, errors=int(failed))
+
+            if response is None:
+                retryable = isinstance(
+                    failure, (requests.ConnectionError, requests.Timeout)
+                )
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+            if attempt < retries and retryable:
+                delay = RETRY_BASE_DELAY * 2**attempt * random.uniform(0.5, 1.0)
+                if time.monotonic() + delay < expires:
+                    attempt += 1
+                    _record(host, retries=1)
+                    time.sleep(delay)
+                    continue
+            if response is None:
+                raise failure
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+outbound = OutboundClient()
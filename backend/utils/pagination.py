@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches the request to
+    keyset mode: rows are ordered by ``keyset_fields`` and every page starts
+    strictly after the last row of the previous one. No ``COUNT(*)`` or
+    ``OFFSET`` is issued, so fetching page 1000 costs the same as page 1, and
+    rows that change between requests do not shift the remaining pages.
+
+    ``keyset_fields`` must end with a unique column and share one direction,
+    e.g. ``("-updated_at", "-id")``. Any ordering already applied to the
+    queryset is replaced in keyset mode.
+
+    A view that already knows the number of rows can pass it as ``count`` to
+    spare the ``COUNT(*)`` of the page number mode; ``is_keyset(request)``
+    tells whether it needs one.
+    """
+
+    cursor_query_param = "cursor"
+    keyset_fields = ("-updated_at", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def is_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        self.count = count
+        self.keyset = self.is_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(
+            queryset.model, request.query_params[self.cursor_query_param]
+        )
+
+        queryset = queryset.order_by(*self.keyset_fields)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        # Fetch one extra row to learn whether a next page exists.
+        rows = list(queryset[: page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def django_paginator_class(self, queryset, page_size):
+        paginator = Paginator(queryset, page_size)
+        if self.count is not None:
+            # Paginator.count is a cached property: setting it skips the query.
+            paginator.count = self.count
+        return paginator
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            {"next": self.get_next_link(), "previous": None, "results": data}
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    def _field_names(self):
+        return [field.lstrip("-") for field in self.keyset_fields]
+
+    def after(self, position):
+        """Rows strictly past ``position`` in ``keyset_fields`` order."""
+        lookup = "lt" if self.keyset_fields[0].startswith("-") else "gt"
+        names = self._field_names()
+        condition = Q()
+        for index, name in enumerate(names):
+            equal = {prior: position[prior] for prior in names[:index]}
+            condition |= Q(**equal, **{f"{name}__{lookup}": position[name]})
+        return condition
+
+    def encode_cursor(self, instance):
+        values = []
+        for name in self._field_names():
+            value = getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        raw = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, model, cursor):
+        if not cursor:
+            return None
+        names = self._field_names()
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(names):
+                raise ValueError(cursor)
+            return {
+                name: model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)
+            }
+        except (TypeError, ValueError, ValidationError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+
+# Seconds a cached copy of the Secret Manager payload is used before it is
+# fetched again.
+SECRET_CACHE_TTL = 300
+
+
+def fetch_secret_payload(settings_name):
+    """
+    Return the latest version of the ``settings_name`` secret, or None when
+    there are no Google credentials or they may not read it.
+    """
+    # Imported here: with a fresh cached copy the Google client libraries are
+    # never loaded.
+    import google.auth
+    from google.api_core.exceptions import PermissionDenied
+    from google.auth.exceptions import DefaultCredentialsError
+    from google.cloud import secretmanager
+
+    try:
+        _, project = google.auth.default()
+        client = secretmanager.SecretManagerServiceClient()
+        name = client.secret_version_path(project, settings_name, "latest")
+        return client.access_secret_version(name=name).payload.data.decode("UTF-8")
+    except (DefaultCredentialsError, PermissionDenied):
+        return None
+
+
+def read_cached_payload(cache_path, ttl):
+    try:
+        if time.time() - os.path.getmtime(cache_path) >= ttl:
+            return None
+        with open(cache_path, encoding="UTF-8") as cached:
+            return cached.read()
+    except OSError:
+        return None
+
+
+def write_cached_payload(cache_path, payload):
+    # Written to a private temporary file and renamed, so a concurrent reader
+    # never sees a partial copy and the secrets are never world readable.
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix=".secret-settings-")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="UTF-8") as cached:
+            cached.write(payload)
+        os.replace(temporary, cache_path)
+    except OSError:
+        os.unlink(temporary)
+
+
+def load_secret_payload(settings_name, cache_path="", ttl=SECRET_CACHE_TTL):
+    """
+    Return the ``settings_name`` payload (a .env file) from Secret Manager.
+
+    With ``cache_path`` set, a copy younger than ``ttl`` seconds is read from
+    that file instead of calling Secret Manager, and a fetched payload is
+    written back to it. Returns None when the secret cannot be read.
+    """
+    if cache_path:
+        payload = read_cached_payload(cache_path, ttl)
+        if payload is not None:
+            return payload
+    payload = fetch_secret_payload(settings_name)
+    if payload is not None and cache_path:
+        write_cached_payload(cache_path, payload)
+    return payload
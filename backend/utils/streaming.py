@@ -0,0 +1,190 @@
+import csv
+import re
+import time
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Rows turned into one chunk of the response body.
+ROWS_PER_CHUNK = 500
+
+
+class _ChunkSink:
+    """Write-only file object that hands out whatever was written so far."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _TextSink:
+    """Encodes text written by ``csv.writer`` into a ``_ChunkSink``."""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write(self, text):
+        return self.sink.write(text.encode())
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """
+    Yield a zip archive of ``entries`` chunk by chunk.
+
+    ``entries`` is an iterable of ``(name, bytes)`` pairs and is consumed
+    lazily, so only one member is held in memory at a time. The sink is not
+    seekable, which makes ``zipfile`` write sizes in data descriptors after each
+    member instead of seeking back.
+    """
+    sink = _ChunkSink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = compression
+            archive.writestr(info, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _batches(rows, size=ROWS_PER_CHUNK):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_csv(header, rows):
+    """Yield ``header`` and ``rows`` as CSV, a few hundred rows per chunk."""
+    sink = _ChunkSink()
+    writer = csv.writer(_TextSink(sink))
+    writer.writerow(header)
+    for batch in _batches(rows):
+        writer.writerows([_text(value) for value in row] for row in batch)
+        yield sink.drain()
+    yield sink.drain()
+
+
+def stream_ndjson(header, rows):
+    """Yield one JSON object per row, keyed by ``header``."""
+    encoder = DjangoJSONEncoder()
+    for batch in _batches(rows):
+        yield "".join(
+            encoder.encode(dict(zip(header, row))) + "\n" for row in batch
+        ).encode()
+
+
+# Characters XML 1.0 cannot carry, even escaped.
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.'
+        "openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+        '" Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.'
+        'openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", _text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_rows(rows):
+    for row in rows:
+        yield "<row>" + "".join(map(_xlsx_cell, row)) + "</row>"
+
+
+def stream_xlsx(header, rows, sheet_name="Sheet1"):
+    """
+    Yield a single-sheet XLSX workbook chunk by chunk, without a spreadsheet
+    library.
+
+    The sheet is written straight into its zip member as rows arrive. Strings
+    are stored inline rather than in a shared string table, which would have
+    to be complete before the sheet could be written.
+    """
+    sink = _ChunkSink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        workbook = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+            '2006/main" xmlns:r="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships"><sheets>'
+            f'<sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/>'
+            "</sheets></workbook>"
+        )
+        for name, data in {**_XLSX_PARTS, "xl/workbook.xml": workbook}.items():
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, data)
+
+        info = zipfile.ZipInfo("xl/worksheets/sheet1.xml", date_time=date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, mode="w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/'
+                b'spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write("".join(_xlsx_rows([header])).encode())
+            for batch in _batches(rows):
+                sheet.write("".join(_xlsx_rows(batch)).encode())
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()